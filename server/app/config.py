@@ -1,7 +1,7 @@
 """Application configuration loaded from environment variables."""
 from dotenv import load_dotenv
 import os
-from typing import List
+from typing import Dict, List, Tuple
 
 # Load environment variables from .env file
 load_dotenv()
@@ -34,6 +34,140 @@ class Settings:
     # Cookie files path
     COOKIES_PATH: str = os.getenv("COOKIES_PATH", "./cookies")
 
+    # Metadata cache (extract_info results); TTL 0 disables it
+    INFO_CACHE_TTL: int = int(os.getenv("INFO_CACHE_TTL", "600"))
+    INFO_CACHE_MAX_ENTRIES: int = int(os.getenv("INFO_CACHE_MAX_ENTRIES", "256"))
+    INFO_CACHE_MAX_BYTES: int = int(os.getenv("INFO_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+    # Download scheduler: max simultaneous downloads, and "fifo" or "priority" admission
+    MAX_CONCURRENT_DOWNLOADS: int = int(os.getenv("MAX_CONCURRENT_DOWNLOADS", "3"))
+    DOWNLOAD_QUEUE_POLICY: str = os.getenv("DOWNLOAD_QUEUE_POLICY", "fifo").lower()
+    # Post-processing stage (ffmpeg merge/remux/audio extraction): simultaneous runs.
+    # Downloads hand finished streams over to it and free their slot.
+    MERGE_WORKERS: int = int(os.getenv("MERGE_WORKERS", "2"))
+
+    # Progress hook coalescing: publish at most every N seconds unless progress moved by STEP (0..1)
+    PROGRESS_PUBLISH_INTERVAL: float = float(os.getenv("PROGRESS_PUBLISH_INTERVAL", "0.25"))
+    PROGRESS_PUBLISH_STEP: float = float(os.getenv("PROGRESS_PUBLISH_STEP", "0.005"))
+
+    # Job progress stream (SSE): min seconds between events, keepalive interval
+    JOB_STREAM_INTERVAL: float = float(os.getenv("JOB_STREAM_INTERVAL", "0.5"))
+    JOB_STREAM_KEEPALIVE: float = float(os.getenv("JOB_STREAM_KEEPALIVE", "15"))
+
+    # Upper bound for GET /jobs?wait=... long-polls, seconds
+    JOBS_LONGPOLL_MAX: float = float(os.getenv("JOBS_LONGPOLL_MAX", "30"))
+
+    # Per-site download limits as "site=max_sessions:sessions_per_second" (0 = no cap), e.g. "youtube=4:1";
+    # the rate also paces extractions
+    HOST_LIMITS: Dict[str, Tuple[int, float]] = {
+        site.strip(): (int(limit.split(":")[0] or 0), float((limit.split(":") + ["0"])[1] or 0))
+        for site, limit in (
+            item.split("=", 1)
+            for item in os.getenv(
+                "HOST_LIMITS",
+                "youtube=4:1,facebook=2:0.5,instagram=2:0.5,twitter=2:1"
+            ).split(",")
+            if "=" in item
+        )
+    }
+    # Separate per-site caps for metadata extractions ("site=max_sessions"), so
+    # long downloads never hold the slots /info and job extraction need; they
+    # share the site's HOST_LIMITS rate. Sites missing here are not capped.
+    HOST_EXTRACT_LIMITS: Dict[str, int] = {
+        site.strip(): int(limit or 0)
+        for site, limit in (
+            item.split("=", 1)
+            for item in os.getenv(
+                "HOST_EXTRACT_LIMITS",
+                "youtube=4,facebook=2,instagram=2,twitter=2"
+            ).split(",")
+            if "=" in item
+        )
+    }
+
+    # Durable job records (SQLite) so restarts resume downloads; empty path disables it
+    JOB_STORE_PATH: str = os.getenv("JOB_STORE_PATH", "")
+
+    # Janitor: seconds to keep finished jobs per status, total quota for job dirs (0 = none),
+    # age after which one-shot /download dirs are removed, and sweep interval
+    JOB_RETENTION: Dict[str, int] = {
+        status.strip(): int(seconds)
+        for status, seconds in (
+            item.split("=", 1)
+            for item in os.getenv("JOB_RETENTION", "done=86400,error=86400,canceled=3600").split(",")
+            if "=" in item
+        )
+    }
+    DOWNLOAD_DISK_QUOTA: int = int(os.getenv("DOWNLOAD_DISK_QUOTA", "0"))
+    ONESHOT_RETENTION: int = int(os.getenv("ONESHOT_RETENTION", "3600"))
+    JANITOR_INTERVAL: int = int(os.getenv("JANITOR_INTERVAL", "300"))
+
+    # Persistent metadata store (SQLite); empty path disables it
+    INFO_STORE_PATH: str = os.getenv("INFO_STORE_PATH", "")
+    INFO_STORE_TTL: int = int(os.getenv("INFO_STORE_TTL", "86400"))
+    # Per-site metadata expiry in seconds, e.g. "youtube=86400,facebook=21600"
+    INFO_STORE_SITE_TTLS: Dict[str, int] = {
+        site.strip(): int(ttl)
+        for site, ttl in (
+            item.split("=", 1)
+            for item in os.getenv(
+                "INFO_STORE_SITE_TTLS",
+                "youtube=86400,facebook=21600,instagram=21600,twitter=43200"
+            ).split(",")
+            if "=" in item
+        )
+    }
+    # Stream URL lifetime assumed when a site doesn't sign its URLs with an expiry
+    INFO_STORE_STREAM_TTL: int = int(os.getenv("INFO_STORE_STREAM_TTL", "3600"))
+    # How many of the most-requested entries to load into memory on boot
+    INFO_STORE_WARM: int = int(os.getenv("INFO_STORE_WARM", "100"))
+
+    # Metadata extraction in child processes (0 = in the API process) and the
+    # overall deadline of one extraction in seconds (0 = none)
+    EXTRACT_WORKERS: int = int(os.getenv("EXTRACT_WORKERS", "2"))
+    EXTRACT_TIMEOUT: float = float(os.getenv("EXTRACT_TIMEOUT", "90"))
+    # Per-site deadlines overriding EXTRACT_TIMEOUT, e.g. "youtube=45,facebook=90";
+    # they cover the wait for a HOST_LIMITS slot as well as the extraction itself
+    EXTRACT_SITE_TIMEOUTS: Dict[str, float] = {
+        site.strip(): float(seconds)
+        for site, seconds in (
+            item.split("=", 1)
+            for item in os.getenv(
+                "EXTRACT_SITE_TIMEOUTS",
+                "youtube=60,facebook=90,instagram=60,twitter=45"
+            ).split(",")
+            if "=" in item
+        )
+    }
+
+    # Most jobs accepted by one POST /jobs/batch
+    JOBS_BATCH_MAX: int = int(os.getenv("JOBS_BATCH_MAX", "200"))
+
+    # Playlist jobs: how many entry jobs may wait for a download slot before
+    # expansion pauses (the rest of the playlist is read as downloads finish)
+    PLAYLIST_LOOKAHEAD: int = int(os.getenv("PLAYLIST_LOOKAHEAD", "2"))
+    # Seconds a playlist stays listed after its expansion ended (and its jobs finished)
+    PLAYLIST_RETENTION: int = int(os.getenv("PLAYLIST_RETENTION", "86400"))
+
+    # Most URLs accepted by one POST /info/batch
+    INFO_BATCH_MAX: int = int(os.getenv("INFO_BATCH_MAX", "100"))
+    # Threads async /info and /info/batch callers wait on; each extraction in
+    # flight holds one for its whole run, including the wait for a site slot
+    INFO_LOAD_THREADS: int = int(os.getenv("INFO_LOAD_THREADS", "32"))
+
+    # /download?stream=1: bytes read from the yt-dlp pipe per chunk (also the read buffer cap)
+    PASSTHROUGH_CHUNK: int = int(os.getenv("PASSTHROUGH_CHUNK", str(256 * 1024)))
+
+    # /proxy-image: on-disk thumbnail cache, its size cap, how long an entry is
+    # served before revalidating upstream, and the largest image accepted
+    THUMB_CACHE_DIR: str = os.getenv("THUMB_CACHE_DIR", "./data/thumbs")
+    THUMB_CACHE_MAX_BYTES: int = int(os.getenv("THUMB_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    THUMB_CACHE_TTL: int = int(os.getenv("THUMB_CACHE_TTL", "86400"))
+    THUMB_MAX_BYTES: int = int(os.getenv("THUMB_MAX_BYTES", str(10 * 1024 * 1024)))
+    # Resized variants (needs Pillow): encoder threads and WebP/JPEG quality
+    THUMB_RESIZE_WORKERS: int = int(os.getenv("THUMB_RESIZE_WORKERS", "2"))
+    THUMB_QUALITY: int = int(os.getenv("THUMB_QUALITY", "80"))
+
 
 # Create a global settings instance
 settings = Settings()
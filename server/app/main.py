@@ -1,9 +1,31 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .routers import media
 from .config import settings
+from .services import ytdlp_service, job_manager, janitor, thumb_cache
+from .services.job_store import store as job_store
+from .services.extract_pool import pool as extract_pool
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: bring the hottest stored metadata back into memory
+    ytdlp_service.warm_info_cache()
+    # ...and reattach jobs that were running when the process last stopped
+    job_manager.restore_jobs()
+    # clean up after the previous run, then keep disk usage bounded
+    janitor.start()
+    # spawn the extraction workers now so the first /info doesn't pay for their warm-up
+    extract_pool.start()
+    yield
+    extract_pool.stop()
+    await thumb_cache.aclose()
+    job_store.flush()
+
 
-app = FastAPI(title="MediaDownloader API", version="0.1.0")
+app = FastAPI(title="MediaDownloader API", version="0.1.0", lifespan=lifespan)
 
 # CORS configuration from environment variables
 app.add_middleware(
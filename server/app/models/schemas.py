@@ -1,14 +1,20 @@
 from pydantic import BaseModel, HttpUrl
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 class InfoRequest(BaseModel):
     url: HttpUrl
+    thumb_width: Optional[int] = None  # pick the smallest thumbnail at least this wide (default: largest)
+    max_mb: Optional[float] = None     # also offer the best concrete format under this size...
+    max_kbps: Optional[float] = None   # ...and/or this total bitrate (listed first)
 
 class FormatItem(BaseModel):
     format_id: Optional[str] = None       # single itag for progressive or audio-only
     format_string: str                    # e.g. "137+140" or just "18"
     label: str                            # "720p mp4", "Audio m4a"
     ext: Optional[str] = None             # final container hint (mp4/webm/mkv)
+    filesize: Optional[str] = None        # human readable; "~" when estimated (approximate size or bitrate x duration)
+    filesize_bytes: Optional[int] = None  # estimated output size of what the expression resolves to
+    tbr: Optional[float] = None           # estimated total bitrate, kbps
 
 class InfoResponse(BaseModel):
     title: str
@@ -16,6 +22,19 @@ class InfoResponse(BaseModel):
     duration: Optional[int] = None
     formats: List[FormatItem]
 
+class InfoBatchRequest(BaseModel):
+    urls: List[HttpUrl]
+    thumb_width: Optional[int] = None
+    max_mb: Optional[float] = None
+    max_kbps: Optional[float] = None
+
+class InfoBatchItem(BaseModel):
+    index: int                           # position in the request's urls
+    url: str                             # as submitted
+    status: int                          # 200, or the status POST /info would have answered
+    info: Optional[InfoResponse] = None
+    error: Optional[str] = None
+
 
 from typing import Literal
 
@@ -25,6 +44,12 @@ class StartJobRequest(BaseModel):
     title: Optional[str] = None
     ext: Optional[str] = None
     label: Optional[str] = None  # for UI; backend ignores
+    priority: int = 0            # higher runs first when the queue policy is "priority"
+    start: Optional[float] = None  # seconds; with start and/or end only that section is downloaded (needs ffmpeg)
+    end: Optional[float] = None
+    exact_cuts: bool = False       # re-encode around the cuts so the clip starts on the exact frame (slower)
+    max_mb: Optional[float] = None     # overrides `format` with the best quality under this size...
+    max_kbps: Optional[float] = None   # ...and/or this total bitrate (resolved when the job is submitted)
 
 JobStatus = Literal["queued","downloading","paused","merging","done","error","canceled"]
 
@@ -42,3 +67,47 @@ class JobResponse(BaseModel):
     eta_seconds: Optional[int] = None
     filename: Optional[str] = None
     error: Optional[str] = None
+    priority: int = 0
+    queue_position: Optional[int] = None  # 1-based while waiting for a download slot (or, merging, a merge slot)
+    blocked_seconds: float = 0.0          # time spent waiting on per-site rate limits
+    version: int = 0                      # job store version of the last change
+    source_job_id: Optional[str] = None   # set when this job reuses another job's download
+    progressive: Optional[bool] = None    # single-stream download; GET /jobs/{id}/file?follow=1 works before done
+    format_id: Optional[str] = None       # concrete formats chosen for format_string, e.g. "137+140"
+    playlist_id: Optional[str] = None     # set on jobs created by a playlist job
+    batch_id: Optional[str] = None        # set on jobs created by POST /jobs/batch
+    clip_start: Optional[float] = None    # requested section, seconds
+    clip_end: Optional[float] = None
+    merge_step: Optional[str] = None      # post-processor running while merging, e.g. "Merger"
+    merge_progress: Optional[float] = None  # 0..1 through that step, when ffmpeg reports it
+    merge_seconds: Optional[float] = None   # time post-processing took (excluding the wait for a merge slot)
+
+class StartJobsBatchRequest(BaseModel):
+    items: List[StartJobRequest]
+
+class JobsBatchResponse(BaseModel):
+    batch_id: str
+    jobs: List[JobResponse]              # in submission order
+    counts: Dict[str, int]               # jobs by status
+    progress: float                      # mean progress of the jobs that weren't canceled
+    downloaded_bytes: int
+    total_bytes: Optional[int] = None    # once every job knows its size
+    finished: bool                       # every job is done, failed or canceled
+
+class StartPlaylistRequest(BaseModel):
+    url: HttpUrl                 # playlist or channel
+    format: str                  # applied to every entry
+    priority: int = 0
+    max_entries: Optional[int] = None  # stop expanding after this many entries
+
+PlaylistStatus = Literal["expanding","expanded","error","canceled"]
+
+class PlaylistResponse(BaseModel):
+    id: str
+    url: HttpUrl
+    title: Optional[str] = None
+    format_string: str
+    status: PlaylistStatus        # of the expansion; downloads are counted in `jobs`
+    error: Optional[str] = None
+    entries: int                  # jobs created so far
+    jobs: Dict[str, int]          # entry jobs by status
@@ -1,72 +1,244 @@
 # server/app/routers/media.py
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse, FileResponse, Response
-from urllib.parse import unquote
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, Response
+from urllib.parse import quote, unquote
+from typing import Dict, List, Optional, Tuple
+import json
+import mimetypes
 import os
-import httpx
+import asyncio
 
 from ..models.schemas import (
     InfoRequest,
     InfoResponse,
+    InfoBatchRequest,
+    InfoBatchItem,
     StartJobRequest,
     JobResponse,
+    StartJobsBatchRequest,
+    JobsBatchResponse,
+    StartPlaylistRequest,
+    PlaylistResponse,
 )
 from ..services.ytdlp_service import (
-    extract_info,
+    _normalize_youtube_url,
+    extract_info_async,
     build_formats,
     download_to_temp,
+    extract_info,
+    format_error,
+    budget_format,
     select_thumbnail,
 )
 from ..services import job_manager as jm
+from ..services import job_events
+from ..services import janitor
+from ..services import passthrough
+from ..services import playlist_jobs
+from ..services import thumb_cache
+from ..services.file_serving import MediaFileResponse, follow_file
+from ..config import settings
+from ..services.info_cache import cache as info_cache
+from ..services.info_store import store as info_store
+from ..services.host_limiter import limiter as host_limiter
+from ..services.extract_pool import pool as extract_pool, ExtractTimeout
 
 router = APIRouter(tags=["media"])
 
 
 # ---------- Metadata ----------
+_DISCONNECT_POLL = 0.5  # seconds between client-disconnect checks while /info waits
+
+
+async def _unless_disconnected(request: Request, coro):
+    """
+    Await `coro`, cancelling it when the client goes away first (for /info that
+    cancels the extraction once no other request is waiting on it).
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=_DISCONNECT_POLL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                print(f"[DEBUG] client disconnected; abandoning {request.url.path}")
+                raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        task.cancel()
+
+
+def _mb(max_mb: Optional[float]) -> Optional[int]:
+    return int(max_mb * 1024 * 1024) if max_mb is not None else None
+
+
+def _info_response(data: dict, thumb_width: Optional[int], max_mb: Optional[float] = None,
+                   max_kbps: Optional[float] = None) -> InfoResponse:
+    # Check if any formats were found
+    formats = build_formats(data)
+    if not formats:
+        raise HTTPException(status_code=400, detail="No downloadable formats found for this URL")
+    if max_mb is not None or max_kbps is not None:
+        pick = budget_format(data, max_bytes=_mb(max_mb), max_kbps=max_kbps)
+        if pick is not None:
+            formats.insert(0, pick)
+
+    return InfoResponse(
+        title=data.get("title") or "Untitled",
+        thumbnail=select_thumbnail(data, min_width=thumb_width),
+        duration=(int(data.get("duration")) if data.get("duration") else None),
+        formats=formats,
+    )
+
+
+def _info_error(e: Exception) -> HTTPException:
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, ExtractTimeout):
+        return HTTPException(status_code=504, detail=f"Timed out extracting video info: {e}")
+    error_msg = str(e)
+    if "Unsupported URL" in error_msg or "No video formats found" in error_msg:
+        return HTTPException(status_code=400, detail=f"This video site is not supported or the URL contains no downloadable video")
+    return HTTPException(status_code=400, detail=f"Failed to extract video info: {error_msg}")
+
+
 @router.post("/info", response_model=InfoResponse)
-def info(body: InfoRequest):
+async def info(body: InfoRequest, request: Request):
     print(f"[DEBUG] Received info request for URL: {body.url}")
     try:
         print(f"[DEBUG] Starting yt-dlp extraction...")
-        data = extract_info(str(body.url))
+        # awaited: the extraction runs in the worker pool, not on a request thread
+        data = await _unless_disconnected(request, extract_info_async(str(body.url)))
         print(f"[DEBUG] yt-dlp extraction completed successfully")
-        
-        # Check if any formats were found
-        formats = build_formats(data)
-        if not formats:
-            raise HTTPException(status_code=400, detail="No downloadable formats found for this URL")
-        
-        return InfoResponse(
-            title=data.get("title") or "Untitled",
-            thumbnail=select_thumbnail(data),
-            duration=(int(data.get("duration")) if data.get("duration") else None),
-            formats=formats,
-        )
+        # resolving every offered expression for its size estimate is CPU work; keep it off the loop
+        return await run_in_threadpool(_info_response, data, body.thumb_width, body.max_mb, body.max_kbps)
     except Exception as e:
-        error_msg = str(e)
-        if "Unsupported URL" in error_msg or "No video formats found" in error_msg:
-            raise HTTPException(status_code=400, detail=f"This video site is not supported or the URL contains no downloadable video")
-        raise HTTPException(status_code=400, detail=f"Failed to extract video info: {error_msg}")
+        raise _info_error(e)
+
+
+@router.post("/info/batch")
+async def info_batch(body: InfoBatchRequest):
+    """
+    Metadata for many URLs, streamed as NDJSON (one InfoBatchItem per line) in
+    completion order, so the first line arrives as soon as the fastest
+    extraction is done. URLs that normalize to the same video share one
+    extraction; the rest run in parallel under the per-site limits, at most one
+    per extract worker at a time so no item's deadline runs out in the pool's queue.
+    """
+    if len(body.urls) > settings.INFO_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {settings.INFO_BATCH_MAX} URLs per batch")
+    groups: Dict[str, List[Tuple[int, str]]] = {}
+    for index, url in enumerate(body.urls):
+        groups.setdefault(_normalize_youtube_url(str(url)), []).append((index, str(url)))
+    print(f"[DEBUG] Received info batch: {len(body.urls)} URLs, {len(groups)} distinct")
+
+    # an extraction's deadline starts when it is submitted: only hand the pool what it can run now
+    dispatch = asyncio.Semaphore(extract_pool.size if extract_pool.enabled else len(groups))
+
+    async def one(key: str):
+        try:
+            async with dispatch:
+                data = await extract_info_async(key)
+            return key, await run_in_threadpool(_info_response, data, body.thumb_width,
+                                                body.max_mb, body.max_kbps), None
+        except Exception as e:
+            return key, None, _info_error(e)
+
+    async def lines():
+        tasks = [asyncio.ensure_future(one(key)) for key in groups]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                key, data, err = await next_done
+                for index, url in groups[key]:
+                    item = InfoBatchItem(
+                        index=index,
+                        url=url,
+                        status=err.status_code if err else 200,
+                        info=data,
+                        error=err.detail if err else None,
+                    )
+                    yield item.model_dump_json(exclude={"info"} if err else {"error"}) + "\n"
+        finally:
+            # client gone: cancel what is left (each extraction stops once nobody else waits on it)
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"Cache-Control": "no-store"})
+
+
+@router.get("/info/cache")
+def info_cache_stats():
+    """Hit/miss counters and size of the metadata cache (for sizing it)."""
+    return {**info_cache.stats(), "store": info_store.stats(), "pool": extract_pool.stats()}
+
+
+@router.get("/storage")
+def storage_stats():
+    """Disk footprint of job/one-shot temp dirs and what the janitor has reclaimed."""
+    return janitor.stats()
+
+
+@router.get("/limits")
+def host_limits():
+    """Per-site session caps, active sessions and cumulative time spent blocked."""
+    return host_limiter.stats()
+
+
+def _file_response(path: str) -> MediaFileResponse:
+    return MediaFileResponse(
+        path,
+        media_type=mimetypes.guess_type(path)[0] or "application/octet-stream",
+        filename=os.path.basename(path),
+    )
 
 
 # ---------- Simple one-shot download (optional; jobs flow is preferred) ----------
+def _selection_headers(expr: str, seconds: float) -> dict:
+    # which expression of the fallback chain won, and what choosing it cost
+    return {"X-Format-Selected": quote(expr, safe="/*+[]<>=!^$~?:,()|"), "X-Format-Selection-Ms": f"{seconds * 1000:.1f}"}
+
+
 @router.get("/download")
-def download(url: str, format: str):  # format can be "137+140" or "18"
-    try:
-        url = unquote(url)
-        file_path = download_to_temp(url, format)
-        filename = file_path.split("\\")[-1].split("/")[-1]
-
-        def file_iter():
-            with open(file_path, "rb") as f:
-                while True:
-                    chunk = f.read(1024 * 1024)
-                    if not chunk:
-                        break
-                    yield chunk
-
-        headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
-        return StreamingResponse(file_iter(), headers=headers, media_type="application/octet-stream")
+async def download(url: str, format: str, request: Request, stream: bool = False):  # format can be "137+140" or "18"
+    """
+    Download to a temp file and serve it (Range/conditional aware). With
+    `stream=1` yt-dlp's output is piped to the client instead, without touching
+    disk (no Range support, no Content-Length); formats that can't be piped
+    fall back to the temp file.
+    """
+    url = unquote(url)
+    if stream:
+        try:
+            planned = await run_in_threadpool(passthrough.plan, url, format)
+            if planned is not None:
+                info, expr, selected, seconds = planned
+                # a client that leaves while this waits for a slot or the first bytes frees both
+                body = await _unless_disconnected(request, passthrough.open_stream(url, info, selected))
+                name = passthrough.filename(info, selected)
+                return StreamingResponse(
+                    body,
+                    media_type=passthrough.media_type(selected),
+                    headers={
+                        "Content-Disposition": f"attachment; filename*=utf-8''{quote(name)}",
+                        "Cache-Control": "no-store",
+                        **_selection_headers(expr, seconds),
+                    },
+                )
+        except ExtractTimeout as e:
+            raise HTTPException(status_code=504, detail=str(e))
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    try:
+        file_path, expr, seconds = await run_in_threadpool(download_to_temp, url, format)
+        # Range/conditional aware, so an interrupted browser download resumes from the same file
+        response = _file_response(file_path)
+        response.headers.update(_selection_headers(expr, seconds))
+        return response
+    except ExtractTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -74,25 +246,163 @@ def download(url: str, format: str):  # format can be "137+140" or "18"
 # ---------- Jobs API ----------
 def _job_json(job: jm.Job) -> dict:
     """Serialize a Job dataclass safely for the API."""
-    d = job.__dict__.copy()
-    # remove private/control fields & large internals
-    d.pop("_pause_req", None)
-    d.pop("_cancel_req", None)
+    d = jm.snapshot(job)
+    # remove private/control fields & large internals (_pause_req, _progress, ...)
+    for key in [k for k in d if k.startswith("_")]:
+        d.pop(key)
     # keep tmpdir off the wire; we'll still use it internally when serving the file
     # (do NOT remove from the object itself)
     d.pop("tmpdir", None)
     return d
 
 
+def _budget_format(item: StartJobRequest) -> str:
+    """
+    The item's format, or with max_mb/max_kbps the concrete formats of the best
+    quality within that budget (the metadata is usually cached from /info).
+    Raises HTTPException when nothing fits.
+    """
+    if not _has_budget(item):
+        return item.format
+    try:
+        info = extract_info(str(item.url))
+    except Exception as e:
+        raise _info_error(e)
+    return _budget_pick(item, info)
+
+
+def _has_budget(item: StartJobRequest) -> bool:
+    return item.max_mb is not None or item.max_kbps is not None
+
+
+def _budget_pick(item: StartJobRequest, info: dict) -> str:
+    pick = budget_format(info, max_bytes=_mb(item.max_mb), max_kbps=item.max_kbps)
+    if pick is None:
+        raise HTTPException(status_code=400, detail="No format fits the requested size/bitrate budget")
+    print(f"[DEBUG] budget {item.max_mb} MB / {item.max_kbps} kbps -> {pick['format_string']} ({pick['filesize']})")
+    return pick["format_string"]
+
+
 @router.post("/jobs/start", response_model=JobResponse)
 def jobs_start(body: StartJobRequest):
+    format_string = _budget_format(body)
     try:
-        job = jm.start_job(str(body.url), body.format, title=body.title, ext=body.ext)
+        job = jm.start_job(str(body.url), format_string, title=body.title, ext=body.ext,
+                           priority=body.priority, clip_start=body.start, clip_end=body.end,
+                           exact_cuts=body.exact_cuts)
         return JobResponse(**_job_json(job))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+def _batch_json(batch_id: str, jobs: list) -> JobsBatchResponse:
+    return JobsBatchResponse(
+        batch_id=batch_id,
+        jobs=[JobResponse(**_job_json(j)) for j in jobs],
+        **jm.batch_progress(jobs),
+    )
+
+
+@router.post("/jobs/batch", response_model=JobsBatchResponse)
+async def jobs_batch(body: StartJobsBatchRequest):
+    """
+    Start many jobs in one request. Every item is validated before any job is
+    created (all problems are reported together, by item index); the jobs are
+    then enqueued atomically under one batch id. Budgets (max_mb/max_kbps) are
+    only resolved once the items are valid, with one concurrent extraction per
+    distinct URL.
+    """
+    if not body.items:
+        raise HTTPException(status_code=400, detail="No items")
+    if len(body.items) > settings.JOBS_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {settings.JOBS_BATCH_MAX} jobs per batch")
+    errors = []
+    for index, item in enumerate(body.items):
+        problem = format_error(item.format)
+        if problem:
+            errors.append({"index": index, "error": f"Invalid format {item.format!r}: {problem}"})
+        problem = jm.clip_error(item.start, item.end)
+        if problem:
+            errors.append({"index": index, "error": problem})
+    if errors:
+        raise HTTPException(status_code=400, detail=errors)
+    urls = list({_normalize_youtube_url(str(item.url)) for item in body.items if _has_budget(item)})
+    infos = dict(zip(urls, await asyncio.gather(*(extract_info_async(u) for u in urls), return_exceptions=True)))
+    formats = []
+    for index, item in enumerate(body.items):
+        if not _has_budget(item):
+            formats.append(item.format)
+            continue
+        info = infos[_normalize_youtube_url(str(item.url))]
+        try:
+            if isinstance(info, Exception):
+                raise _info_error(info)
+            formats.append(await run_in_threadpool(_budget_pick, item, info))
+        except HTTPException as e:
+            errors.append({"index": index, "error": e.detail})
+    if errors:
+        raise HTTPException(status_code=400, detail=errors)
+    batch_id, jobs = await run_in_threadpool(jm.start_batch, [
+        {"url": str(item.url), "format_string": fmt, "title": item.title,
+         "ext": item.ext, "priority": item.priority, "clip_start": item.start,
+         "clip_end": item.end, "exact_cuts": item.exact_cuts}
+        for item, fmt in zip(body.items, formats)
+    ])
+    return _batch_json(batch_id, jobs)
+
+
+@router.get("/jobs/batch/{batch_id}", response_model=JobsBatchResponse)
+def jobs_batch_get(batch_id: str):
+    try:
+        return _batch_json(batch_id, jm.batch_jobs(batch_id))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+
+@router.post("/jobs/batch/{batch_id}/cancel", response_model=JobsBatchResponse)
+def jobs_batch_cancel(batch_id: str):
+    try:
+        return _batch_json(batch_id, jm.cancel_batch(batch_id))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+
+@router.get("/jobs/stream")
+async def jobs_stream(request: Request, since: Optional[int] = None):
+    """
+    Server-Sent Events feed of job changes. Each `jobs` event carries the jobs that
+    changed since the previous event (all jobs on connect, unless `since` or
+    Last-Event-ID is given) and `removed` events list ids dropped by retention;
+    bursts of progress are coalesced to at most one event per JOB_STREAM_INTERVAL seconds.
+    """
+    last_id = request.headers.get("last-event-id")
+    if since is None and last_id and last_id.isdigit():
+        since = int(last_id)
+
+    async def events():
+        version = since or 0
+        async with job_events.subscribe() as sub:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                current, changed, removed = jm.changed_since(version)
+                if changed:
+                    payload = json.dumps([
+                        JobResponse(**_job_json(j)).model_dump(mode="json") for j in changed
+                    ])
+                    yield f"id: {current}\nevent: jobs\ndata: {payload}\n\n"
+                if removed:
+                    yield f"id: {current}\nevent: removed\ndata: {json.dumps(removed)}\n\n"
+                version = current
+                if not await sub.wait(settings.JOB_STREAM_KEEPALIVE):
+                    yield ": keepalive\n\n"
+                    continue
+                # let further updates pile up so they go out as one event
+                await asyncio.sleep(settings.JOB_STREAM_INTERVAL)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+
 @router.post("/jobs/{job_id}/pause", response_model=JobResponse)
 def jobs_pause(job_id: str):
     try:
@@ -130,58 +440,202 @@ def jobs_get(job_id: str):
 
 
 @router.get("/jobs", response_model=list[JobResponse])
-def jobs_list():
-    return [JobResponse(**_job_json(j)) for j in jm.list_jobs()]
+async def jobs_list(request: Request, since: Optional[int] = None, wait: float = 0):
+    """
+    All jobs, or with `since=<version>` only those changed after that version.
+    With `wait=<seconds>` the call long-polls until something changes or the wait
+    expires. The current store version is returned in ETag / X-Jobs-Version; a
+    matching If-None-Match gets 304.
+    """
+    wait = max(0.0, min(wait, settings.JOBS_LONGPOLL_MAX))
+    base = since or 0
+    async with job_events.subscribe() as sub:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        while True:
+            version, changed, removed = jm.changed_since(base)
+            remaining = deadline - loop.time()
+            if changed or removed or since is None or remaining <= 0:
+                break
+            await sub.wait(remaining)
+
+    etag = f'W/"jobs-{base}-{version}"'
+    headers = {"ETag": etag, "X-Jobs-Version": str(version), "Cache-Control": "no-cache"}
+    if since is not None and removed:
+        # jobs dropped by retention since that version
+        headers["X-Jobs-Removed"] = ",".join(removed)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    body = json.dumps([JobResponse(**_job_json(j)).model_dump(mode="json") for j in changed])
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def _follow_response(job: jm.Job):
+    """Stream a progressive job's file while yt-dlp is still writing it."""
+    src = jm.download_source(job)
+    # the format (and so whether it's a single stream) is only known once the download starts
+    async with job_events.subscribe() as sub:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.JOBS_LONGPOLL_MAX
+        while src.progressive is None and src.status in ("queued", "downloading"):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            await sub.wait(remaining)
+
+    if job.status == "done":
+        return None
+    if src.status not in ("queued", "downloading", "merging"):
+        raise HTTPException(status_code=409, detail=f"Job not downloading (status={src.status})")
+    if not src.progressive:
+        raise HTTPException(status_code=409, detail="Job output is merged from several streams; wait for status=done")
+
+    def state() -> str:
+        if src.status == "done":
+            return "complete"
+        return "writing" if src.status in ("queued", "downloading", "merging") else "failed"
+
+    name = os.path.basename(src.filename or f"{job.id}.{job.ext or 'bin'}")
+    jm.mark_accessed(job.id)
+    return StreamingResponse(
+        follow_file(lambda: jm.partial_paths(src), state),
+        media_type=mimetypes.guess_type(name)[0] or "application/octet-stream",
+        headers={
+            "Content-Disposition": f"attachment; filename*=utf-8''{quote(name)}",
+            "Cache-Control": "no-store",
+        },
+    )
 
 
 @router.get("/jobs/{job_id}/file")
-def jobs_file(job_id: str):
+async def jobs_file(job_id: str, follow: bool = False):
+    """
+    The finished file (Range/conditional aware). With `follow=1`, a progressive
+    (single-stream) job is streamed while it downloads, ending when the job is
+    done; the connection is cut if it is paused, fails or is canceled first.
+    """
     try:
         job = jm.get_job(job_id)
     except KeyError:
         raise HTTPException(status_code=404, detail="Job not found")
 
+    if job.status != "done" and follow:
+        response = await _follow_response(job)
+        if response is not None:
+            return response
+
     # Only allow when finished
     if job.status != "done":
         raise HTTPException(status_code=409, detail=f"Job not done (status={job.status})")
 
-    # Primary path from yt-dlp
+    # recorded by the job's last post-processing step (job_manager._OutputProbe)
     path = job.filename
-    if not path or not os.path.isfile(path):
-        # Fallback: look for any file created in the job's temp dir (merge/rename quirks)
-        tmpdir = getattr(job, "tmpdir", None)
-        if tmpdir and os.path.isdir(tmpdir):
-            for name in os.listdir(tmpdir):
-                p = os.path.join(tmpdir, name)
-                if os.path.isfile(p):
-                    path = p
-                    break
-
     if not path or not os.path.isfile(path):
         raise HTTPException(status_code=404, detail="File not found on disk")
 
-    return FileResponse(
-        path,
-        media_type="application/octet-stream",
-        filename=os.path.basename(path),
-    )
+    jm.mark_accessed(job_id)
+    return _file_response(path)
+
+
+# ---------- Playlists ----------
+@router.post("/playlists/start", response_model=PlaylistResponse)
+def playlists_start(body: StartPlaylistRequest):
+    """Download every entry of a playlist/channel; entries become jobs as they are discovered."""
+    pl = playlist_jobs.start_playlist(str(body.url), body.format, priority=body.priority,
+                                      max_entries=body.max_entries)
+    return PlaylistResponse(**playlist_jobs.snapshot(pl))
+
+
+@router.get("/playlists", response_model=list[PlaylistResponse])
+def playlists_list():
+    return [PlaylistResponse(**playlist_jobs.snapshot(pl)) for pl in playlist_jobs.list_playlists()]
+
+
+@router.get("/playlists/{playlist_id}", response_model=PlaylistResponse)
+def playlists_get(playlist_id: str):
+    try:
+        return PlaylistResponse(**playlist_jobs.snapshot(playlist_jobs.get_playlist(playlist_id)))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Playlist not found")
+
+
+@router.post("/playlists/{playlist_id}/cancel", response_model=PlaylistResponse)
+def playlists_cancel(playlist_id: str):
+    try:
+        return PlaylistResponse(**playlist_jobs.snapshot(playlist_jobs.cancel_playlist(playlist_id)))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Playlist not found")
+
+
+@router.get("/playlists/{playlist_id}/entries")
+async def playlists_entries(playlist_id: str, request: Request):
+    """
+    NDJSON stream of the playlist's entry jobs (one JobResponse per line) in
+    playlist order, each sent as soon as it is discovered. Ends once expansion
+    is over; follow progress through /jobs/stream.
+    """
+    try:
+        pl = playlist_jobs.get_playlist(playlist_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Playlist not found")
+
+    async def lines():
+        sent = 0
+        async with job_events.subscribe() as sub:
+            while not await request.is_disconnected():
+                expanding = pl.status == "expanding"  # sampled first so the last entries aren't missed
+                for jid in playlist_jobs.entry_ids(pl, sent):
+                    sent += 1
+                    try:
+                        job = jm.get_job(jid)
+                    except KeyError:
+                        continue
+                    yield JobResponse(**_job_json(job)).model_dump_json() + "\n"
+                if not expanding:
+                    return
+                await sub.wait(settings.JOB_STREAM_KEEPALIVE)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"Cache-Control": "no-store"})
 
 
 # ---------- Image Proxy ----------
 @router.get("/proxy-image")
-async def proxy_image(url: str):
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url)
-            response.raise_for_status()
-            
-            return Response(
-                content=response.content,
-                media_type=response.headers.get("content-type", "image/jpeg"),
-                headers={
-                    "Cache-Control": "public, max-age=3600",
-                    "Access-Control-Allow-Origin": "*"
-                }
-            )
+async def proxy_image(request: Request, url: str, w: Optional[int] = None, fmt: Optional[str] = None):
+    """
+    Thumbnail through the shared client and the on-disk cache. The browser gets
+    ETag/Last-Modified of the cached file, so its own revalidations are 304s.
+
+    `w` (px) and/or `fmt` (webp|jpeg|auto) return a resized, re-encoded variant;
+    "auto" (the default when only `w` is given) picks WebP if the browser accepts it.
+    """
+    if fmt == "jpg":
+        fmt = "jpeg"
+    if fmt not in (None, "auto", *thumb_cache.FORMATS):
+        raise HTTPException(status_code=400, detail=f"Unsupported image format: {fmt}")
+    vary = {}
+    if (w or fmt) and fmt in (None, "auto"):
+        fmt = "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+        vary = {"Vary": "Accept"}
+    try:
+        if w or fmt:
+            path, meta = await thumb_cache.fetch_variant(url, w, fmt)
+        else:
+            path, meta = await thumb_cache.fetch(url)
+    except thumb_cache.ThumbTooLarge as e:
+        raise HTTPException(status_code=413, detail=f"Failed to proxy image: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to proxy image: {str(e)}")
+    return MediaFileResponse(
+        path,
+        media_type=meta.get("content_type") or "image/jpeg",
+        headers={
+            "Cache-Control": "public, max-age=3600",
+            "Access-Control-Allow-Origin": "*",
+            **vary,
+        },
+    )
+
+
+@router.get("/proxy-image/cache")
+def proxy_image_cache_stats():
+    return thumb_cache.cache.stats()
@@ -0,0 +1,171 @@
+# server/app/services/download_scheduler.py
+"""
+Bounded worker pool for download jobs.
+
+A fixed number of worker threads pull runnable jobs from a single queue, so
+"queued" really means "waiting for a slot". Admission is FIFO, or by priority
+(higher first, FIFO within the same priority) when policy == "priority".
+job_manager runs a second one for the post-processing (merge) stage.
+
+A job may come with a gate: a non-blocking callable that claims what the job
+needs besides a worker (its site's download slot) and returns False when that
+isn't available. A worker takes the first queued job whose gate opens, so a
+job for a saturated site waits in the queue instead of parking a worker, and
+jobs behind it for other sites go ahead. kick() re-checks gates (called when a
+site slot is released); gates are also retried every _GATE_POLL seconds.
+
+on_change() listeners hear about every change to the queue (a submit, a removal,
+a job taken by a worker), so queue positions can be republished.
+"""
+import heapq
+import itertools
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+_GATE_POLL = 0.5  # seconds between gate retries while every queued job is held back
+
+
+class DownloadScheduler:
+    def __init__(self, max_workers: int, policy: str = "fifo", name: str = "download"):
+        self.max_workers = max(1, max_workers)
+        self.policy = policy
+        self.name = name
+        # heap of (sort_key, seq, job_id); the callables live in _pending
+        self._heap: List[Tuple[Tuple, int, str]] = []
+        self._pending: Dict[str, Callable[[], None]] = {}
+        self._gates: Dict[str, Callable[[], bool]] = {}
+        self._running: set = set()
+        self._positions: Optional[Dict[str, int]] = None
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._workers: List[threading.Thread] = []
+        self._listeners: List[Callable[[], None]] = []
+
+    # ---------- public ----------
+    def submit(self, job_id: str, fn: Callable[[], None], priority: int = 0,
+               gate: Optional[Callable[[], bool]] = None) -> None:
+        self.submit_many([(job_id, fn, priority, gate)])
+
+    def submit_many(self, items: List[Tuple]) -> None:
+        """
+        Enqueue several jobs atomically (no worker sees a partial batch). Items are
+        (job_id, fn, priority) or (job_id, fn, priority, gate).
+        """
+        with self._cond:
+            for job_id, fn, priority, *gate in items:
+                if job_id in self._pending:
+                    continue
+                seq = next(self._seq)
+                key = (-priority, seq) if self.policy == "priority" else (seq,)
+                heapq.heappush(self._heap, (key, seq, job_id))
+                self._pending[job_id] = fn
+                if gate and gate[0] is not None:
+                    self._gates[job_id] = gate[0]
+            self._positions = None
+            self._ensure_workers()
+            self._cond.notify(len(items))
+        self._changed()
+
+    def remove(self, job_id: str) -> bool:
+        """Drop a job that is still waiting for a slot. False if it isn't queued."""
+        with self._cond:
+            if self._pending.pop(job_id, None) is None:
+                return False
+            self._gates.pop(job_id, None)
+            self._heap = [e for e in self._heap if e[2] != job_id]
+            heapq.heapify(self._heap)
+            self._positions = None
+        self._changed()
+        return True
+
+    def position(self, job_id: str) -> Optional[int]:
+        """1-based place in the queue, or None if the job isn't waiting."""
+        with self._cond:
+            if self._positions is None:
+                self._positions = {
+                    job_id: i + 1 for i, (_, _, job_id) in enumerate(sorted(self._heap))
+                }
+            return self._positions.get(job_id)
+
+    def on_change(self, fn: Callable[[], None]) -> None:
+        """Call `fn` (without arguments, outside the scheduler's lock) whenever the queue changes.
+        It may run on a caller's thread that holds other locks, so it must not block."""
+        self._listeners.append(fn)
+
+    def _changed(self) -> None:
+        for fn in self._listeners:
+            fn()
+
+    def kick(self) -> None:
+        """Something a gate waits for may have been freed: let idle workers look again."""
+        with self._cond:
+            if self._gates:
+                self._cond.notify_all()
+
+    def is_running(self, job_id: str) -> bool:
+        with self._cond:
+            return job_id in self._running
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "max_workers": self.max_workers,
+                "policy": self.policy,
+                "running": len(self._running),
+                "queued": len(self._pending),
+            }
+
+    # ---------- workers ----------
+    def _ensure_workers(self) -> None:
+        # caller holds _cond; workers are started lazily on first submit
+        while len(self._workers) < self.max_workers:
+            t = threading.Thread(
+                target=self._worker, name=f"{self.name}-worker-{len(self._workers)}", daemon=True
+            )
+            self._workers.append(t)
+            t.start()
+
+    def _open(self, job_id: str) -> bool:
+        gate = self._gates.get(job_id)
+        if gate is None:
+            return True
+        try:
+            return gate()
+        except Exception as e:  # let the job itself run into (and report) the problem
+            print(f"[WARN] {self.name} scheduler: gate of job {job_id} raised {e!r}")
+            return True
+
+    def _take(self) -> Optional[str]:
+        """Pop the first job, in admission order, whose gate opens (caller holds _cond)."""
+        if not self._heap:
+            return None
+        if self._open(self._heap[0][2]):
+            return heapq.heappop(self._heap)[2]
+        for entry in sorted(self._heap)[1:]:
+            if self._open(entry[2]):
+                self._heap.remove(entry)
+                heapq.heapify(self._heap)
+                return entry[2]
+        return None
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    job_id = self._take()
+                    if job_id is not None:
+                        break
+                    # nothing queued, or every queued job held back by its gate
+                    self._cond.wait(_GATE_POLL if self._heap else None)
+                fn = self._pending.pop(job_id)
+                self._gates.pop(job_id, None)
+                self._running.add(job_id)
+                self._positions = None
+            self._changed()
+            try:
+                fn()
+            except Exception as e:  # _run_job handles its own errors; never kill a worker
+                print(f"[WARN] {self.name} worker: job {job_id} raised {e!r}")
+            finally:
+                with self._cond:
+                    self._running.discard(job_id)
@@ -0,0 +1,247 @@
+# server/app/services/extract_pool.py
+"""
+Process pool for yt-dlp metadata extraction.
+
+yt-dlp's extraction is CPU-heavy Python (player JS, JSON munging); run in the
+API process it competes with request handling for the GIL. EXTRACT_WORKERS
+child processes do it instead, each started once (spawn) and warmed up by
+importing yt-dlp and the common extractors.
+
+Each worker has a dispatcher thread in this process that feeds it calls from
+one queue and waits on its pipe. A call has a deadline (counted from submit,
+so queueing counts) and can be cancelled; either way the worker is killed
+mid-extraction and replaced with a fresh one, so abandoned work never piles up.
+Callers get a concurrent.futures.Future.
+"""
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+from ..config import settings
+
+_POLL = 0.1  # seconds between deadline/cancel checks while a worker is busy
+_WARM_EXTRACTORS = ("Youtube", "YoutubeTab", "Facebook", "Instagram", "Twitter", "Generic")
+
+
+class ExtractTimeout(Exception):
+    """The extraction did not finish before its deadline."""
+
+
+class ExtractCanceled(Exception):
+    """Nobody is waiting for the extraction any more."""
+
+
+# ---------- child process ----------
+def _worker_main(conn) -> None:
+    import yt_dlp
+
+    with yt_dlp.YoutubeDL({"quiet": True}) as ydl:
+        for name in _WARM_EXTRACTORS:
+            try:
+                ydl.get_info_extractor(name)
+            except Exception:
+                pass
+    try:
+        conn.send(("ready", None))
+        while True:
+            url, opts = conn.recv()
+            try:
+                with yt_dlp.YoutubeDL(opts) as ydl:
+                    info = ydl.extract_info(url, download=False)
+                reply = (True, yt_dlp.YoutubeDL.sanitize_info(info))
+            except Exception as e:
+                reply = (False, (type(e).__name__, str(e)))
+            conn.send(reply)
+    except (EOFError, OSError):
+        return  # the parent went away
+
+
+def _rebuild_error(name: str, message: str) -> Exception:
+    # keep yt-dlp's error type where callers look at it
+    if name == "DownloadError":
+        import yt_dlp
+        return yt_dlp.utils.DownloadError(message)
+    return RuntimeError(message)
+
+
+# ---------- parent side ----------
+class ExtractCall:
+    def __init__(self, url: str, opts: Dict, timeout: Optional[float],
+                 cancel: Optional[threading.Event] = None):
+        self.url = url
+        self.opts = opts
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.future: Future = Future()
+        self._cancel = cancel or threading.Event()
+
+    def cancel(self) -> None:
+        """Abandon the call; a worker running it is killed."""
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def result(self) -> Dict:
+        return self.future.result()
+
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_worker_main, args=(child,), name="extract-worker", daemon=True)
+        self.proc.start()
+        child.close()
+        self.ready = False
+
+    def kill(self) -> None:
+        try:
+            self.proc.kill()
+            self.proc.join(5)
+        finally:
+            self.conn.close()
+
+
+class ExtractPool:
+    def __init__(self, workers: int):
+        self.size = workers
+        self._ctx = multiprocessing.get_context("spawn")
+        self._queue: "queue.Queue[ExtractCall]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._workers: List[Optional[_Worker]] = [None] * workers
+        self._lock = threading.Lock()
+        self._stopped = False
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.restarts = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def start(self) -> None:
+        """Spawn and warm the workers (called on boot; submit() also starts them lazily)."""
+        with self._lock:
+            if self._threads or not self.enabled:
+                return
+            for i in range(self.size):
+                self._workers[i] = _Worker(self._ctx)
+                t = threading.Thread(target=self._serve, args=(i,), name=f"extract-dispatch-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def stop(self) -> None:
+        """Kill the workers; calls still queued or submitted later fail with ExtractCanceled."""
+        with self._lock:
+            self._stopped = True
+            workers, self._workers = self._workers, [None] * self.size
+        for w in workers:
+            if w is not None:
+                w.kill()
+
+    def submit(self, url: str, opts: Dict, timeout: Optional[float] = None,
+               cancel: Optional[threading.Event] = None) -> ExtractCall:
+        """Queue an extraction; setting `cancel` (or call.cancel()) abandons it."""
+        self.start()
+        call = ExtractCall(url, opts, timeout, cancel)
+        self._queue.put(call)
+        return call
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.size,
+            "queued": self._queue.qsize(),
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+            "restarts": self.restarts,
+        }
+
+    # ---------- dispatcher thread, one per worker ----------
+    def _serve(self, slot: int) -> None:
+        while True:
+            call = self._queue.get()
+            if self._abandoned(call):
+                continue
+            worker = self._workers[slot]
+            if worker is None or not worker.proc.is_alive():
+                worker = self._replace(slot, worker)
+                if worker is None:
+                    self._abandoned(call)  # stopped meanwhile
+                    continue
+            if not self._run(worker, call):
+                # killed mid-call or died: start the replacement now so it is warm for the next call
+                self._replace(slot, worker)
+
+    def _abandoned(self, call: ExtractCall) -> bool:
+        if call.cancelled or self._stopped:
+            self.cancelled += 1
+            call.future.set_exception(ExtractCanceled(f"extraction of {call.url} canceled"))
+            return True
+        if call.expired():
+            self.timeouts += 1
+            call.future.set_exception(ExtractTimeout(f"extraction of {call.url} timed out"))
+            return True
+        return False
+
+    def _replace(self, slot: int, old: Optional[_Worker]) -> Optional[_Worker]:
+        """Kill `old` and start a fresh worker in its slot (None once the pool is stopped)."""
+        if old is not None:
+            old.kill()
+            self.restarts += 1
+        with self._lock:
+            if self._stopped:
+                return None
+            worker = _Worker(self._ctx)
+            self._workers[slot] = worker
+        return worker
+
+    def _wait(self, worker: _Worker, call: ExtractCall):
+        """Next message from the worker, or None once the call is abandoned or the worker died."""
+        while not worker.conn.poll(_POLL):
+            if self._abandoned(call) or not worker.proc.is_alive():
+                return None
+        try:
+            return worker.conn.recv()
+        except (EOFError, OSError):
+            return None
+
+    def _run(self, worker: _Worker, call: ExtractCall) -> bool:
+        """Run `call` on `worker`. Returns False if the worker had to be given up."""
+        if not worker.ready:
+            if self._wait(worker, call) is None:
+                if worker.proc.is_alive():
+                    return True  # call abandoned while the worker warms up; keep warming it
+                self._fail_if_pending(call, "extraction worker failed to start")
+                return False
+            worker.ready = True
+        worker.conn.send((call.url, call.opts))
+        msg = self._wait(worker, call)
+        if msg is None:
+            self._fail_if_pending(call, "extraction worker exited")
+            return False
+        ok, payload = msg
+        if ok:
+            self.completed += 1
+            call.future.set_result(payload)
+        else:
+            self.failed += 1
+            call.future.set_exception(_rebuild_error(*payload))
+        return True
+
+    def _fail_if_pending(self, call: ExtractCall, message: str) -> None:
+        if not call.future.done():
+            self.failed += 1
+            call.future.set_exception(RuntimeError(message))
+
+
+pool = ExtractPool(settings.EXTRACT_WORKERS)
@@ -0,0 +1,135 @@
+# server/app/services/file_serving.py
+"""
+File responses for finished downloads.
+
+MediaFileResponse builds on Starlette's FileResponse (single/multi Range,
+If-Range, ETag, Last-Modified, and the ASGI "http.response.pathsend" extension
+when the server offers it) and adds:
+  - 304 Not Modified for If-None-Match / If-Modified-Since
+  - the multipart/byteranges Content-Type on multi-range responses
+  - 1 MiB reads instead of 64 KiB
+
+follow_file() streams a file that is still being written (a progressive
+download's .part file) for GET /jobs/{id}/file?follow=1.
+"""
+import os
+import stat
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Callable, List
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.types import Receive, Scope, Send
+
+from . import job_events
+
+_FOLLOW_CHUNK = 1024 * 1024
+_FOLLOW_POLL = 1.0  # fallback re-check when no job event arrives
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    weak = lambda t: t.strip().removeprefix("W/")
+    return any(weak(t) == weak(etag) for t in if_none_match.split(","))
+
+
+def _not_modified(request_headers: Headers, response_headers) -> bool:
+    etag = response_headers.get("etag")
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match wins over If-Modified-Since (RFC 9110 13.2.2)
+        return bool(etag) and _etag_matches(if_none_match, etag)
+    if_modified_since = request_headers.get("if-modified-since")
+    last_modified = response_headers.get("last-modified")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class MediaFileResponse(FileResponse):
+    chunk_size = 1024 * 1024
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.stat_result is None:
+            try:
+                st = await anyio.to_thread.run_sync(os.stat, self.path)
+            except FileNotFoundError:
+                raise RuntimeError(f"File at path {self.path} does not exist.")
+            if not stat.S_ISREG(st.st_mode):
+                raise RuntimeError(f"File at path {self.path} is not a file.")
+            self.stat_result = st
+            self.set_stat_headers(st)
+
+        if scope["method"].upper() in ("GET", "HEAD") and _not_modified(Headers(scope=scope), self.headers):
+            keep = {k: v for k, v in self.headers.items()
+                    if k in ("etag", "last-modified", "cache-control", "accept-ranges")}
+            return await Response(status_code=304, headers=keep)(scope, receive, send)
+
+        async def send_fixed(message):
+            # Starlette puts "multipart/byteranges; boundary=..." in Content-Range;
+            # clients look for it in Content-Type
+            if message["type"] == "http.response.start":
+                multipart = dict(message["headers"]).get(b"content-range")
+                if multipart and multipart.startswith(b"multipart/"):
+                    message = {**message, "headers": [
+                        (k, v) for k, v in message["headers"]
+                        if k not in (b"content-type", b"content-range")
+                    ] + [(b"content-type", multipart)]}
+            await send(message)
+
+        await super().__call__(scope, receive, send_fixed)
+
+
+class FollowAborted(Exception):
+    """The writer stopped (paused, failed, canceled, restarted) before the file was complete."""
+
+
+def _open_first(paths: List[str]):
+    for p in paths:
+        try:
+            return open(p, "rb")
+        except FileNotFoundError:
+            continue
+    return None
+
+
+async def follow_file(paths: Callable[[], List[str]], state: Callable[[], str]) -> AsyncIterator[bytes]:
+    """
+    Yield a growing file's bytes as they are written.
+
+    `paths()` lists where the file may currently be (e.g. "x.mp4.part", then
+    "x.mp4" once renamed); the first one that opens is read to the end, since an
+    open handle survives the rename. `state()` is "writing", "complete" or
+    "failed". At EOF we wait for the next job event (progress publish) rather
+    than spinning; the client's read rate paces us because each chunk is only
+    read after the previous send completed.
+    """
+    f = None
+    offset = 0
+    try:
+        async with job_events.subscribe() as sub:
+            while True:
+                # sample the state before reading so the final bytes of a completed file aren't missed
+                st = state()
+                if f is None:
+                    f = _open_first(paths())
+                chunk = await anyio.to_thread.run_sync(f.read, _FOLLOW_CHUNK) if f else b""
+                if chunk:
+                    offset += len(chunk)
+                    yield chunk
+                    continue
+                if st == "failed" or (st == "complete" and f is None):
+                    raise FollowAborted()
+                if st == "complete":
+                    return
+                if f is not None and os.fstat(f.fileno()).st_size < offset:
+                    raise FollowAborted()  # writer truncated the file and started over
+                await sub.wait(_FOLLOW_POLL)
+    finally:
+        if f is not None:
+            f.close()
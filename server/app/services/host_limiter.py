@@ -0,0 +1,169 @@
+# server/app/services/host_limiter.py
+"""
+Per-site concurrency caps and token-bucket rate limiting.
+
+Every yt-dlp session against a site family (youtube / facebook / instagram /
+twitter, as mapped by ytdlp_service._site_for) takes one slot for its whole
+duration and one token when it starts. Downloads and metadata extractions have
+separate slot pools (HOST_LIMITS / HOST_EXTRACT_LIMITS), so long transfers
+never starve /info; the token bucket (HOST_LIMITS rate) is shared by both.
+Sites without an entry are not limited.
+
+Blocking callers use slot()/acquire(). The download scheduler instead claims a
+slot with try_acquire() before a job gets a worker, and is woken through
+on_release() when a slot frees up.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from ..config import settings
+
+_POLL = 0.5  # seconds between abort checks while blocked
+
+KINDS = ("download", "extract")
+
+
+class SiteLimiter:
+    def __init__(self, max_sessions: int, rate: float, max_extractions: int = 0,
+                 on_release: Optional[Callable[[], None]] = None):
+        self.caps = {"download": max_sessions, "extract": max_extractions}
+        self.rate = rate                      # session starts per second (0 = unlimited)
+        self._sems = {kind: threading.BoundedSemaphore(n) if n > 0 else None for kind, n in self.caps.items()}
+        self._burst = max(1.0, rate)
+        self._tokens = self._burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._on_release = on_release
+        self.active = {kind: 0 for kind in KINDS}
+        self.blocked_seconds = 0.0
+
+    def _take_token(self) -> float:
+        """Consume a token; returns how long to wait before it is available (0 = taken)."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return 0.0
+            return (1.0 - self._tokens) / self.rate
+
+    def acquire(self, check: Optional[Callable[[], None]] = None, kind: str = "download",
+                token: bool = True) -> float:
+        """Block until a slot and (unless token=False) a token are available. Returns
+        seconds spent waiting. `check` is called while blocked and may raise to abandon the wait."""
+        start = time.monotonic()
+        sem = self._sems[kind]
+        if sem is not None:
+            while not sem.acquire(timeout=_POLL):
+                if check:
+                    check()
+        try:
+            while token:
+                wait = self._take_token()
+                if wait <= 0:
+                    break
+                if check:
+                    check()
+                time.sleep(min(wait, _POLL))
+        except BaseException:
+            if sem is not None:
+                sem.release()
+            raise
+        waited = time.monotonic() - start
+        with self._lock:
+            self.active[kind] += 1
+            self.blocked_seconds += waited
+        return waited
+
+    def try_acquire(self, kind: str = "download") -> bool:
+        """Take a slot and a token if both are free right now; never blocks."""
+        sem = self._sems[kind]
+        if sem is not None and not sem.acquire(blocking=False):
+            return False
+        if self._take_token() > 0:
+            if sem is not None:
+                sem.release()
+            return False
+        with self._lock:
+            self.active[kind] += 1
+        return True
+
+    def note_blocked(self, seconds: float) -> None:
+        with self._lock:
+            self.blocked_seconds += seconds
+
+    def release(self, kind: str = "download") -> None:
+        with self._lock:
+            self.active[kind] -= 1
+        sem = self._sems[kind]
+        if sem is not None:
+            sem.release()
+        if self._on_release:
+            self._on_release()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "max_sessions": self.caps["download"],
+                "max_extractions": self.caps["extract"],
+                "rate_per_second": self.rate,
+                "active": self.active["download"],
+                "active_extractions": self.active["extract"],
+                "blocked_seconds": round(self.blocked_seconds, 3),
+            }
+
+
+class HostLimiter:
+    def __init__(self, limits: Dict[str, Tuple[int, float]], extract_limits: Optional[Dict[str, int]] = None):
+        extract_limits = extract_limits or {}
+        self._listeners: List[Callable[[], None]] = []
+        self._sites = {
+            site: SiteLimiter(*limits.get(site, (0, 0.0)), extract_limits.get(site, 0), on_release=self._released)
+            for site in {*limits, *extract_limits}
+        }
+
+    def for_site(self, site: Optional[str]) -> Optional[SiteLimiter]:
+        return self._sites.get(site or "")
+
+    def on_release(self, fn: Callable[[], None]) -> None:
+        """Call `fn` (without arguments, outside any limiter lock) whenever a slot is released."""
+        self._listeners.append(fn)
+
+    def _released(self) -> None:
+        for fn in self._listeners:
+            fn()
+
+    @contextmanager
+    def slot(self, site: Optional[str], check: Optional[Callable[[], None]] = None,
+             kind: str = "download", token: bool = True) -> Iterator[float]:
+        """Hold one `kind` slot for `site` for the duration of the block; yields seconds blocked.
+        token=False skips the rate limit (for work that continues an already started session)."""
+        limiter = self.for_site(site)
+        if limiter is None:
+            yield 0.0
+            return
+        waited = limiter.acquire(check, kind, token)
+        try:
+            yield waited
+        finally:
+            limiter.release(kind)
+
+    def try_acquire(self, site: Optional[str], kind: str = "download") -> bool:
+        limiter = self.for_site(site)
+        return limiter is None or limiter.try_acquire(kind)
+
+    def release(self, site: Optional[str], kind: str = "download") -> None:
+        limiter = self.for_site(site)
+        if limiter is not None:
+            limiter.release(kind)
+
+    def stats(self) -> Dict:
+        return {site: lim.stats() for site, lim in self._sites.items()}
+
+
+limiter = HostLimiter(settings.HOST_LIMITS, settings.HOST_EXTRACT_LIMITS)
@@ -0,0 +1,188 @@
+# server/app/services/info_cache.py
+"""
+Bounded in-memory cache for yt-dlp metadata (extract_info results).
+
+- keyed on the normalized URL (see ytdlp_service._normalize_youtube_url)
+- TTL per entry, LRU eviction, and a soft memory ceiling
+- request coalescing: concurrent lookups for the same key share one in-flight
+  extraction instead of each starting their own
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional, Tuple
+
+from ..config import settings
+
+
+def _approx_size(value: Dict) -> int:
+    """Rough byte size of an info dict (its compact JSON encoding)."""
+    try:
+        return len(json.dumps(value, separators=(",", ":"), default=str))
+    except Exception:
+        return 0
+
+
+class InfoCache:
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (expires_at, size, value); order = LRU (oldest first)
+        self._entries: "OrderedDict[str, Tuple[float, int, Dict]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    # ---------- plain get/put ----------
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            return self._get_locked(key)
+
+    def put(self, key: str, value: Dict, ttl: Optional[float] = None) -> None:
+        if not self.enabled:
+            return
+        size = _approx_size(value)
+        if self.max_bytes and size > self.max_bytes:
+            return  # would evict everything else; not worth caching
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._drop_locked(key)
+            self._entries[key] = (expires_at, size, value)
+            self._bytes += size
+            self._evict_locked()
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._drop_locked(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    # ---------- coalescing ----------
+    def claim(self, key: str) -> Tuple[Optional[Dict], Optional[Future], bool]:
+        """
+        Look up `key` and, on a miss, register interest in its extraction.
+        Returns (value, future, is_leader):
+          - (value, None, False): cache hit
+          - (None, future, True): caller must run the extraction and call
+            resolve()/fail() with the outcome
+          - (None, future, False): someone else is extracting; wait on future
+        """
+        with self._lock:
+            value = self._get_locked(key)
+            if value is not None:
+                return value, None, False
+            fut = self._inflight.get(key)
+            if fut is not None:
+                self.coalesced += 1
+                return None, fut, False
+            fut = Future()
+            fut.set_running_or_notify_cancel()
+            self._inflight[key] = fut
+            return None, fut, True
+
+    def resolve(self, key: str, value: Dict, ttl: Optional[float] = None,
+                fut: Optional[Future] = None) -> None:
+        """Cache `value` and hand it to `key`'s waiters (those of `fut` if given:
+        a claim that was failed meanwhile may have been replaced by a newer one)."""
+        self.put(key, value, ttl=ttl)
+        fut = self._end_claim(key, fut)
+        if fut is not None and not fut.done():
+            fut.set_result(value)
+
+    def fail(self, key: str, exc: BaseException, fut: Optional[Future] = None) -> None:
+        fut = self._end_claim(key, fut)
+        if fut is not None and not fut.done():
+            fut.set_exception(exc)
+
+    def _end_claim(self, key: str, fut: Optional[Future]) -> Optional[Future]:
+        with self._lock:
+            if fut is None:
+                return self._inflight.pop(key, None)
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+            return fut
+
+    def get_or_load(self, key: str, loader: Callable[[], Dict]) -> Dict:
+        """Return the cached value or run `loader` once for all concurrent callers."""
+        if not self.enabled:
+            return loader()
+        value, fut, leader = self.claim(key)
+        if value is not None:
+            return value
+        if not leader:
+            return fut.result()
+        try:
+            value = loader()
+        except BaseException as e:
+            self.fail(key, e, fut)
+            raise
+        self.resolve(key, value, fut=fut)
+        return value
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "inflight": len(self._inflight),
+                "hit_ratio": (self.hits / total) if total else 0.0,
+            }
+
+    # ---------- internals (caller holds _lock) ----------
+    def _get_locked(self, key: str) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, _, value = entry
+        if expires_at <= time.monotonic():
+            self._drop_locked(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def _drop_locked(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def _evict_locked(self) -> None:
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            _, (_, size, _) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+
+# Process-wide cache used by ytdlp_service.extract_info
+cache = InfoCache(
+    ttl=settings.INFO_CACHE_TTL,
+    max_entries=settings.INFO_CACHE_MAX_ENTRIES,
+    max_bytes=settings.INFO_CACHE_MAX_BYTES,
+)
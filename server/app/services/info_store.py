@@ -0,0 +1,222 @@
+# server/app/services/info_store.py
+"""
+Optional persistent store for extract_info results (SQLite, WAL mode).
+
+Entries are zlib-compressed JSON keyed by the canonical URL, with a per-site
+expiry for the metadata itself and a separate (shorter) freshness deadline for
+the signed stream URLs inside the info dict. Metadata can keep serving /info
+after its stream URLs went stale; callers that need to download re-extract.
+
+That re-extraction replaces the whole entry, not just its formats: yt-dlp only
+hands out signed stream URLs from a full extraction, so there is no cheaper way
+to refresh them. The entry keeps its hit count (put() updates in place).
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+import yt_dlp
+
+from ..config import settings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS info (
+    key               TEXT PRIMARY KEY,
+    site              TEXT,
+    data              BLOB NOT NULL,
+    extracted_at      REAL NOT NULL,
+    expires_at        REAL NOT NULL,
+    streams_expire_at REAL NOT NULL,
+    hits              INTEGER NOT NULL DEFAULT 0,
+    last_access       REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS info_hits ON info (hits DESC, last_access DESC);
+CREATE INDEX IF NOT EXISTS info_expires ON info (expires_at);
+"""
+
+
+# --------------------------- Stream URL freshness ---------------------------
+
+def _url_expiry(url: str) -> Optional[float]:
+    """Expiry timestamp embedded in a signed CDN URL, if any."""
+    try:
+        q = parse_qs(urlparse(url).query)
+    except Exception:
+        return None
+    # googlevideo: expire=<unix ts>
+    if q.get("expire"):
+        try:
+            return float(q["expire"][0])
+        except ValueError:
+            pass
+    # fbcdn / cdninstagram: oe=<hex unix ts>
+    if q.get("oe"):
+        try:
+            return float(int(q["oe"][0], 16))
+        except ValueError:
+            pass
+    return None
+
+
+def streams_expire_at(info: Dict) -> float:
+    """
+    When the stream URLs in `info` stop working: the earliest expiry embedded in the
+    format URLs, or extraction time + INFO_STORE_STREAM_TTL when the site doesn't sign them.
+    """
+    extracted_at = float(info.get("epoch") or time.time())
+    expiries = []
+    for f in info.get("formats") or []:
+        u = f.get("url") if isinstance(f, dict) else None
+        if u:
+            exp = _url_expiry(u)
+            if exp:
+                expiries.append(exp)
+    if expiries:
+        return min(expiries)
+    return extracted_at + settings.INFO_STORE_STREAM_TTL
+
+
+def streams_fresh(info: Dict, margin: float = 60.0) -> bool:
+    """Whether `info`'s stream URLs stay usable for another `margin` seconds (else re-extract it all)."""
+    return streams_expire_at(info) - margin > time.time()
+
+
+# --------------------------- Store ---------------------------
+
+class InfoStore:
+    def __init__(self, path: str, default_ttl: int, site_ttls: Dict[str, int]):
+        self.path = path
+        self.default_ttl = default_ttl
+        self.site_ttls = site_ttls
+        self._local = threading.local()
+        if self.enabled:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            conn = self._conn()
+            conn.executescript(_SCHEMA)
+            conn.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def ttl_for(self, site: Optional[str]) -> int:
+        return self.site_ttls.get(site or "", self.default_ttl)
+
+    @staticmethod
+    def _encode(info: Dict) -> bytes:
+        clean = yt_dlp.YoutubeDL.sanitize_info(info)
+        return zlib.compress(json.dumps(clean, separators=(",", ":")).encode("utf-8"), 6)
+
+    @staticmethod
+    def _decode(blob: bytes) -> Dict:
+        return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Unexpired metadata for `key` (its stream URLs may be stale; see streams_fresh)."""
+        if not self.enabled:
+            return None
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT data FROM info WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE info SET hits = hits + 1, last_access = ? WHERE key = ?", (now, key)
+            )
+            conn.commit()
+            return self._decode(row[0])
+        except Exception as e:
+            print(f"[WARN] info store read failed: {e}")
+            return None
+
+    def put(self, key: str, site: Optional[str], info: Dict) -> None:
+        if not self.enabled:
+            return
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute(
+                """
+                INSERT INTO info (key, site, data, extracted_at, expires_at, streams_expire_at, hits, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, 0, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    site = excluded.site,
+                    data = excluded.data,
+                    extracted_at = excluded.extracted_at,
+                    expires_at = excluded.expires_at,
+                    streams_expire_at = excluded.streams_expire_at,
+                    last_access = excluded.last_access
+                """,
+                (key, site, self._encode(info), now, now + self.ttl_for(site),
+                 streams_expire_at(info), now),
+            )
+            conn.commit()
+        except Exception as e:
+            print(f"[WARN] info store write failed: {e}")
+
+    def hottest(self, limit: int) -> List[Tuple[str, Dict, float]]:
+        """Most-requested unexpired entries as (key, info, seconds_left)."""
+        if not self.enabled or limit <= 0:
+            return []
+        now = time.time()
+        out = []
+        try:
+            rows = self._conn().execute(
+                "SELECT key, data, expires_at FROM info WHERE expires_at > ? "
+                "ORDER BY hits DESC, last_access DESC LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            for key, blob, expires_at in rows:
+                out.append((key, self._decode(blob), expires_at - now))
+        except Exception as e:
+            print(f"[WARN] info store warm-up failed: {e}")
+        return out
+
+    def purge_expired(self) -> int:
+        if not self.enabled:
+            return 0
+        conn = self._conn()
+        cur = conn.execute("DELETE FROM info WHERE expires_at <= ?", (time.time(),))
+        conn.commit()
+        return cur.rowcount
+
+    def stats(self) -> Dict:
+        if not self.enabled:
+            return {"enabled": False}
+        now = time.time()
+        row = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0), "
+            "COALESCE(SUM(streams_expire_at <= ?), 0) FROM info WHERE expires_at > ?",
+            (now, now),
+        ).fetchone()
+        return {
+            "enabled": True,
+            "path": self.path,
+            "entries": row[0],
+            "compressed_bytes": row[1],
+            "stale_streams": row[2],
+        }
+
+
+store = InfoStore(
+    path=settings.INFO_STORE_PATH,
+    default_ttl=settings.INFO_STORE_TTL,
+    site_ttls=settings.INFO_STORE_SITE_TTLS,
+)
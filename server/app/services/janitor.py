@@ -0,0 +1,177 @@
+# server/app/services/janitor.py
+"""
+Background cleanup of finished jobs and temp directories.
+
+- finished jobs are forgotten (record + mdjob_* dir) after a per-status retention
+- when job dirs exceed DOWNLOAD_DISK_QUOTA, finished jobs are evicted least
+  recently downloaded first (last GET /jobs/{id}/file, else finish time)
+- one-shot /download dirs (md_*) are removed once nothing was written to them
+  for ONESHOT_RETENTION, never while a /download is still filling them
+- at startup, mdjob_* dirs that no job refers to are swept
+- playlists are forgotten PLAYLIST_RETENTION after their expansion ended, once
+  none of their entry jobs is still running
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Dict, Optional
+
+from ..config import settings
+from . import job_manager as jm
+from . import playlist_jobs
+from .ytdlp_service import oneshot_dirs_in_use
+
+_STATS = {
+    "reclaimed_bytes": 0,       # total since boot
+    "jobs_removed": 0,
+    "dirs_swept": 0,
+    "footprint_bytes": 0,       # job + one-shot temp dirs at the last sweep
+    "last_sweep": None,
+}
+_STATS_LOCK = threading.Lock()
+_THREAD: Optional[threading.Thread] = None
+
+
+def _tmp_dirs(prefix: str):
+    root = tempfile.gettempdir()
+    try:
+        for entry in os.scandir(root):
+            if entry.name.startswith(prefix) and entry.is_dir(follow_symlinks=False):
+                yield entry.path
+    except OSError:
+        return
+
+
+def _record(reclaimed: int = 0, jobs: int = 0, dirs: int = 0) -> None:
+    with _STATS_LOCK:
+        _STATS["reclaimed_bytes"] += reclaimed
+        _STATS["jobs_removed"] += jobs
+        _STATS["dirs_swept"] += dirs
+
+
+def _remove_dir(path: str) -> int:
+    size = jm.dir_size(path, freeable=True)
+    shutil.rmtree(path, ignore_errors=True)
+    return size
+
+
+def sweep_orphans() -> int:
+    """Delete mdjob_* dirs not owned by any job and stale md_* dirs. Returns bytes reclaimed."""
+    owned = {os.path.normpath(j.tmpdir) for j in jm.list_jobs()}
+    reclaimed, dirs = 0, 0
+    for path in _tmp_dirs("mdjob_"):
+        if os.path.normpath(path) not in owned:
+            reclaimed += _remove_dir(path)
+            dirs += 1
+    # the usual age rule: a recently written md_* dir may belong to another server process
+    r, d = _sweep_oneshot(settings.ONESHOT_RETENTION)
+    _record(reclaimed + r, dirs=dirs + d)
+    if dirs or d:
+        print(f"[DEBUG] janitor swept {dirs + d} orphaned temp dirs ({reclaimed + r} bytes)")
+    return reclaimed + r
+
+
+def _last_write(path: str) -> float:
+    """Newest mtime of a one-shot dir and its files (writing into a file doesn't touch the dir's)."""
+    newest = os.path.getmtime(path)
+    for entry in os.scandir(path):
+        try:
+            newest = max(newest, entry.stat(follow_symlinks=False).st_mtime)
+        except OSError:
+            pass
+    return newest
+
+
+def _sweep_oneshot(max_age: float):
+    reclaimed, dirs = 0, 0
+    now = time.time()
+    in_use = {os.path.normpath(p) for p in oneshot_dirs_in_use()}
+    for path in _tmp_dirs("md_"):
+        if os.path.normpath(path) in in_use:
+            continue
+        try:
+            age = now - _last_write(path)
+        except OSError:
+            continue
+        if age >= max_age:
+            reclaimed += _remove_dir(path)
+            dirs += 1
+    return reclaimed, dirs
+
+
+def sweep() -> Dict:
+    """One pass: retention, then disk quota, then one-shot dirs and playlists. Returns current stats."""
+    now = time.time()
+    reclaimed, removed = 0, 0
+    finished = [j for j in jm.list_jobs() if j.status in jm.TERMINAL_STATUSES]
+
+    # 1) retention per status
+    for job in finished:
+        keep = settings.JOB_RETENTION.get(job.status)
+        if keep is not None and job.finished_at and now - job.finished_at > keep:
+            reclaimed += jm.remove_job(job.id)
+            removed += 1
+
+    # 2) disk quota, LRU by last download (or finish time if never downloaded);
+    # a reused output is hard-linked into several job dirs but takes its space once
+    seen = set()
+    footprint = sum(jm.dir_size(j.tmpdir, seen) for j in jm.list_jobs())
+    if settings.DOWNLOAD_DISK_QUOTA and footprint > settings.DOWNLOAD_DISK_QUOTA:
+        candidates = sorted(
+            (j for j in jm.list_jobs() if j.status in jm.TERMINAL_STATUSES),
+            key=lambda j: j.last_accessed or j.finished_at or 0,
+        )
+        for job in candidates:
+            if footprint <= settings.DOWNLOAD_DISK_QUOTA:
+                break
+            # nothing is freed for a file another job still links to
+            freed = jm.remove_job(job.id)
+            footprint -= freed
+            reclaimed += freed
+            removed += 1
+
+    # 3) one-shot /download dirs
+    r, dirs = _sweep_oneshot(settings.ONESHOT_RETENTION)
+    reclaimed += r
+    footprint += sum(jm.dir_size(p, seen) for p in _tmp_dirs("md_"))
+
+    # 4) playlists (in memory only; their entry jobs went through 1 and 2)
+    playlists = playlist_jobs.prune(settings.PLAYLIST_RETENTION)
+
+    _record(reclaimed, jobs=removed, dirs=dirs)
+    with _STATS_LOCK:
+        _STATS["footprint_bytes"] = footprint
+        _STATS["last_sweep"] = now
+    if removed or dirs or playlists:
+        print(f"[DEBUG] janitor removed {removed} jobs, {dirs} one-shot dirs, {playlists} playlists, "
+              f"reclaimed {reclaimed} bytes")
+    return stats()
+
+
+def stats() -> Dict:
+    with _STATS_LOCK:
+        out = dict(_STATS)
+    out["disk_quota_bytes"] = settings.DOWNLOAD_DISK_QUOTA
+    out["retention_seconds"] = settings.JOB_RETENTION
+    return out
+
+
+def _loop() -> None:
+    while True:
+        time.sleep(settings.JANITOR_INTERVAL)
+        try:
+            sweep()
+        except Exception as e:
+            print(f"[WARN] janitor sweep failed: {e}")
+
+
+def start() -> None:
+    """Sweep orphans left by a previous run, then keep sweeping in the background."""
+    global _THREAD
+    if _THREAD is not None:
+        return
+    sweep_orphans()
+    _THREAD = threading.Thread(target=_loop, name="janitor", daemon=True)
+    _THREAD.start()
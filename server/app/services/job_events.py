@@ -0,0 +1,53 @@
+# server/app/services/job_events.py
+"""
+Wake-ups for async consumers of job changes (SSE stream, long-poll).
+
+Download threads call notify() after bumping the job store version; each
+subscriber owns an asyncio.Event that is set on its own loop. Subscribers then
+pull whatever changed since the last version they saw, so any number of
+notifications between two reads collapse into one update.
+"""
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Set, Tuple
+
+_SUBSCRIBERS: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+_SUB_LOCK = threading.Lock()
+
+
+def notify() -> None:
+    """Called from any thread when a job changed."""
+    with _SUB_LOCK:
+        subs = list(_SUBSCRIBERS)
+    for loop, event in subs:
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            pass  # loop already closed; subscriber is going away
+
+
+class Subscription:
+    def __init__(self, event: asyncio.Event):
+        self._event = event
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait until something changed (True) or `timeout` elapsed (False)."""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self._event.clear()
+        return True
+
+
+@asynccontextmanager
+async def subscribe() -> AsyncIterator[Subscription]:
+    entry = (asyncio.get_running_loop(), asyncio.Event())
+    with _SUB_LOCK:
+        _SUBSCRIBERS.add(entry)
+    try:
+        yield Subscription(entry[1])
+    finally:
+        with _SUB_LOCK:
+            _SUBSCRIBERS.discard(entry)
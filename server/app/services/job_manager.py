@@ -1,11 +1,39 @@
 # server/app/services/job_manager.py
-import os, tempfile, threading, uuid, time, shutil
-from dataclasses import dataclass, field, asdict
-from typing import Dict, Optional
+import os, tempfile, threading, uuid, time, shutil, socket, weakref
+from dataclasses import dataclass, field, asdict, fields
+from typing import Dict, List, Optional, Set, Tuple
 import yt_dlp
+from yt_dlp.postprocessor import FFmpegPostProcessor, PostProcessor
 
+from ..config import settings
 from .ytdlp_service import _cookies_for  # reuse your cookies helper
 from .ytdlp_service import _normalize_youtube_url  # normalize YT watch URLs to single video
+from .ytdlp_service import _site_for, extract_info, select_format
+from .info_store import streams_fresh
+from .host_limiter import limiter as host_limiter
+from .download_scheduler import DownloadScheduler
+from . import job_events
+from .job_store import store as job_store
+
+class _Progress:
+    """
+    Latest progress reported by yt-dlp for one job. The hook writes here under a
+    per-job lock only; values reach the Job (and API readers) when they are
+    published under _LOCK, at most every PROGRESS_PUBLISH_INTERVAL seconds or
+    when progress moved by PROGRESS_PUBLISH_STEP.
+    """
+    __slots__ = ("lock", "downloaded_bytes", "total_bytes", "speed_bps", "eta_seconds",
+                 "filename", "published_at", "published_progress")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.downloaded_bytes = 0
+        self.total_bytes: Optional[int] = None
+        self.speed_bps: Optional[float] = None
+        self.eta_seconds: Optional[int] = None
+        self.filename: Optional[str] = None
+        self.published_at = 0.0
+        self.published_progress = -1.0
 
 @dataclass
 class Job:
@@ -23,18 +51,241 @@ class Job:
     filename: Optional[str] = None
     tmpdir: str = field(default_factory=lambda: tempfile.mkdtemp(prefix="mdjob_"))
     error: Optional[str] = None
+    priority: int = 0                   # admission order when DOWNLOAD_QUEUE_POLICY=priority
+    blocked_seconds: float = 0.0        # time spent waiting on per-site limits (throttling, not slowness)
+    version: int = 0                    # store version of this job's last change
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None     # when it reached done/error/canceled (retention clock)
+    last_accessed: Optional[float] = None   # last GET /jobs/{id}/file (quota eviction order)
+    source_job_id: Optional[str] = None     # job whose download this one reuses (dedup)
+    progressive: Optional[bool] = None      # single stream, servable while it downloads (None until formats are chosen)
+    format_id: Optional[str] = None         # concrete formats format_string resolved to (e.g. "137+140"); kept so a resume continues the same .part files
+    playlist_id: Optional[str] = None       # playlist job that created this one (playlist_jobs)
+    batch_id: Optional[str] = None          # POST /jobs/batch submission this job belongs to
+    clip_start: Optional[float] = None      # only download this section (seconds; see _clip_range)
+    clip_end: Optional[float] = None
+    exact_cuts: bool = False                # re-encode around the cuts instead of cutting on keyframes
+    merge_step: Optional[str] = None        # post-processor running in the merge stage, e.g. "Merger"
+    merge_progress: Optional[float] = None  # 0..1 through that step (None until ffmpeg reports, or no duration known)
+    merge_seconds: Optional[float] = None   # time post-processing took, not counting the wait for a merge slot
+    queue_position: Optional[int] = None    # 1-based place in the download (queued) or merge (merging) queue
 
     # control flags
     _pause_req: bool = False
     _cancel_req: bool = False
+    _progress: _Progress = field(default_factory=_Progress, repr=False)
+    _saved_status: Optional[str] = None     # last status written to the job store
+    _followers: List[str] = field(default_factory=list)  # jobs attached to this download
+    _info: Optional[Dict] = field(default=None, repr=False)  # extracted metadata, reused by resume while its stream URLs are valid
+    _running: bool = False                  # a worker is inside _run_job (it may still be winding down after a pause)
+    _ydl: Optional["_StagedYDL"] = field(default=None, repr=False)  # the run's downloader, while it transfers (abort target) or waits for a merge slot
 
 # in-memory store
 _JOBS: Dict[str, Job] = {}
 _LOCK = threading.Lock()
+_VERSION = 0  # bumped on every job change; lets readers ask "what changed since N?"
+_REMOVED: Dict[str, int] = {}  # tombstones: removed job id -> version of its removal
+_MAX_TOMBSTONES = 1000
+
+TERMINAL_STATUSES = ("done", "error", "canceled")
+_LIVE_STATUSES = ("queued", "downloading", "merging")  # a new job may follow an origin in these
+
+# Dedup index, keyed by (canonical url, format expression, clip range, exact cuts)
+_OUTPUTS: Dict[tuple, str] = {}  # -> id of a done job whose file can be reused
+_ACTIVE: Dict[tuple, str] = {}   # -> id of the job currently downloading it
+
+# bounded pool of download workers; "queued" jobs wait here for a slot
+_SCHEDULER = DownloadScheduler(
+    max_workers=settings.MAX_CONCURRENT_DOWNLOADS,
+    policy=settings.DOWNLOAD_QUEUE_POLICY,
+)
+# post-processing stage: downloads hand their finished streams over (status "merging")
+# and free their slot; ffmpeg runs here, at most MERGE_WORKERS at a time
+_MERGER = DownloadScheduler(
+    max_workers=settings.MERGE_WORKERS,
+    policy=settings.DOWNLOAD_QUEUE_POLICY,
+    name="merge",
+)
+_MERGE_POLL = 0.5  # seconds between reads of ffmpeg's -progress file
+host_limiter.on_release(_SCHEDULER.kick)  # a freed site slot may let a held-back job start
+
+# ---------- queue positions: published as job changes so /jobs deltas and SSE carry them ----------
+_POSITIONS_STALE = threading.Event()
+_POSITIONS_THREAD: Optional[threading.Thread] = None
+_POSITIONS_START = threading.Lock()
+
+def _queue_moved():
+    # scheduler callback; may run under _LOCK (cancel_job -> remove), so only flag the refresher
+    global _POSITIONS_THREAD
+    _POSITIONS_STALE.set()
+    if _POSITIONS_THREAD is None:
+        with _POSITIONS_START:
+            if _POSITIONS_THREAD is None:
+                _POSITIONS_THREAD = threading.Thread(target=_publish_positions, name="queue-positions", daemon=True)
+                _POSITIONS_THREAD.start()
+
+def _publish_positions():
+    while True:
+        _POSITIONS_STALE.wait()
+        _POSITIONS_STALE.clear()
+        _refresh_positions()
+
+def _refresh_positions():
+    """Store every job's current queue position, touching (new version) the ones that moved."""
+    with _LOCK:
+        for job in _JOBS.values():
+            if job.status == "queued":
+                position = _SCHEDULER.position(job.id)
+            elif job.status == "merging":
+                position = _MERGER.position(job.id)
+            else:
+                position = None
+            if position != job.queue_position:
+                job.queue_position = position
+                _touch(job)
+
+_SCHEDULER.on_change(_queue_moved)
+_MERGER.on_change(_queue_moved)
 
 class _StopForPause(Exception): pass
 class _StopForCancel(Exception): pass
 
+def _touch(job: Job):
+    """Record a change to `job` (caller holds _LOCK) and wake stream subscribers."""
+    global _VERSION
+    _VERSION += 1
+    job.version = _VERSION
+    if job.status not in ("queued", "merging"):
+        job.queue_position = None  # left the queue; don't wait for _refresh_positions
+    if job.status in TERMINAL_STATUSES:
+        job.finished_at = job.finished_at or time.time()
+    else:
+        job.finished_at = None
+    if job.status != job._saved_status:
+        # status transitions are durable; progress ticks are not
+        job._saved_status = job.status
+        job_store.save(job.__dict__)
+    if job._followers and job.status not in TERMINAL_STATUSES:
+        _mirror(job)
+    job_events.notify()
+
+# ---------- dedup: jobs for the same url + format share one download ----------
+def _dedup_key(job: Job) -> tuple:
+    return (_normalize_youtube_url(job.url), job.format_string, _clip_range(job), job.exact_cuts)
+
+# ---------- clips: download only a time range ----------
+def _clip_range(job: Job) -> Optional[Tuple[float, float]]:
+    if job.clip_start is None and job.clip_end is None:
+        return None
+    return (job.clip_start or 0.0, job.clip_end if job.clip_end is not None else float("inf"))
+
+def clip_error(start: Optional[float], end: Optional[float]) -> Optional[str]:
+    """Why a requested clip range can't be downloaded, or None if it can (or none was asked for)."""
+    if start is None and end is None:
+        return None
+    if (start is not None and start < 0) or (end is not None and end <= (start or 0)):
+        return "Clip range needs 0 <= start < end"
+    if not shutil.which("ffmpeg"):
+        return "Clip downloads need ffmpeg on the server"
+    return None
+
+def _mirror(origin: Job):
+    """Copy an in-flight download's state onto its attached jobs (caller holds _LOCK)."""
+    for fid in origin._followers:
+        f = _JOBS.get(fid)
+        if f is None or f.source_job_id != origin.id:
+            continue
+        f.status = origin.status
+        f.progress = origin.progress
+        f.downloaded_bytes = origin.downloaded_bytes
+        f.total_bytes = origin.total_bytes
+        f.speed_bps = origin.speed_bps
+        f.eta_seconds = origin.eta_seconds
+        f.merge_step = origin.merge_step
+        f.merge_progress = origin.merge_progress
+        f.title = f.title or origin.title
+        _touch(f)
+
+def _reusable_output(key) -> Optional[Job]:
+    # caller holds _LOCK
+    src = _JOBS.get(_OUTPUTS.get(key, ""))
+    if src and src.status == "done" and src.filename and os.path.isfile(src.filename):
+        return src
+    _OUTPUTS.pop(key, None)
+    return None
+
+def _link_output(src_path: str, dst_dir: str) -> str:
+    """Hard-link a finished file into another job dir (copy if links aren't possible)."""
+    dst = os.path.join(dst_dir, os.path.basename(src_path))
+    if not os.path.exists(dst):
+        try:
+            os.link(src_path, dst)
+        except OSError:
+            shutil.copy2(src_path, dst)
+    return dst
+
+def _finish_from(job: Job, src: Job):
+    """Complete `job` instantly with `src`'s output file."""
+    try:
+        path = _link_output(src.filename, job.tmpdir)
+    except OSError as e:
+        with _LOCK:
+            job.status = "error"
+            job.error = f"Could not reuse finished download: {e}"
+            _touch(job)
+        return
+    size = os.path.getsize(path)
+    with _LOCK:
+        job.status = "done"
+        job.filename = path
+        job.title = job.title or src.title
+        job.progress = 1.0
+        job.downloaded_bytes = job.total_bytes = size
+        job.speed_bps = 0
+        job.eta_seconds = 0
+        _touch(job)
+
+def _detach(job: Job):
+    """Stop mirroring another job's download (caller holds _LOCK)."""
+    origin = _JOBS.get(job.source_job_id or "")
+    if origin and job.id in origin._followers:
+        origin._followers.remove(job.id)
+    job.source_job_id = None
+
+def _settle(job: Job):
+    """Hand a finished download's outcome to the jobs attached to it."""
+    with _LOCK:
+        key = _dedup_key(job)
+        if _ACTIVE.get(key) == job.id:
+            del _ACTIVE[key]
+        if job.status == "done" and job.filename and os.path.isfile(job.filename):
+            _OUTPUTS[key] = job.id
+        followers = [_JOBS[fid] for fid in job._followers
+                     if fid in _JOBS and _JOBS[fid].source_job_id == job.id]
+        job._followers = []
+        if not followers:
+            return
+        if job.status == "error":
+            for f in followers:
+                f.status, f.error = "error", job.error
+                _touch(f)
+            return
+        if job.status == "canceled":
+            # the download they were waiting on is gone; the first follower takes over
+            heir = followers[0]
+            heir.source_job_id = None
+            heir.status = "queued"
+            heir._followers = [f.id for f in followers[1:]]
+            for f in followers[1:]:
+                f.source_job_id = heir.id
+            _ACTIVE[key] = heir.id
+            _touch(heir)
+    if job.status == "done":
+        for f in followers:
+            _finish_from(f, job)
+    elif job.status == "canceled":
+        _enqueue(heir)
+
 def _ydl_opts_for(job: Job):
     # Prefer mp4 container if codecs allow
     opts = {
@@ -56,96 +307,432 @@ def _ydl_opts_for(job: Job):
         "socket_timeout": 30,
         "retries": 3,
     }
+    clip = _clip_range(job)
+    if clip:
+        # only the section is fetched: ffmpeg seeks in HLS/DASH playlists (just the
+        # fragments covering it) and in plain files (range requests); cuts land on
+        # keyframes unless exact_cuts re-encodes around them
+        opts["download_ranges"] = yt_dlp.utils.download_range_func(None, [clip])
+        opts["force_keyframes_at_cuts"] = job.exact_cuts
     cookies = _cookies_for(job.url)
     if cookies:
         opts["cookiefile"] = cookies
     return opts
 
+def _check_stop(job: Job):
+    if job._cancel_req: raise _StopForCancel()
+    if job._pause_req:  raise _StopForPause()
+
+def _publish_progress(job: Job, p: _Progress, progress: float, now: float):
+    """Copy the hook's latest values onto the Job (caller holds p.lock)."""
+    with _LOCK:
+        if job._pause_req or job._cancel_req:
+            return  # already shown as paused; the run stops at the next hook call
+        job.status = "downloading"
+        job.downloaded_bytes = p.downloaded_bytes
+        if p.total_bytes:
+            job.total_bytes = p.total_bytes
+        if progress >= 0:
+            job.progress = progress
+        job.speed_bps = p.speed_bps
+        job.eta_seconds = p.eta_seconds
+        if p.filename: job.filename = p.filename
+        _touch(job)
+    p.published_at = now
+    p.published_progress = progress
+
 def _progress_hook(job: Job):
+    p = job._progress
     def hook(d):
         # d['status'] in {'downloading','finished'}
-        with _LOCK:
-            if job._cancel_req: raise _StopForCancel()
-            if job._pause_req:  raise _StopForPause()
+        # plain attribute reads; the control flags don't need _LOCK
+        if d.get("status") == "finished" and (job._pause_req or job._cancel_req):
+            fn = d.get("filename")
+            if fn and not d.get("total_bytes") and os.path.isfile(fn):
+                # cut by _StagedYDL.abort() with no length to check the file against:
+                # back to .part so a resume continues it instead of taking it as complete
+                os.replace(fn, fn + ".part")
+        _check_stop(job)
 
-            st = d.get("status")
-            if st == "downloading":
-                job.status = "downloading"
-                
+        st = d.get("status")
+        if st == "downloading":
+            with p.lock:
                 # Use yt-dlp's reported values directly - they handle multi-stream progress correctly
-                job.downloaded_bytes = int(d.get("downloaded_bytes") or 0)
+                p.downloaded_bytes = int(d.get("downloaded_bytes") or 0)
                 total = d.get("total_bytes") or d.get("total_bytes_estimate")
                 if total:
-                    job.total_bytes = int(total)
-                
-                # Calculate progress based on current values
-                if job.total_bytes and job.total_bytes > 0:
-                    job.progress = max(0.0, min(1.0, job.downloaded_bytes / job.total_bytes))
-                
-                job.speed_bps = d.get("speed") or None
-                job.eta_seconds = int(d.get("eta")) if d.get("eta") is not None else None
+                    p.total_bytes = int(total)
+                p.speed_bps = d.get("speed") or None
+                p.eta_seconds = int(d.get("eta")) if d.get("eta") is not None else None
                 fn = d.get("filename") or d.get("tmpfilename")
-                if fn: job.filename = fn
-            elif st == "finished":
-                job.status = "merging"  # yt-dlp is about to post-process
-                # Don't update size during merge - keep the last download size
-                # The final size will be set after yt-dlp completes
-                fn = d.get("filename")
-                if fn: job.filename = fn
+                new_file = bool(fn) and fn != p.filename
+                if fn: p.filename = fn
+
+                # Calculate progress based on current values
+                progress = -1.0
+                if p.total_bytes and p.total_bytes > 0:
+                    progress = max(0.0, min(1.0, p.downloaded_bytes / p.total_bytes))
+
+                # Only publish meaningful changes
+                now = time.monotonic()
+                if (new_file
+                        or now - p.published_at >= settings.PROGRESS_PUBLISH_INTERVAL
+                        or abs(progress - p.published_progress) >= settings.PROGRESS_PUBLISH_STEP):
+                    _publish_progress(job, p, progress, now)
+            return
+
+        if st == "finished":
+            with p.lock:
+                # flush the stream's final numbers; post-processing is the merge stage's (_hand_off)
+                p.filename = d.get("filename") or p.filename
+                _publish_progress(job, p, 1.0 if p.total_bytes else -1.0, time.monotonic())
     return hook
 
-def _run_job(job: Job):
-    try:
-        ydl_opts = _ydl_opts_for(job)
-        ydl_opts["progress_hooks"] = [_progress_hook(job)]
-        # Normalize YouTube URLs so a watch URL with playlist params doesn't trigger full playlist
-        url = _normalize_youtube_url(job.url)
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-            # best guess at final filename
-            if isinstance(info, dict):
-                fn = info.get("_filename") or job.filename
-                if fn: job.filename = fn
+def _postprocessor_hook(job: Job):
+    def hook(d):
+        # d['status'] in {'started','processing','finished'}; d['postprocessor'] e.g. "Merger"
+        if d.get("status") != "started":
+            return
         with _LOCK:
+            if job.status == "merging":
+                job.merge_step = d.get("postprocessor")
+                job.merge_progress = None
+                _touch(job)
+    return hook
+
+class _FormatProbe(PostProcessor):
+    """
+    Runs after format selection, right before the download (when="before_dl"):
+    records the output name and whether the download is a single stream that
+    is written front to back (no merge), i.e. can be followed while it grows.
+    """
+    def __init__(self, job: Job):
+        super().__init__(None)
+        self._job = job
+
+    def run(self, info):
+        with _LOCK:
+            # ffmpeg writes a clip's index at the end, so clips can't be followed either
+            self._job.progressive = not info.get("requested_formats") and _clip_range(self._job) is None
+            self._job.filename = info.get("_filename") or self._job.filename
+            _touch(self._job)
+        return [], info
+
+class _OutputProbe(PostProcessor):
+    """
+    Runs last (when="after_move"): records where the finished file ended up,
+    after merging, remuxing and the move out of the temp name.
+    """
+    def __init__(self, job: Job):
+        super().__init__(None)
+        self._job = job
+
+    def run(self, info):
+        if info.get("filepath"):
+            with _LOCK:
+                self._job.filename = info["filepath"]
+        return [], info
+
+def _socket_of(obj, depth: int = 0) -> Optional[socket.socket]:
+    """The socket under a yt-dlp response (urllib's HTTPResponse, or urllib3's around it), if reachable."""
+    if isinstance(obj, socket.socket):
+        return obj
+    if obj is None or depth > 5:
+        return None
+    for name in ("fp", "_fp", "raw", "_sock"):
+        sock = _socket_of(getattr(obj, name, None), depth + 1)
+        if sock is not None:
+            return sock
+    return None
+
+class _StagedYDL(yt_dlp.YoutubeDL):
+    """
+    YoutubeDL that stops after the download when there is post-processing to do
+    (merging streams, fixups, audio extraction): it keeps the arguments in
+    `pending` and run_pending() finishes the job later, on a merge worker.
+
+    With watch(check), every request first calls `check` (which raises to stop
+    the run) and abort() shuts down the sockets of the responses being read, so
+    pause/cancel interrupt a transfer even while a read is stalled: the
+    downloader sees the connection end, and its retry hits `check`.
+    """
+    pending: Optional[tuple] = None
+    _check = None
+
+    def watch(self, check) -> None:
+        self._check = check
+        self._open = weakref.WeakSet()
+        self._open_lock = threading.Lock()
+        self.aborted = False
+
+    def urlopen(self, req):
+        if self._check is not None:
+            self._check()
+        res = super().urlopen(req)
+        if self._check is not None:
+            with self._open_lock:
+                self._open.add(res)
+            if self.aborted:
+                self._cut(res)
+        return res
+
+    def abort(self) -> None:
+        self.aborted = True
+        with self._open_lock:
+            responses = list(self._open)
+        for res in responses:
+            self._cut(res)
+
+    @staticmethod
+    def _cut(res) -> None:
+        sock = _socket_of(res)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass  # already closed
+
+    def post_process(self, filename, info, files_to_move=None):
+        if info.get("__postprocessors") or self._pps["post_process"]:
+            self.pending = (filename, info, files_to_move)
+            info["filepath"] = filename
+            return info
+        return super().post_process(filename, info, files_to_move)
+
+    def run_pending(self) -> Dict:
+        filename, info, files_to_move = self.pending
+        self.pending = None
+        return super().post_process(filename, info, files_to_move)
+
+class _MergeProgress:
+    """
+    Follows ffmpeg's -progress output for the job's post-processors and
+    publishes merge_progress (media time written / duration).
+    """
+    def __init__(self, job: Job, duration: Optional[float]):
+        self._job = job
+        self._duration = duration
+        self.path = os.path.join(job.tmpdir, ".ffmpeg-progress")
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._poll, name=f"merge-progress-{job.id[:8]}", daemon=True)
+
+    def ffmpeg_args(self, ydl: yt_dlp.YoutubeDL, pps: List[PostProcessor]) -> Dict[str, List[str]]:
+        """postprocessor_args making every ffmpeg post-processor report to self.path."""
+        args = dict(ydl.params.get("postprocessor_args") or {})
+        for pp in pps:
+            if isinstance(pp, FFmpegPostProcessor):
+                args.setdefault(f"{pp.pp_key().lower()}+ffmpeg_o", ["-progress", self.path, "-nostats"])
+        return args
+
+    def __enter__(self):
+        if self._duration:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def _read(self) -> Optional[float]:
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(max(0, os.path.getsize(self.path) - 4096))
+                tail = f.read().decode("ascii", "replace")
+        except OSError:
+            return None  # not started yet
+        for line in reversed(tail.splitlines()):
+            if line.startswith("out_time_us="):
+                try:
+                    return int(line.split("=", 1)[1]) / 1e6
+                except ValueError:
+                    return None  # "N/A" before the first frame
+        return None
+
+    def _poll(self):
+        while not self._stop.wait(_MERGE_POLL):
+            written = self._read()
+            if written is None:
+                continue
+            progress = max(0.0, min(1.0, written / self._duration))
+            with _LOCK:
+                if self._job.status == "merging" and (
+                        self._job.merge_progress is None
+                        or abs(progress - self._job.merge_progress) >= settings.PROGRESS_PUBLISH_STEP):
+                    self._job.merge_progress = progress
+                    _touch(self._job)
+
+def _media_duration(job: Job, info: Dict) -> Optional[float]:
+    duration = info.get("duration")
+    clip = _clip_range(job)
+    if clip:
+        end = min(clip[1], duration) if duration else clip[1]
+        return end - clip[0] if end != float("inf") else None
+    return duration
+
+def _complete(job: Job):
+    """Mark a job done with the file _OutputProbe recorded, and hand it to its followers."""
+    with _LOCK:
+        if job.filename and os.path.isfile(job.filename):
             job.status = "done"
             job.progress = 1.0
             job.speed_bps = 0
             job.eta_seconds = 0
-            
-            # Update final file size from actual downloaded file
-            final_file_found = False
-            
-            # Try the recorded filename first
-            if job.filename and os.path.isfile(job.filename):
-                final_size = os.path.getsize(job.filename)
-                print(f"[DEBUG] Final file found: {job.filename}, Size: {final_size} bytes")
-                job.downloaded_bytes = final_size
-                job.total_bytes = final_size
-                final_file_found = True
-            else:
-                # Search for any video file in the temp directory (merged file)
-                import glob
-                if hasattr(job, 'tmpdir') and job.tmpdir and os.path.isdir(job.tmpdir):
-                    # Look for common video extensions
-                    patterns = ['*.mp4', '*.mkv', '*.webm', '*.avi', '*.mov', '*.m4a', '*.mp3']
-                    for pattern in patterns:
-                        files = glob.glob(os.path.join(job.tmpdir, pattern))
-                        if files:
-                            # Get the largest file (likely the merged result)
-                            largest_file = max(files, key=os.path.getsize)
-                            final_size = os.path.getsize(largest_file)
-                            print(f"[DEBUG] Found merged file: {largest_file}, Size: {final_size} bytes")
-                            job.filename = largest_file
-                            job.downloaded_bytes = final_size
-                            job.total_bytes = final_size
-                            final_file_found = True
-                            break
-                
-                if not final_file_found:
-                    print(f"[DEBUG] Final file not found: {job.filename}, tmpdir: {getattr(job, 'tmpdir', 'None')}")
+            job.downloaded_bytes = job.total_bytes = os.path.getsize(job.filename)
+        else:
+            print(f"[WARN] job {job.id}: output file not found: {job.filename}")
+            job.status = "error"
+            job.error = "Download finished but its output file is missing"
+        _touch(job)
+    _settle(job)
+
+def _hand_off(job: Job, ydl: _StagedYDL):
+    """Queue a downloaded job's post-processing on the merge stage; the download slot is freed."""
+    with _LOCK:
+        job.status = "merging"
+        job.progress = 1.0
+        job.speed_bps = 0
+        job.eta_seconds = 0
+        job.merge_step = None
+        job.merge_progress = None
+        job._ydl = ydl  # cancel_job closes it if the job is dropped from the merge queue
+        _touch(job)
+    queued_at = time.monotonic()
+    _MERGER.submit(job.id, lambda: _postprocess_job(job, ydl, queued_at), priority=job.priority)
+
+def _postprocess_job(job: Job, ydl: _StagedYDL, queued_at: float):
+    started = time.monotonic()
+    try:
+        if job._cancel_req:
+            raise _StopForCancel()
+        filename, info, _ = ydl.pending
+        pps = info.get("__postprocessors", []) + ydl._pps["post_process"]
+        with _MergeProgress(job, _media_duration(job, info)) as watch:
+            ydl.params["postprocessor_args"] = watch.ffmpeg_args(ydl, pps)
+            ydl.run_pending()
+        with _LOCK:
+            job.merge_seconds = time.monotonic() - started
+            job.merge_step = None
+            job.merge_progress = 1.0
+        print(f"[PERF] job {job.id}: post-processing ({', '.join(pp.pp_key() for pp in pps)}) took "
+              f"{job.merge_seconds:.1f}s after {started - queued_at:.1f}s waiting for a merge slot")
+        if job._cancel_req:
+            raise _StopForCancel()
+        _complete(job)
+    except _StopForCancel:
+        shutil.rmtree(job.tmpdir, ignore_errors=True)
+        with _LOCK:
+            job.status = "canceled"
+            job.error = None
+            _touch(job)
+        _settle(job)
+    except Exception as e:
+        with _LOCK:
+            job.status = "error"
+            job.error = str(e)
+            job.merge_step = None
+            _touch(job)
+        _settle(job)
+    finally:
+        ydl.close()
+        with _LOCK:
+            job._ydl = None
+            job._info = None
+
+def _job_info(job: Job) -> Dict:
+    """
+    Metadata to download from: what the job already resolved if its signed stream
+    URLs are still valid, else a fresh extraction (shared cache/store). Also pins
+    the job's concrete format ids on first use.
+    """
+    info = job._info
+    if info is None or not streams_fresh(info):
+        info = extract_info(job.url, fresh_streams=True)
+    if job.format_id and select_format(info, job.format_id) is None:
+        job.format_id = None  # the site no longer offers those ids; choose again
+    if not job.format_id:
+        selected = select_format(info, job.format_string)
+        if selected is not None:
+            job.format_id = selected["format_id"]
+    job._info = info
+    return info
+
+class _HostClaim:
+    """
+    A queued job's claim on its site's download slot (host_limiter). The scheduler
+    takes it as the job's gate before giving the job a worker, so jobs for a site
+    at its cap wait in the queue without holding a worker; _run_job releases it.
+    """
+    def __init__(self, job: Job):
+        self.site = _site_for(_normalize_youtube_url(job.url))
+        self.held = False
+        self.blocked = 0.0                  # seconds the site's cap kept the job queued
+        self._refused_at: Optional[float] = None
+
+    def try_claim(self) -> bool:
+        if host_limiter.try_acquire(self.site):
+            self.held = True
+            if self._refused_at is not None:
+                self.blocked = time.monotonic() - self._refused_at
+                host_limiter.for_site(self.site).note_blocked(self.blocked)
+            return True
+        if self._refused_at is None:
+            self._refused_at = time.monotonic()
+        return False
+
+    def release(self):
+        if self.held:
+            self.held = False
+            host_limiter.release(self.site)
+
+def _run_job(job: Job, claim: Optional[_HostClaim] = None):
+    claim = claim or _HostClaim(job)
+    with _LOCK:
+        # paused/canceled while waiting for a slot, or an earlier run still winding down
+        if job._cancel_req or job._pause_req or job.status != "queued" or job._running:
+            claim.release()
+            return
+        job._running = True
+        job.status = "downloading"
+        job.blocked_seconds += claim.blocked
+        _touch(job)
+    ydl = None
+    try:
+        ydl_opts = _ydl_opts_for(job)
+        ydl_opts["progress_hooks"] = [_progress_hook(job)]
+        ydl_opts["postprocessor_hooks"] = [_postprocessor_hook(job)]
+        # only extracts on the first run or once the stream URLs expired; a resume goes straight to the download
+        info = _job_info(job)
+        if job.format_id:
+            ydl_opts["format"] = job.format_id
+        _check_stop(job)
+        # the site's download slot was claimed before this run got its worker (_HostClaim)
+        ydl = _StagedYDL(ydl_opts)
+        ydl.add_post_processor(_FormatProbe(job), when="before_dl")
+        ydl.add_post_processor(_OutputProbe(job), when="after_move")
+        ydl.watch(lambda: _check_stop(job))
+        with _LOCK:
+            job._ydl = ydl  # pause_job/cancel_job abort() it
+        _check_stop(job)
+        ydl.process_ie_result(yt_dlp.YoutubeDL.sanitize_info(info), download=True)
+        with _LOCK:
+            job._ydl = None
+        claim.release()  # post-processing doesn't talk to the site
+        _check_stop(job)
+        if ydl.pending:
+            staged, ydl = ydl, None  # the merge stage closes it
+            _hand_off(job, staged)
+        else:
+            _complete(job)
     except _StopForPause:
         with _LOCK:
-            job.status = "paused"
+            if job._pause_req:  # already shown as paused; unless resume_job came in meanwhile
+                job.status = "paused"
+                _touch(job)
     except _StopForCancel:
         # delete temp files
         try:
@@ -154,46 +741,345 @@ def _run_job(job: Job):
             with _LOCK:
                 job.status = "canceled"
                 job.error = None
+                _touch(job)
+            _settle(job)
     except Exception as e:
         with _LOCK:
             job.status = "error"
             job.error = str(e)
+            _touch(job)
+        _settle(job)
+    finally:
+        claim.release()
+        if ydl is not None:
+            ydl.close()
+        with _LOCK:
+            if job._ydl is ydl:  # one handed to the merge stage stays until _postprocess_job closes it
+                job._ydl = None
+            job._running = False
+            # canceled while a pause was stopping this run: cancel_job left the cleanup to us
+            canceled = job._cancel_req and job.status == "paused"
+            if canceled:
+                job.status = "canceled"
+                job.error = None
+                _touch(job)
+            if job.status in TERMINAL_STATUSES:
+                job._info = None  # a retry after an error extracts again
+            # resumed while this run was stopping: go again now that the .part files are free
+            requeue = job.status == "queued" and not (job._pause_req or job._cancel_req)
+        if canceled:
+            shutil.rmtree(job.tmpdir, ignore_errors=True)
+            _settle(job)
+        if requeue:
+            _enqueue(job)
 
-def start_job(url: str, format_string: str, title: Optional[str]=None, ext: Optional[str]=None) -> Job:
-    job = Job(id=str(uuid.uuid4()), url=url, format_string=format_string, title=title, ext=ext)
+def _enqueue(job: Job):
+    _SCHEDULER.submit_many([_runnable(job)])
+
+def _runnable(job: Job) -> tuple:
+    """Scheduler item for `job`: it gets a worker once its site has a free download slot."""
+    claim = _HostClaim(job)
+    return (job.id, lambda: _run_job(job, claim), job.priority, claim.try_claim)
+
+def _admit(job: Job) -> Tuple[Optional[Job], bool]:
+    """
+    Register a new job against the dedup index (caller holds _LOCK). Returns
+    (finished job whose file it reuses, whether it needs a download slot).
+    """
+    key = _dedup_key(job)
+    src = _reusable_output(key)
+    origin = _JOBS.get(_ACTIVE.get(key, "")) if src is None else None
+    if src is not None:
+        # already downloaded: reuse the file
+        job.source_job_id = src.id
+    elif origin is not None and origin.status in _LIVE_STATUSES:
+        # being downloaded right now: follow that download's progress
+        job.source_job_id = origin.id
+        origin._followers.append(job.id)
+        job.status = origin.status
+        job.progress = origin.progress
+    else:
+        # nothing in flight (a paused origin may never resume): this job downloads it
+        origin = None
+        _ACTIVE[key] = job.id
+    _JOBS[job.id] = job
+    _touch(job)
+    return src, src is None and origin is None
+
+def start_job(url: str, format_string: str, title: Optional[str]=None, ext: Optional[str]=None,
+              priority: int = 0, playlist_id: Optional[str] = None, clip_start: Optional[float] = None,
+              clip_end: Optional[float] = None, exact_cuts: bool = False) -> Job:
+    problem = clip_error(clip_start, clip_end)
+    if problem:
+        raise ValueError(problem)
+    job = Job(id=str(uuid.uuid4()), url=url, format_string=format_string, title=title, ext=ext,
+              priority=priority, playlist_id=playlist_id, clip_start=clip_start, clip_end=clip_end,
+              exact_cuts=exact_cuts)
     with _LOCK:
-        _JOBS[job.id] = job
-    t = threading.Thread(target=_run_job, args=(job,), daemon=True)
-    t.start()
+        src, runnable = _admit(job)
+    if src is not None:
+        _finish_from(job, src)
+    elif runnable:
+        _enqueue(job)
     return job
 
+def start_batch(items: List[Dict]) -> Tuple[str, List[Job]]:
+    """
+    Create one job per item (url, format_string and optionally title, ext,
+    priority, clip_start, clip_end, exact_cuts; validated by the caller) under
+    a new batch id. All of them are registered first and then
+    handed to the scheduler in one submit_many, so no worker sees half a batch.
+    Items repeating a url + format follow a single download, and jobs for the
+    same url share one extraction through the metadata cache.
+    """
+    batch_id = str(uuid.uuid4())
+    jobs = [Job(id=str(uuid.uuid4()), batch_id=batch_id, **item) for item in items]
+    reused, runnable = [], []
+    with _LOCK:
+        for job in jobs:
+            src, run = _admit(job)
+            if src is not None:
+                reused.append((job, src))
+            elif run:
+                runnable.append(job)
+    _SCHEDULER.submit_many([_runnable(j) for j in runnable])
+    for job, src in reused:
+        _finish_from(job, src)
+    return batch_id, jobs
+
+def batch_jobs(batch_id: str) -> List[Job]:
+    """The batch's jobs in submission order (KeyError if there are none)."""
+    with _LOCK:
+        jobs = [j for j in _JOBS.values() if j.batch_id == batch_id]
+    if not jobs:
+        raise KeyError(batch_id)
+    return jobs
+
+def cancel_batch(batch_id: str) -> List[Job]:
+    jobs = batch_jobs(batch_id)
+    for job in jobs:
+        cancel_job(job.id)
+    return jobs
+
+def batch_progress(jobs: List[Job]) -> Dict:
+    """Aggregate progress of a batch: per-status counts, bytes, and the mean job progress."""
+    with _LOCK:
+        counts: Dict[str, int] = {}
+        for j in jobs:
+            counts[j.status] = counts.get(j.status, 0) + 1
+        live = [j for j in jobs if j.status != "canceled"]
+        sizes_known = all(j.total_bytes for j in live)
+        return {
+            "counts": counts,
+            "progress": sum(j.progress for j in live) / len(live) if live else 1.0,
+            "downloaded_bytes": sum(j.downloaded_bytes for j in live),
+            "total_bytes": sum(j.total_bytes for j in live) if live and sizes_known else None,
+            "finished": all(j.status in TERMINAL_STATUSES for j in jobs),
+        }
+
 def pause_job(job_id: str) -> Job:
+    ydl = None
     with _LOCK:
         job = _JOBS[job_id]
-        if job.status == "downloading":
+        if job.source_job_id and job.status not in TERMINAL_STATUSES:
+            # stop following; resuming later downloads it independently
+            _detach(job)
+            job.status = "paused"
+            _touch(job)
+        elif job.status == "downloading":
+            # shown as paused right away; the open connections are cut below, so the
+            # worker stops within its current read instead of at the next hook call
             job._pause_req = True
+            job.status = "paused"
+            ydl = job._ydl
+            _touch(job)
+        elif job.status == "queued" and _SCHEDULER.remove(job.id):
+            # never got a slot; nothing to interrupt
+            job.status = "paused"
+            _touch(job)
+    if ydl is not None:
+        ydl.abort()
     return job
 
 def resume_job(job_id: str) -> Job:
     with _LOCK:
         job = _JOBS[job_id]
-        # clear pause & restart thread; yt-dlp will continue partial files
+        if job.status not in ("paused", "error"):
+            return job
+        if job.source_job_id:
+            _detach(job)  # its source is paused/failed; download it on its own
+        # clear pause & requeue; yt-dlp will continue partial files
         job._pause_req = False
         job._cancel_req = False
         job.status = "queued"
-    t = threading.Thread(target=_run_job, args=(job,), daemon=True)
-    t.start()
+        _touch(job)
+        if job._running:
+            # the paused run hasn't stopped yet: it carries on, or requeues itself once it has
+            return job
+    _enqueue(job)
     return job
 
 def cancel_job(job_id: str) -> Job:
+    idle = False
+    ydl = staged = None
     with _LOCK:
         job = _JOBS[job_id]
         if job.status in ("downloading","queued","paused","merging"):
             job._cancel_req = True
+            ydl = job._ydl  # a transfer in progress: cut it (below)
+            # not holding a worker slot -> nobody else will clean up
+            idle = (bool(job.source_job_id)
+                    or (job.status == "queued" and _SCHEDULER.remove(job.id))
+                    or (job.status == "merging" and _MERGER.remove(job.id))
+                    or (job.status == "paused" and not job._running))
+            if idle:
+                if job.status == "merging":
+                    # taken off the merge queue: its staged downloader is ours to close
+                    staged, ydl = ydl, None
+                    job._ydl = None
+                job._info = None
+                _detach(job)
+                job.status = "canceled"
+                job.error = None
+                _touch(job)
+    if ydl is not None:
+        ydl.abort()
+    if staged is not None:
+        staged.pending = None
+        staged.close()
+    if idle:
+        # outside _LOCK: deleting a large partial download can take a while
+        shutil.rmtree(job.tmpdir, ignore_errors=True)
+        _settle(job)
     return job
 
+def download_source(job: Job) -> Job:
+    """The job actually downloading `job`'s file: its dedup source while following one, else itself."""
+    with _LOCK:
+        if job.source_job_id and job.status not in TERMINAL_STATUSES:
+            return _JOBS.get(job.source_job_id, job)
+        return job
+
+def partial_paths(job: Job) -> List[str]:
+    """Where a progressive download's bytes are right now: the .part file, then the final name."""
+    with _LOCK:
+        fn = job.filename
+    if not fn:
+        return []
+    return [fn + ".part", fn] if not fn.endswith(".part") else [fn, fn[:-len(".part")]]
+
 def get_job(job_id: str) -> Job:
     with _LOCK: return _JOBS[job_id]
 
 def list_jobs():
     with _LOCK: return list(_JOBS.values())
+
+def snapshot(job: Job) -> dict:
+    """Consistent copy of a job's fields (progress is published under _LOCK)."""
+    with _LOCK:
+        return job.__dict__.copy()
+
+def changed_since(version: int):
+    """(current store version, jobs changed after `version`, ids removed after `version`)."""
+    with _LOCK:
+        changed = [j for j in _JOBS.values() if j.version > version]
+        removed = [jid for jid, v in _REMOVED.items() if v > version]
+        return _VERSION, changed, removed
+
+def mark_accessed(job_id: str) -> None:
+    with _LOCK:
+        _JOBS[job_id].last_accessed = time.time()
+
+def remove_job(job_id: str) -> int:
+    """
+    Forget a finished job and delete its temp dir. Returns bytes reclaimed
+    (0 if the job is unknown or still active).
+    """
+    global _VERSION
+    with _LOCK:
+        job = _JOBS.get(job_id)
+        if job is None or job.status not in TERMINAL_STATUSES:
+            return 0
+        del _JOBS[job_id]
+        if _OUTPUTS.get(_dedup_key(job)) == job_id:
+            del _OUTPUTS[_dedup_key(job)]
+        _VERSION += 1
+        _REMOVED[job_id] = _VERSION
+        while len(_REMOVED) > _MAX_TOMBSTONES:
+            _REMOVED.pop(next(iter(_REMOVED)))
+        job_events.notify()
+    job_store.delete(job_id)
+    reclaimed = dir_size(job.tmpdir, freeable=True)
+    shutil.rmtree(job.tmpdir, ignore_errors=True)
+    return reclaimed
+
+def dir_size(path: str, seen: Optional[Set[Tuple[int, int]]] = None, freeable: bool = False) -> int:
+    """
+    Bytes under `path`. A reused output is hard-linked into several job dirs
+    (_link_output): files whose (st_dev, st_ino) is already in `seen` are skipped,
+    so one set shared across dirs counts each file once. With freeable=True only
+    files with no other link count, i.e. what deleting the dir would free.
+    """
+    total = 0
+    try:
+        for entry in os.scandir(path):
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    total += dir_size(entry.path, seen, freeable)
+                    continue
+                st = entry.stat(follow_symlinks=False)
+                if freeable and st.st_nlink > 1:
+                    continue
+                if seen is not None:
+                    if (st.st_dev, st.st_ino) in seen:
+                        continue
+                    seen.add((st.st_dev, st.st_ino))
+                total += st.st_size
+            except OSError:
+                pass
+    except OSError:
+        pass
+    return total
+
+def restore_jobs() -> int:
+    """
+    Reload jobs saved by the job store (called on boot). Jobs that were queued or
+    downloading are reattached to their mdjob_* dir and requeued so yt-dlp continues
+    the .part files; paused jobs come back paused and resume the same way.
+    """
+    names = {f.name for f in fields(Job) if not f.name.startswith("_")}
+    resumable = []
+    with _LOCK:
+        for rec in job_store.load_all():
+            if rec.get("id") in _JOBS:
+                continue
+            rec = {k: v for k, v in rec.items() if k in names}
+            active = rec.get("status") in ("queued", "downloading", "merging", "paused")
+            if active and not (rec.get("tmpdir") and os.path.isdir(rec["tmpdir"])):
+                # partial data is gone; start over in a fresh dir
+                rec.update(tmpdir=tempfile.mkdtemp(prefix="mdjob_"), progress=0.0,
+                           downloaded_bytes=0, filename=None)
+            job = Job(**rec)
+            job._saved_status = job.status
+            if job.status in ("queued", "downloading", "merging"):
+                job.status = "queued"
+                resumable.append(job)
+            _JOBS[job.id] = job
+        # rebuild the dedup index; followers re-attach to their source if it is resuming too
+        for job in list(resumable):
+            key = _dedup_key(job)
+            origin = _JOBS.get(job.source_job_id or "")
+            if job.source_job_id and origin in resumable and not origin.source_job_id:
+                origin._followers.append(job.id)
+                resumable.remove(job)
+            else:
+                job.source_job_id = None
+                _ACTIVE.setdefault(key, job.id)
+        for job in _JOBS.values():
+            if job.status == "done" and job.filename and os.path.isfile(job.filename):
+                _OUTPUTS.setdefault(_dedup_key(job), job.id)
+            _touch(job)
+    _SCHEDULER.submit_many([_runnable(j) for j in resumable])
+    if resumable:
+        print(f"[DEBUG] restored {len(_JOBS)} jobs, resuming {len(resumable)}")
+    return len(resumable)
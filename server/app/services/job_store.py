@@ -0,0 +1,143 @@
+# server/app/services/job_store.py
+"""
+Optional durable record of download jobs (SQLite, WAL mode).
+
+job_manager hands a snapshot of a job to save() whenever its status changes; a
+single writer thread commits them in order with synchronous=FULL so a status
+that was written survives a crash. On boot, load_all() returns the saved
+records so job_manager can reattach them to their mdjob_* temp dirs.
+"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from ..config import settings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id         TEXT PRIMARY KEY,
+    status     TEXT NOT NULL,
+    data       TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+# Job fields worth keeping across restarts (live speed/eta/version are not)
+PERSISTED_FIELDS = (
+    "id", "url", "format_string", "title", "ext", "status", "progress",
+    "downloaded_bytes", "total_bytes", "filename", "tmpdir", "error",
+    "priority", "blocked_seconds", "created_at", "finished_at", "last_accessed",
+    "source_job_id", "format_id", "playlist_id", "batch_id",
+    "clip_start", "clip_end", "exact_cuts",
+)
+
+_DELETE = object()
+
+
+class JobStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: "queue.Queue" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        if self.enabled:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            conn = self._connect()
+            conn.executescript(_SCHEMA)
+            conn.commit()
+            conn.close()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    # ---------- writes (async, ordered) ----------
+    def save(self, record: Dict) -> None:
+        if not self.enabled:
+            return
+        self._ensure_writer()
+        self._queue.put({k: record.get(k) for k in PERSISTED_FIELDS})
+
+    def delete(self, job_id: str) -> None:
+        if not self.enabled:
+            return
+        self._ensure_writer()
+        self._queue.put((_DELETE, job_id))
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Wait until everything queued so far is committed (used on shutdown)."""
+        if not self.enabled or self._writer is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def _ensure_writer(self) -> None:
+        if self._writer is not None:
+            return
+        with self._start_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="job-store", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self) -> None:
+        conn = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            # commit whatever piled up meanwhile in one transaction
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            waiters = []
+            try:
+                now = time.time()
+                for item in batch:
+                    if isinstance(item, threading.Event):
+                        waiters.append(item)
+                    elif isinstance(item, tuple) and item[0] is _DELETE:
+                        conn.execute("DELETE FROM jobs WHERE id = ?", (item[1],))
+                    else:
+                        conn.execute(
+                            """
+                            INSERT INTO jobs (id, status, data, created_at, updated_at)
+                            VALUES (?, ?, ?, ?, ?)
+                            ON CONFLICT(id) DO UPDATE SET
+                                status = excluded.status,
+                                data = excluded.data,
+                                updated_at = excluded.updated_at
+                            """,
+                            (item["id"], item["status"], json.dumps(item), now, now),
+                        )
+                conn.commit()
+            except Exception as e:
+                print(f"[WARN] job store write failed: {e}")
+            finally:
+                for w in waiters:
+                    w.set()
+
+    # ---------- reads ----------
+    def load_all(self) -> List[Dict]:
+        if not self.enabled:
+            return []
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT data FROM jobs ORDER BY created_at").fetchall()
+        finally:
+            conn.close()
+        return [json.loads(r[0]) for r in rows]
+
+
+store = JobStore(settings.JOB_STORE_PATH)
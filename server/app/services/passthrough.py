@@ -0,0 +1,198 @@
+# server/app/services/passthrough.py
+"""
+Diskless /download: pipe yt-dlp's stdout straight to the client.
+
+The format expression (or the first fallback that matches) is resolved locally
+against the cached metadata, which is
+handed to a yt-dlp subprocess with --load-info-json (no second extraction) and
+written to "-". Single-stream formats are copied as they arrive; when the
+selection merges video + audio, yt-dlp muxes with ffmpeg into fragmented MP4
+(frag_keyframe+empty_moov), which needs no seeking back to write the index.
+
+The only buffers are the OS pipe and one StreamReader of PASSTHROUGH_CHUNK
+bytes: a slow client stalls the reads, the pipe fills and yt-dlp blocks. When
+the client goes away the subprocess is killed.
+
+The subprocess holds one of its site's download slots. Waiting for that slot
+is bounded by the site's extraction deadline and ends as soon as the caller is
+cancelled (the router cancels when the client disconnects).
+"""
+import asyncio
+import json
+import mimetypes
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import yt_dlp
+
+from ..config import settings
+from .extract_pool import ExtractTimeout
+from .host_limiter import limiter as host_limiter
+from .ytdlp_service import _base_ydl_opts, _cookies_for, _site_for, extract_info, extract_timeout, resolve_format
+
+_FMP4_ARGS = "ffmpeg_o:-f mp4 -movflags frag_keyframe+empty_moov+default_base_moof"
+
+
+class PassthroughError(Exception):
+    """yt-dlp exited with an error while streaming."""
+
+
+def _stderr_tail(f, limit: int = 2000) -> str:
+    f.seek(0)
+    return f.read().decode("utf-8", "replace").strip()[-limit:]
+
+
+def plan(url: str, format_string: str) -> Optional[Tuple[Dict, str, Dict, float]]:
+    """
+    (metadata, winning expression, selected format, seconds spent selecting) when
+    the request can be piped, else None (nothing matches, or a merge without
+    ffmpeg to mux it; /download then uses a temp file).
+    """
+    info = extract_info(url, fresh_streams=True)
+    expr, selected, seconds = resolve_format(info, format_string)
+    if selected is None:
+        return None
+    if selected.get("requested_formats") and not shutil.which("ffmpeg"):
+        return None
+    return info, expr, selected, seconds
+
+
+def _command(url: str, info_path: str, selected: Dict) -> list:
+    # the same network options an in-process download gets (_base_ydl_opts), as CLI flags
+    base = _base_ydl_opts(skip_download=False, url=url)
+    cmd = [
+        sys.executable, "-m", "yt_dlp",
+        "--load-info-json", info_path,
+        "--format", selected["format_id"],
+        "--output", "-",
+        "--quiet", "--no-warnings", "--no-progress",
+        "--socket-timeout", str(base["socket_timeout"]), "--retries", str(base["retries"]),
+        "--source-address", base["source_address"],
+    ]
+    if base.get("nocheckcertificate"):
+        cmd.append("--no-check-certificates")
+    for name, value in base.get("http_headers", {}).items():
+        cmd += ["--add-headers", f"{name}:{value}"]
+    for ie, args in base.get("extractor_args", {}).items():
+        cmd += ["--extractor-args", f"{ie}:" + ";".join(f"{k}={v}" for k, v in args.items())]
+    if selected.get("requested_formats"):
+        cmd += ["--merge-output-format", "mp4"]
+        if selected.get("ext") == "mp4":
+            cmd += ["--downloader-args", _FMP4_ARGS]
+    cookies = _cookies_for(url)
+    if cookies:
+        cmd += ["--cookies", cookies]
+    return cmd
+
+
+def media_type(selected: Dict) -> str:
+    return mimetypes.guess_type(f"x.{selected.get('ext') or 'bin'}")[0] or "application/octet-stream"
+
+
+def filename(info: Dict, selected: Dict) -> str:
+    title = info.get("title") or info.get("id") or "download"
+    return f"{title}.{selected.get('ext') or 'bin'}"
+
+
+async def open_stream(url: str, info: Dict, selected: Dict) -> AsyncIterator[bytes]:
+    """
+    Start yt-dlp and wait for its first bytes, so a failure to start surfaces as
+    PassthroughError before any response is sent. Returns the body iterator.
+    """
+    fd, info_path = tempfile.mkstemp(prefix="md_", suffix=".info.json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(yt_dlp.YoutubeDL.sanitize_info(info), f)
+    stderr = tempfile.TemporaryFile()
+    limit = host_limiter.for_site(_site_for(url))
+    site = proc = None
+    try:
+        if limit is not None:
+            await _acquire(url, limit)
+            site = limit
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *_command(url, info_path, selected),
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=stderr,
+                limit=settings.PASSTHROUGH_CHUNK,
+            )
+            first = await proc.stdout.read(settings.PASSTHROUGH_CHUNK)
+            if not first:
+                await proc.wait()
+                raise PassthroughError(_stderr_tail(stderr) or f"yt-dlp exited with {proc.returncode}")
+        except BaseException:
+            _stop(proc, site)
+            raise
+    except BaseException:
+        _cleanup(info_path, stderr)
+        raise
+    return _pipe(proc, first, site, info_path, stderr)
+
+
+async def _acquire(url: str, limit) -> None:
+    """
+    Take a download slot on `limit` without blocking the event loop. Gives up
+    with ExtractTimeout after the site's extraction deadline, and right away
+    when the awaiting task is cancelled.
+    """
+    timeout = extract_timeout(url)
+    deadline = time.monotonic() + timeout if timeout else None
+    abandoned = threading.Event()
+
+    def check():
+        if abandoned.is_set():
+            raise PassthroughError("client went away while waiting for a download slot")
+        if deadline is not None and time.monotonic() >= deadline:
+            raise ExtractTimeout(f"waited longer than {timeout:g}s for a {_site_for(url)} download slot")
+
+    waiting = asyncio.get_running_loop().run_in_executor(None, limit.acquire, check)
+    try:
+        blocked = await asyncio.shield(waiting)
+    except asyncio.CancelledError:
+        abandoned.set()
+        # the wait ends at its next check; a slot taken just before that goes straight back
+        waiting.add_done_callback(lambda f: f.cancelled() or f.exception() or limit.release())
+        raise
+    if blocked:
+        print(f"[PERF] waited {blocked:.2f}s for a {_site_for(url)} slot")
+
+
+async def _pipe(proc, first: bytes, site, info_path: str, stderr) -> AsyncIterator[bytes]:
+    try:
+        yield first
+        while True:
+            chunk = await proc.stdout.read(settings.PASSTHROUGH_CHUNK)
+            if not chunk:
+                break
+            yield chunk
+        if await proc.wait() != 0:
+            # the body is incomplete; raising cuts the connection instead of ending it cleanly
+            raise PassthroughError(_stderr_tail(stderr) or f"yt-dlp exited with {proc.returncode}")
+    finally:
+        # also reached when the client disconnects (the stream task is cancelled)
+        _stop(proc, site)
+        _cleanup(info_path, stderr)
+
+
+def _stop(proc, site) -> None:
+    if proc is not None and proc.returncode is None:
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+    if site is not None:
+        site.release()
+
+
+def _cleanup(info_path: str, stderr) -> None:
+    stderr.close()
+    try:
+        os.remove(info_path)
+    except OSError:
+        pass
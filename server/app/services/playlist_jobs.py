@@ -0,0 +1,211 @@
+# server/app/services/playlist_jobs.py
+"""
+Playlist / channel jobs.
+
+A playlist job expands its URL lazily (ytdlp_service.iter_playlist: flat,
+paginated, pages dropped once read) and turns every entry into an ordinary
+download job via job_manager.start_job, tagged with the playlist id, so the
+entries get dedup, pause/resume, the job store and /jobs/* like any other job.
+
+Expansion is pipelined with the download scheduler: before starting an
+entry's job the expander prefetches that entry's metadata into the info cache
+(the job then starts downloading without extracting), and it stops pulling
+entries while PLAYLIST_LOOKAHEAD of its jobs are still waiting for a slot. So
+entry N+1 is being extracted while entry N downloads, and a playlist with
+thousands of entries never has more than PLAYLIST_LOOKAHEAD of them queued.
+The playlist does keep the id of every entry job it created (job_ids: cancel,
+per-status counts and /playlists/{id}/entries need them), so that
+list grows with the playlist; max_entries bounds it.
+
+Expansion runs under the site's extract slot and deadline like any other
+extraction (ytdlp_service.iter_playlist).
+
+Playlists live in memory only: after a restart their entry jobs resume like
+any other job, but expansion does not continue. The janitor forgets a playlist
+PLAYLIST_RETENTION seconds after its expansion ended, once none of its entry
+jobs is still running (prune).
+"""
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from ..config import settings
+from . import job_events
+from . import job_manager as jm
+from .extract_pool import ExtractCanceled
+from .ytdlp_service import extract_info, iter_playlist
+
+_POLL = 0.5  # seconds between checks while the lookahead window is full
+
+
+@dataclass
+class Playlist:
+    id: str
+    url: str
+    format_string: str
+    priority: int = 0
+    max_entries: Optional[int] = None
+    title: Optional[str] = None
+    status: str = "expanding"           # expanding|expanded|error|canceled
+    error: Optional[str] = None
+    job_ids: List[str] = field(default_factory=list)  # every entry job created, in playlist order
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None  # when expansion ended (expanded/error/canceled)
+
+    # control
+    _cancel: threading.Event = field(default_factory=threading.Event, repr=False)
+
+
+_PLAYLISTS: Dict[str, Playlist] = {}
+_LOCK = threading.Lock()
+
+
+def _set(pl: Playlist, **changes) -> None:
+    with _LOCK:
+        for k, v in changes.items():
+            setattr(pl, k, v)
+    job_events.notify()
+
+
+def _still_queued(job_ids: List[str]) -> List[str]:
+    queued = []
+    for jid in job_ids:
+        try:
+            if jm.get_job(jid).status == "queued":
+                queued.append(jid)
+        except KeyError:
+            pass
+    return queued
+
+
+def _expand(pl: Playlist) -> None:
+    try:
+        meta, entries = iter_playlist(pl.url, cancel=pl._cancel)
+        try:
+            _set(pl, title=meta.get("title") or pl.title)
+            _add_entries(pl, entries)
+        finally:
+            entries.close()  # on an early stop too: ends the session (yt-dlp instance, page fetches)
+        if pl._cancel.is_set():
+            _set(pl, status="canceled", finished_at=time.time())
+        else:
+            _set(pl, status="expanded", finished_at=time.time())
+        print(f"[DEBUG] playlist {pl.id}: {len(pl.job_ids)} entries, {pl.status}")
+    except ExtractCanceled:
+        _set(pl, status="canceled", finished_at=time.time())
+    except Exception as e:
+        _set(pl, status="error", error=str(e), finished_at=time.time())
+        print(f"[WARN] playlist {pl.id}: expansion failed: {e}")
+
+
+def _add_entries(pl: Playlist, entries) -> None:
+    waiting: List[str] = []  # our jobs that haven't got a download slot yet
+    for entry in entries:
+        # back-pressure: don't run ahead of the downloads
+        while True:
+            waiting = _still_queued(waiting)
+            if len(waiting) < settings.PLAYLIST_LOOKAHEAD or pl._cancel.is_set():
+                break
+            pl._cancel.wait(_POLL)
+        if pl._cancel.is_set():
+            break
+        try:
+            # into the metadata cache, so the job starts downloading as soon as it gets a slot
+            extract_info(entry["url"], fresh_streams=True)
+        except Exception as e:
+            print(f"[WARN] playlist {pl.id}: prefetch of {entry['url']} failed: {e}")
+        if pl._cancel.is_set():
+            break
+        job = jm.start_job(entry["url"], pl.format_string, title=entry.get("title"),
+                           priority=pl.priority, playlist_id=pl.id)
+        with _LOCK:
+            pl.job_ids.append(job.id)
+        if pl._cancel.is_set():
+            jm.cancel_job(job.id)  # cancel_playlist may have listed the jobs just before this one
+            break
+        waiting.append(job.id)
+        job_events.notify()
+        if pl.max_entries and len(pl.job_ids) >= pl.max_entries:
+            break
+
+
+def start_playlist(url: str, format_string: str, priority: int = 0,
+                   max_entries: Optional[int] = None) -> Playlist:
+    pl = Playlist(id=str(uuid.uuid4()), url=url, format_string=format_string, priority=priority,
+                  max_entries=max_entries)
+    with _LOCK:
+        _PLAYLISTS[pl.id] = pl
+    threading.Thread(target=_expand, args=(pl,), name=f"playlist-{pl.id[:8]}", daemon=True).start()
+    return pl
+
+
+def cancel_playlist(playlist_id: str) -> Playlist:
+    """Stop expanding and cancel every entry job that hasn't finished."""
+    with _LOCK:
+        pl = _PLAYLISTS[playlist_id]
+        job_ids = list(pl.job_ids)
+    pl._cancel.set()
+    for jid in job_ids:
+        try:
+            jm.cancel_job(jid)
+        except KeyError:
+            pass  # already removed by the janitor
+    return pl
+
+
+def prune(max_age: float) -> int:
+    """Forget playlists whose expansion ended over `max_age` seconds ago and whose entry jobs
+    are all finished or removed. Returns how many were dropped."""
+    now = time.time()
+    with _LOCK:
+        ended = [pl for pl in _PLAYLISTS.values() if pl.finished_at and now - pl.finished_at > max_age]
+    stale = []
+    for pl in ended:
+        if not any(status not in jm.TERMINAL_STATUSES for status in _entry_statuses(pl)):
+            stale.append(pl.id)
+    with _LOCK:
+        for pid in stale:
+            _PLAYLISTS.pop(pid, None)
+    return len(stale)
+
+
+def _entry_statuses(pl: Playlist) -> List[str]:
+    with _LOCK:
+        job_ids = list(pl.job_ids)
+    statuses = []
+    for jid in job_ids:
+        try:
+            statuses.append(jm.get_job(jid).status)
+        except KeyError:
+            statuses.append("removed")
+    return statuses
+
+
+def get_playlist(playlist_id: str) -> Playlist:
+    with _LOCK:
+        return _PLAYLISTS[playlist_id]
+
+
+def list_playlists() -> List[Playlist]:
+    with _LOCK:
+        return list(_PLAYLISTS.values())
+
+
+def entry_ids(pl: Playlist, start: int = 0) -> List[str]:
+    """Ids of the entry jobs created at or after position `start`."""
+    with _LOCK:
+        return pl.job_ids[start:]
+
+
+def snapshot(pl: Playlist) -> dict:
+    with _LOCK:
+        d = {k: v for k, v in pl.__dict__.items() if not k.startswith("_") and k != "job_ids"}
+    statuses = _entry_statuses(pl)
+    counts: Dict[str, int] = {}
+    for status in statuses:
+        counts[status] = counts.get(status, 0) + 1
+    d["entries"] = len(statuses)
+    d["jobs"] = counts
+    return d
@@ -0,0 +1,338 @@
+# server/app/services/thumb_cache.py
+"""
+Thumbnail fetching for /proxy-image.
+
+- one pooled httpx.AsyncClient for the app's lifetime (keep-alive, HTTP/2 via
+  the `h2` package from requirements.txt), closed on shutdown
+- a size-bounded on-disk LRU of images keyed by URL (THUMB_CACHE_DIR); entries
+  younger than THUMB_CACHE_TTL are served without contacting upstream, older
+  ones are revalidated with If-None-Match / If-Modified-Since
+- upstream bodies are streamed to disk and cut off at THUMB_MAX_BYTES
+- concurrent requests for the same URL share one upstream fetch
+- resized WebP/JPEG variants (widths snapped to a few buckets) are encoded
+  with Pillow on a small thread pool and cached in the same LRU, once per
+  source image version; the source is pinned (never evicted) while it is
+  encoded; if Pillow is missing the original is served and a warning is logged
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Iterator, Optional, Tuple
+
+import httpx
+
+from ..config import settings
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+    print("[WARN] Pillow is not installed: /proxy-image?w=/fmt= will serve original images "
+          "(pip install -r requirements.txt)")
+
+
+class ThumbTooLarge(Exception):
+    pass
+
+
+class ThumbCache:
+    def __init__(self, root: str, max_bytes: int, ttl: float):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> size; order = LRU (oldest first)
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._pins: Dict[str, int] = {}  # key -> users that need its file to stay
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(root, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def key_for(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _data_path(self, key: str) -> str:
+        return os.path.join(self.root, key + ".img")
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.root, key + ".json")
+
+    def _load_index(self) -> None:
+        entries = []
+        for entry in os.scandir(self.root):
+            if entry.name.endswith(".img"):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_atime, entry.name[:-4], st.st_size))
+            elif entry.name.endswith(".tmp"):
+                os.remove(entry.path)  # interrupted fetch from a previous run
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._bytes += size
+
+    # ---------- entries ----------
+    def lookup(self, key: str) -> Optional[Tuple[str, Dict]]:
+        """(file path, metadata) of a cached image, marking it recently used."""
+        with self._lock:
+            if key not in self._index:
+                return None
+            self._index.move_to_end(key)
+        try:
+            with open(self._meta_path(key), encoding="utf-8") as f:
+                meta = json.load(f)
+            # LRU order survives restarts via atime; mtime stays put since it feeds the ETag
+            path = self._data_path(key)
+            os.utime(path, (time.time(), os.stat(path).st_mtime))
+        except (OSError, ValueError):
+            self._forget(key)
+            return None
+        return self._data_path(key), meta
+
+    def fresh(self, meta: Dict) -> bool:
+        return time.time() - meta.get("fetched_at", 0) < self.ttl
+
+    def write_meta(self, key: str, meta: Dict) -> None:
+        tmp = self._meta_path(key) + f".{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._meta_path(key))
+
+    def temp_path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.{uuid.uuid4().hex}.tmp")
+
+    def commit(self, key: str, tmp_path: str, meta: Dict) -> str:
+        """Move a fully downloaded image into place and evict down to max_bytes."""
+        size = os.path.getsize(tmp_path)
+        self.write_meta(key, meta)
+        os.replace(tmp_path, self._data_path(key))
+        with self._lock:
+            self._bytes += size - self._index.pop(key, 0)
+            self._index[key] = size
+            victims = []
+            for old in list(self._index):
+                if self._bytes <= self.max_bytes:
+                    break
+                if old == key or old in self._pins:
+                    continue
+                self._bytes -= self._index.pop(old)
+                self.evictions += 1
+                victims.append(old)
+        for old in victims:
+            self._remove_files(old)
+        return self._data_path(key)
+
+    @contextmanager
+    def pinned(self, key: str) -> Iterator[None]:
+        """Keep `key`'s file from being evicted for the duration of the block."""
+        with self._lock:
+            self._pins[key] = self._pins.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pins[key] -= 1
+                if not self._pins[key]:
+                    del self._pins[key]
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            self._bytes -= self._index.pop(key, 0)
+        self._remove_files(key)
+
+    def _remove_files(self, key: str) -> None:
+        for p in (self._data_path(key), self._meta_path(key)):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "revalidated": self.revalidated,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "resize": Image is not None,
+            }
+
+
+cache = ThumbCache(settings.THUMB_CACHE_DIR, settings.THUMB_CACHE_MAX_BYTES, settings.THUMB_CACHE_TTL)
+
+_CLIENT: Optional[httpx.AsyncClient] = None
+_INFLIGHT: Dict[str, "asyncio.Task"] = {}
+
+
+def client() -> httpx.AsyncClient:
+    """The shared upstream client (created on first use, inside the event loop)."""
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = httpx.AsyncClient(
+            http2=True,  # multiplexes the thumbnail requests to a CDN over one connection
+            follow_redirects=True,
+            timeout=httpx.Timeout(15.0, connect=5.0),
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60),
+        )
+    return _CLIENT
+
+
+async def aclose() -> None:
+    global _CLIENT
+    if _CLIENT is not None:
+        await _CLIENT.aclose()
+        _CLIENT = None
+
+
+async def _single_flight(key: str, work: Callable[[], Awaitable]):
+    task = _INFLIGHT.get(key)
+    if task is None:
+        task = asyncio.ensure_future(work())
+        _INFLIGHT[key] = task
+        task.add_done_callback(lambda _: _INFLIGHT.pop(key, None))
+    return await asyncio.shield(task)
+
+
+async def fetch(url: str) -> Tuple[str, Dict]:
+    """
+    Cached copy of the image at `url`: (file path, metadata with content_type,
+    etag, last_modified, fetched_at). Raises httpx errors or ThumbTooLarge.
+    """
+    key = cache.key_for(url)
+    return await _single_flight(key, lambda: _fetch(url, key))
+
+
+async def _fetch(url: str, key: str) -> Tuple[str, Dict]:
+    cached = cache.lookup(key)
+    if cached and cache.fresh(cached[1]):
+        cache.hits += 1
+        return cached
+
+    headers = {}
+    if cached:
+        if cached[1].get("etag"):
+            headers["If-None-Match"] = cached[1]["etag"]
+        if cached[1].get("last_modified"):
+            headers["If-Modified-Since"] = cached[1]["last_modified"]
+
+    async with client().stream("GET", url, headers=headers) as response:
+        if cached and response.status_code == 304:
+            meta = {**cached[1], "fetched_at": time.time()}
+            cache.write_meta(key, meta)
+            cache.revalidated += 1
+            return cached[0], meta
+        response.raise_for_status()
+        declared = int(response.headers.get("content-length") or 0)
+        if declared > settings.THUMB_MAX_BYTES:
+            raise ThumbTooLarge(f"image is {declared} bytes (limit {settings.THUMB_MAX_BYTES})")
+
+        tmp = cache.temp_path(key)
+        try:
+            size = 0
+            with open(tmp, "wb") as f:
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size > settings.THUMB_MAX_BYTES:
+                        raise ThumbTooLarge(f"image exceeds {settings.THUMB_MAX_BYTES} bytes")
+                    f.write(chunk)
+            meta = {
+                "url": url,
+                "content_type": response.headers.get("content-type", "image/jpeg"),
+                "etag": response.headers.get("etag"),
+                "last_modified": response.headers.get("last-modified"),
+                "fetched_at": time.time(),
+            }
+            path = cache.commit(key, tmp, meta)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+    cache.misses += 1
+    return path, meta
+
+
+# ---------- resized variants ----------
+WIDTHS = (80, 160, 240, 320, 480, 640, 960, 1280)
+FORMATS = {"webp": ("WEBP", "image/webp"), "jpeg": ("JPEG", "image/jpeg")}
+_POOL = ThreadPoolExecutor(max_workers=settings.THUMB_RESIZE_WORKERS, thread_name_prefix="thumb-resize")
+
+
+def snap_width(width: int) -> int:
+    """Round up to a bucket so arbitrary widths don't each get their own variant."""
+    return next((w for w in WIDTHS if w >= width), WIDTHS[-1])
+
+
+def _encode(src: str, dst: str, width: int, fmt: str) -> None:
+    with Image.open(src) as im:
+        im.draft("RGB", (width, width))  # JPEG sources decode at a reduced scale
+        im.thumbnail((width, width * 4), Image.LANCZOS, reducing_gap=2.0)  # never upscales
+        if fmt == "jpeg" and im.mode not in ("RGB", "L"):
+            im = im.convert("RGB")
+        if fmt == "webp":
+            im.save(dst, "WEBP", quality=settings.THUMB_QUALITY, method=4)
+        else:
+            im.save(dst, "JPEG", quality=settings.THUMB_QUALITY, optimize=True, progressive=True)
+
+
+def _source_tag(path: str, meta: Dict) -> str:
+    # which version of the original a variant was made from
+    return f"{meta.get('etag')}|{meta.get('last_modified')}|{os.path.getsize(path)}"
+
+
+async def fetch_variant(url: str, width: Optional[int], fmt: str) -> Tuple[str, Dict]:
+    """
+    The image at `url` at most `width` px wide (snapped up to a bucket) encoded
+    as `fmt` ("webp" or "jpeg"). Falls back to the original (with a warning)
+    without Pillow or when the image can't be decoded.
+    """
+    if Image is None:
+        print(f"[WARN] not resizing {url}: Pillow is not installed")
+        return await fetch(url)
+    width = snap_width(width or WIDTHS[-1])
+    key = cache.key_for(f"{url}\n{width}\n{fmt}")
+    return await _single_flight(key, lambda: _variant(url, key, width, fmt))
+
+
+async def _variant(url: str, key: str, width: int, fmt: str) -> Tuple[str, Dict]:
+    # other requests' commits evict by LRU; the source has to outlive its encode
+    # (and the fallback to it), so it is pinned from before it is fetched
+    with cache.pinned(cache.key_for(url)):
+        src_path, src_meta = await fetch(url)
+        tag = _source_tag(src_path, src_meta)
+        cached = cache.lookup(key)
+        if cached and cached[1].get("source") == tag:
+            cache.hits += 1
+            return cached
+
+        tmp = cache.temp_path(key)
+        try:
+            await asyncio.get_running_loop().run_in_executor(_POOL, _encode, src_path, tmp, width, fmt)
+        except Exception as e:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            print(f"[WARN] thumbnail resize failed for {url}: {e}")
+            return src_path, src_meta
+        meta = {"url": url, "content_type": FORMATS[fmt][1], "source": tag, "width": width,
+                "fetched_at": src_meta.get("fetched_at")}
+        cache.misses += 1
+        return cache.commit(key, tmp, meta), meta
@@ -321,12 +321,24 @@
 
 
 # ytdlp_service.py
+import asyncio
 import os
+import shutil
 import tempfile
-from typing import Dict, List, Optional
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
 
 import yt_dlp
+from yt_dlp.utils import PagedList
+
+from ..config import settings
+from .info_cache import cache as info_cache
+from .info_store import store as info_store, streams_fresh
+from .host_limiter import limiter as host_limiter
+from .extract_pool import pool as extract_pool, ExtractCanceled, ExtractTimeout
 
 # Folder where cookie files (youtube.txt, etc.) live
 COOKIES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "..", "cookies")
@@ -334,17 +346,28 @@ COOKIES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "..", "co
 
 # --------------------------- Cookies ---------------------------
 
-def _cookies_for(url: str) -> Optional[str]:
+# Site family -> host fragments; shared by cookies, caching and rate limiting
+_SITE_HOSTS = {
+    "youtube":   ["youtube.com", "youtu.be"],
+    "instagram": ["instagram.com"],
+    "facebook":  ["facebook.com", "fb.watch", "facebook.com/share"],
+    "twitter":   ["twitter.com", "x.com"],
+}
+
+
+def _site_for(url: str) -> Optional[str]:
     u = url.lower()
-    for name, keys in {
-        "youtube.txt":   ["youtube.com", "youtu.be"],
-        "instagram.txt": ["instagram.com"],
-        "facebook.txt":  ["facebook.com", "fb.watch", "facebook.com/share"],
-        "twitter.txt":   ["twitter.com", "x.com"],
-    }.items():
+    for site, keys in _SITE_HOSTS.items():
         if any(k in u for k in keys):
-            path = os.path.join(COOKIES_DIR, name)
-            return path if os.path.exists(path) else None
+            return site
+    return None
+
+
+def _cookies_for(url: str) -> Optional[str]:
+    site = _site_for(url)
+    if site:
+        path = os.path.join(COOKIES_DIR, f"{site}.txt")
+        return path if os.path.exists(path) else None
     return None
 
 
@@ -419,27 +442,264 @@ def _base_ydl_opts(skip_download: bool = True, url: str = None) -> Dict:
 
 # --------------------------- Public API ---------------------------
 
-def extract_info(url: str) -> Dict:
-    """
-    Extract metadata for a single video (fast), even if the original URL was a playlist-y watch URL.
-    """
-    import time
-    start_time = time.time()
+def extract_timeout(url: str) -> Optional[float]:
+    """Overall extraction deadline for `url`'s site family, in seconds (None = no deadline)."""
+    return settings.EXTRACT_SITE_TIMEOUTS.get(_site_for(url) or "", settings.EXTRACT_TIMEOUT) or None
 
-    # Normalize YT URLs so &list=... doesn't slow things down
-    url = _normalize_youtube_url(url)
+
+def _extract_info_uncached(url: str, cancel: Optional[threading.Event] = None) -> Dict:
+    start_time = time.time()
+    timeout = extract_timeout(url)
+    deadline = time.monotonic() + timeout if timeout else None
 
     ydl_opts = _base_ydl_opts(skip_download=True, url=url)
     cookies = _cookies_for(url)
     if cookies:
         ydl_opts["cookiefile"] = cookies
 
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        result = ydl.extract_info(url, download=False)
+    def check():
+        if cancel is not None and cancel.is_set():
+            raise ExtractCanceled(f"extraction of {url} canceled")
+        if deadline is not None and time.monotonic() >= deadline:
+            raise ExtractTimeout(f"extraction of {url} took longer than {timeout:g}s")
+
+    # the deadline covers the wait for a host slot too, not just yt-dlp's own work
+    with host_limiter.slot(_site_for(url), check=check, kind="extract") as blocked:
+        if blocked:
+            print(f"[PERF] waited {blocked:.2f}s for a {_site_for(url)} slot")
+        check()
+        remaining = deadline - time.monotonic() if deadline is not None else None
+        if extract_pool.enabled:
+            # off the API process's GIL; killed on deadline or when nobody waits any more
+            result = extract_pool.submit(url, ydl_opts, timeout=remaining, cancel=cancel).result()
+        else:
+            # can't be interrupted in-process; at least keep one stalled read from outliving the deadline
+            if remaining is not None:
+                ydl_opts["socket_timeout"] = max(1, min(ydl_opts["socket_timeout"], remaining))
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                result = ydl.extract_info(url, download=False)
         print(f"[PERF] yt-dlp extraction took {time.time() - start_time:.2f} seconds")
         return result
 
 
+def _extract_and_store(url: str, cancel: Optional[threading.Event] = None) -> Dict:
+    result = _extract_info_uncached(url, cancel)
+    info_store.put(url, _site_for(url), result)
+    return result
+
+
+def _load_info(url: str, cancel: Optional[threading.Event] = None) -> Dict:
+    stored = info_store.get(url)
+    if stored is not None:
+        return stored
+    return _extract_and_store(url, cancel)
+
+
+class _Flight:
+    """Callers waiting on one URL's extraction; it is cancelled only when all of them gave up."""
+    __slots__ = ("waiters", "cancel")
+
+    def __init__(self):
+        self.waiters = 0
+        self.cancel = threading.Event()
+
+
+_FLIGHTS: Dict[str, _Flight] = {}
+_FLIGHTS_LOCK = threading.Lock()
+# Async callers wait here rather than in Starlette's request threadpool
+_LOADERS = ThreadPoolExecutor(max_workers=settings.INFO_LOAD_THREADS, thread_name_prefix="info-load")
+
+
+def _join_flight(url: str) -> _Flight:
+    with _FLIGHTS_LOCK:
+        flight = _FLIGHTS.setdefault(url, _Flight())
+        flight.waiters += 1
+        return flight
+
+
+def _leave_flight(url: str, flight: _Flight, abandon: bool = False) -> None:
+    with _FLIGHTS_LOCK:
+        flight.waiters -= 1
+        if flight.waiters > 0:
+            return
+        if _FLIGHTS.get(url) is flight:
+            del _FLIGHTS[url]
+        if abandon:
+            # its pending cache load goes too, before anyone can join again: a later
+            # caller starts a new extraction instead of waiting on this cancelled one
+            info_cache.fail(url, ExtractCanceled(f"extraction of {url} canceled"))
+    if abandon:
+        flight.cancel.set()
+
+
+def _lead(url: str, cancel: threading.Event, fut: Future) -> Dict:
+    # `fut` is this load's cache entry; an abandoned load may have been replaced by a newer one
+    try:
+        value = _load_info(url, cancel)
+    except BaseException as e:
+        info_cache.fail(url, e, fut)
+        raise
+    info_cache.resolve(url, value, fut=fut)
+    return value
+
+
+def extract_info(url: str, fresh_streams: bool = False) -> Dict:
+    """
+    Extract metadata for a single video (fast), even if the original URL was a playlist-y watch URL.
+    Results are served from the in-memory metadata cache (backed by the optional on-disk store);
+    concurrent requests for the same URL share one extraction.
+
+    Cached metadata may carry expired stream URLs. That is fine for /info; pass
+    fresh_streams=True when the result is going to be downloaded from. Stale
+    streams mean a full re-extraction that replaces the cached and stored entry:
+    yt-dlp can't re-sign the format URLs alone.
+    """
+    # Normalize YT URLs so &list=... doesn't slow things down (and so they share a cache key)
+    url = _normalize_youtube_url(url)
+    flight = _join_flight(url)
+    try:
+        result = info_cache.get_or_load(url, lambda: _load_info(url, flight.cancel))
+        if fresh_streams and not streams_fresh(result):
+            info_cache.invalidate(url)
+            result = info_cache.get_or_load(url, lambda: _extract_and_store(url, flight.cancel))
+        return result
+    finally:
+        _leave_flight(url, flight)
+
+
+async def extract_info_async(url: str) -> Dict:
+    """
+    extract_info for async handlers (/info): same cache, store and coalescing, but
+    awaited without holding a request thread. When every caller waiting on an
+    extraction has been cancelled, the extraction is cancelled too.
+    """
+    url = _normalize_youtube_url(url)
+    flight = _join_flight(url)
+    abandon = False
+    try:
+        value, fut, leader = info_cache.claim(url) if info_cache.enabled else (None, None, True)
+        if value is not None:
+            return value
+        if leader:
+            if fut is not None:
+                _LOADERS.submit(_lead, url, flight.cancel, fut)
+            else:
+                fut = _LOADERS.submit(_load_info, url, flight.cancel)
+        return await asyncio.wrap_future(fut)
+    except asyncio.CancelledError:
+        abandon = True
+        raise
+    finally:
+        _leave_flight(url, flight, abandon)
+
+
+def warm_info_cache() -> int:
+    """Load the most-requested stored entries into the memory cache (called on boot)."""
+    if not (info_store.enabled and info_cache.enabled):
+        return 0
+    info_store.purge_expired()
+    entries = info_store.hottest(min(settings.INFO_STORE_WARM, info_cache.max_entries))
+    # hottest first -> insert coldest first so LRU order matches popularity
+    for key, info, seconds_left in reversed(entries):
+        info_cache.put(key, info, ttl=min(info_cache.ttl, seconds_left))
+    print(f"[DEBUG] warmed metadata cache with {len(entries)} stored entries")
+    return len(entries)
+
+
+# --------------------------- Playlists / channels ---------------------------
+
+def iter_playlist(url: str, cancel: Optional[threading.Event] = None) -> Tuple[Dict, Iterator[Dict]]:
+    """
+    Lazily expand a playlist or channel URL: (playlist metadata without its
+    entries, iterator of flat entries with at least "url" and usually "title").
+
+    The extraction is flat and unprocessed, so paginated sites fetch the next
+    page only when the iterator gets there, and pages are not kept once read:
+    memory stays the same however long the playlist is. A single-video URL
+    yields just itself.
+
+    Like any extraction it takes one of the site's extract slots and has the
+    site's deadline (ExtractTimeout; ExtractCanceled once `cancel` is set). So
+    does every later step of the iterator, which may fetch the next page; those
+    steps continue the same session and don't take a rate token.
+    """
+    site = _site_for(url)
+    timeout = extract_timeout(url)
+    opts = _base_ydl_opts(skip_download=True, url=url)
+    opts.pop("playlist_items", None)
+    opts.update({"noplaylist": False, "extract_flat": "in_playlist", "lazy_playlist": True})
+    if timeout:
+        # a page fetch can't be interrupted; at least keep one stalled read from outliving the deadline
+        opts["socket_timeout"] = max(1, min(opts["socket_timeout"], timeout))
+    cookies = _cookies_for(url)
+    if cookies:
+        opts["cookiefile"] = cookies
+
+    ydl = yt_dlp.YoutubeDL(opts)
+    try:
+        check = _expansion_check(url, timeout, cancel)
+        with host_limiter.slot(site, check=check, kind="extract") as blocked:
+            if blocked:
+                print(f"[PERF] waited {blocked:.2f}s for a {site} slot")
+            check()
+            result = ydl.extract_info(url, download=False, process=False)
+            for _ in range(5):
+                # e.g. a channel page redirecting to its videos tab
+                if result.get("_type") not in ("url", "url_transparent"):
+                    break
+                check()
+                result = ydl.extract_info(result["url"], ie_key=result.get("ie_key"), download=False, process=False)
+    except BaseException:
+        ydl.close()
+        raise
+    entries = result.pop("entries", None)
+    if entries is None:
+        entries = [{"url": result.get("webpage_url") or url, "title": result.get("title")}]
+    return result, _flat_entries(ydl, entries, url, timeout, cancel)
+
+
+def _expansion_check(url: str, timeout: Optional[float], cancel: Optional[threading.Event]):
+    deadline = time.monotonic() + timeout if timeout else None
+
+    def check():
+        if cancel is not None and cancel.is_set():
+            raise ExtractCanceled(f"expansion of {url} canceled")
+        if deadline is not None and time.monotonic() >= deadline:
+            raise ExtractTimeout(f"expansion of {url} took longer than {timeout:g}s")
+    return check
+
+
+def _flat_entries(ydl, entries, url: str, timeout: Optional[float],
+                  cancel: Optional[threading.Event]) -> Iterator[Dict]:
+    walk = _walk_entries(entries)
+    try:
+        while True:
+            check = _expansion_check(url, timeout, cancel)
+            with host_limiter.slot(_site_for(url), check=check, kind="extract", token=False):
+                check()
+                entry = next(walk, None)
+            if entry is None:
+                return
+            yield entry
+    finally:
+        ydl.close()
+
+
+def _walk_entries(entries) -> Iterator[Dict]:
+    if isinstance(entries, PagedList):
+        entries._use_cache = False  # read once, front to back
+        entries = entries._getslice(0, None)
+    for entry in entries:
+        if not entry:
+            continue
+        if entry.get("_type") == "playlist" and entry.get("entries") is not None:
+            yield from _walk_entries(entry["entries"])  # e.g. a channel's tabs
+            continue
+        entry_url = entry.get("webpage_url") or entry.get("url")
+        if entry_url:
+            yield {"url": entry_url, "title": entry.get("title"), "duration": entry.get("duration")}
+
+
 # def download_to_temp(url: str, format_string: str) -> str:
 #     """
 #     Download the chosen format to a temp dir and return the file path.
@@ -531,74 +791,218 @@ def extract_info(url: str) -> Dict:
 #     raise RuntimeError("Download failed: file not found")
 
 
-def download_to_temp(url: str, format_string: str) -> str:
-    import yt_dlp
-    tmpdir = tempfile.mkdtemp(prefix="md_")
-    outtmpl = os.path.join(tmpdir, "%(title)s.%(ext)s")
+# Offline format selection needs a YoutubeDL for its parser, but building one takes
+# ~0.1 s; one shared instance (merge container mp4) serves every selection.
+_SELECTOR: Optional["yt_dlp.YoutubeDL"] = None
+_SELECTOR_LOCK = threading.Lock()
+
+# Tried in order after the requested expression. The old third fallback,
+# "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best", ends in "best" and so can never
+# match (or pick anything new) once "best" itself failed.
+_FALLBACK_FORMATS = (
+    "bv*+ba/best",                                 # merged best
+    "best",                                        # any best
+)
+
 
+def _selector() -> "yt_dlp.YoutubeDL":
+    # caller holds _SELECTOR_LOCK
+    global _SELECTOR
+    if _SELECTOR is None:
+        _SELECTOR = yt_dlp.YoutubeDL({"quiet": True, "merge_output_format": "mp4"})
+    return _SELECTOR
+
+
+def format_error(format_string: str) -> Optional[str]:
+    """Why `format_string` is not a valid format expression, or None if it parses."""
+    with _SELECTOR_LOCK:
+        try:
+            _selector().build_format_selector(format_string)
+        except (SyntaxError, ValueError) as e:
+            return (str(e) or "invalid format expression").splitlines()[0]
+    return None
+
+
+def select_format(info: Dict, format_string: str) -> Optional[Dict]:
+    """
+    Resolve a format expression against already-extracted metadata, without any
+    network access. Returns the chosen format (merged selections carry
+    "requested_formats", with mp4 as the merge container) or None if nothing matches.
+    """
+    formats = info.get("formats") or [info]
+    with _SELECTOR_LOCK:
+        ydl = _selector()
+        try:
+            selected = ydl._select_formats(formats, ydl.build_format_selector(format_string))
+        except (SyntaxError, ValueError) as e:
+            print(f"[WARN] bad format expression {format_string!r}: {e}")
+            return None
+    return selected[0] if selected else None
+
+
+def resolve_format(info: Dict, format_string: str) -> Tuple[Optional[str], Optional[Dict], float]:
+    """
+    The first of `format_string` and the fallback expressions that matches `info`:
+    (expression, selected format, seconds spent selecting). (None, None, t) if none does.
+    """
+    start = time.perf_counter()
+    for expr in (format_string, *_FALLBACK_FORMATS):
+        selected = select_format(info, expr)
+        if selected is not None:
+            return expr, selected, time.perf_counter() - start
+        print(f"[WARN] format '{expr}' matches nothing")
+    return None, None, time.perf_counter() - start
+
+
+def candidate_formats(info: Dict, format_string: str) -> Tuple[List[Tuple[str, Dict]], float]:
+    """
+    Every distinct selection of `format_string` and the fallbacks against `info`,
+    in order, as (expression, selected format); a download that fails moves on to
+    the next one. Also returns the seconds spent selecting.
+    """
+    start = time.perf_counter()
+    out, seen = [], set()
+    for expr in (format_string, *_FALLBACK_FORMATS):
+        selected = select_format(info, expr)
+        if selected is None:
+            if expr == format_string:
+                print(f"[WARN] format '{expr}' matches nothing")
+        elif selected.get("format_id") not in seen:
+            seen.add(selected.get("format_id"))
+            out.append((expr, selected))
+    return out, time.perf_counter() - start
+
+
+# (normalized url, format) -> (file, winning expression) from an earlier /download,
+# kept until the janitor removes its md_* dir, so Range requests resuming a
+# download don't fetch it again. Written by concurrent /download handlers: only
+# touch it under _ONESHOT_LOCK
+_ONESHOT_FILES: Dict[tuple, Tuple[str, str]] = {}
+_ONESHOT_LOCK = threading.Lock()
+# md_* dirs a /download is still writing into; the janitor never sweeps these
+_ONESHOT_ACTIVE: set = set()
+
+
+def oneshot_dirs_in_use() -> set:
+    with _ONESHOT_LOCK:
+        return set(_ONESHOT_ACTIVE)
+
+
+def download_to_temp(url: str, format_string: str) -> Tuple[str, str, float]:
+    """
+    Download to a fresh md_* dir. Returns (file path, format expression that was
+    used, seconds spent choosing it).
+    """
     # Normalize first so we don't accidentally start a full playlist download
     url = _normalize_youtube_url(url)
+    key = (url, format_string)
+    with _ONESHOT_LOCK:
+        previous = _ONESHOT_FILES.get(key)
+    if previous and os.path.isfile(previous[0]):
+        return previous[0], previous[1], 0.0
+    path, expr, seconds = _download_to_temp(url, format_string)
+    with _ONESHOT_LOCK:
+        if len(_ONESHOT_FILES) >= 256:
+            for k, (p, _) in list(_ONESHOT_FILES.items()):
+                if not os.path.isfile(p):
+                    del _ONESHOT_FILES[k]
+        _ONESHOT_FILES[key] = (path, expr)
+    return path, expr, seconds
+
+
+def _download_to_temp(url: str, format_string: str) -> Tuple[str, str, float]:
+    # One extraction (usually from the cache); the requested expression and the
+    # fallbacks are then selected against it locally instead of one extraction each.
+    # As before, a download that fails goes on to the next fallback.
+    info = extract_info(url, fresh_streams=True)
+    candidates, seconds = candidate_formats(info, format_string)
+    if not candidates:
+        raise RuntimeError("Download failed: no viable format")
+
+    site = _site_for(url)
+    timeout = extract_timeout(url)
+    deadline = time.monotonic() + timeout if timeout else None
+
+    def check():
+        if deadline is not None and time.monotonic() >= deadline:
+            raise ExtractTimeout(f"waited longer than {timeout:g}s for a {site} download slot")
 
-    def run_with_format(fmt_expr: str) -> Optional[str]:
-        ydl_opts = _base_ydl_opts(skip_download=False, url=url)
-        ydl_opts.update({
-            "format": fmt_expr,
-            "outtmpl": outtmpl,
-            "noprogress": True,
-            "quiet": True,
-            # Prefer mp4 when a merge happens
-            "merge_output_format": "mp4",
-        })
-        cookies = _cookies_for(url)
-        if cookies:
-            ydl_opts["cookiefile"] = cookies
-
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            result = ydl.extract_info(url, download=True)
-            if "_filename" in result:
-                return result["_filename"]
-            entries = result.get("entries") or []
-            if entries and "_filename" in entries[0]:
-                return entries[0]["_filename"]
-            for f in os.listdir(tmpdir):
-                p = os.path.join(tmpdir, f)
-                if os.path.isfile(p):
-                    return p
-        return None
-
-    # 1) Try the user-provided expression first
+    tmpdir = tempfile.mkdtemp(prefix="md_")
+    with _ONESHOT_LOCK:
+        _ONESHOT_ACTIVE.add(tmpdir)
     try:
-        p = run_with_format(format_string)
-        if p:
-            return p
-    except yt_dlp.utils.DownloadError as e:
-        # Known: “Requested format is not available …”
-        print(f"[WARN] primary format failed: {e}")
-
-    # 2) Fallbacks (very resilient)
-    for fallback in [
-        "bv*+ba/best",                                 # merged best
-        "best",                                        # any best
-        "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best",  # mp4-ish merged
-    ]:
-        try:
-            p = run_with_format(fallback)
-            if p:
-                return p
-        except yt_dlp.utils.DownloadError as e:
-            print(f"[WARN] fallback '{fallback}' failed: {e}")
+        with host_limiter.slot(site, check=check) as blocked:
+            if blocked:
+                print(f"[PERF] waited {blocked:.2f}s for a {site} slot")
+            for expr, selected in candidates:
+                print(f"[PERF] format '{expr}' -> {selected.get('format_id')} chosen in {seconds * 1000:.1f} ms")
+                try:
+                    return _download_into(url, info, selected, tmpdir), expr, seconds
+                except yt_dlp.utils.DownloadError as e:
+                    print(f"[WARN] format '{expr}' failed: {e}")
+                    _empty_dir(tmpdir)  # don't let a later attempt pick up this one's leftovers
+        raise RuntimeError("Download failed: no viable format")
+    finally:
+        with _ONESHOT_LOCK:
+            _ONESHOT_ACTIVE.discard(tmpdir)
+
+
+def _empty_dir(path: str) -> None:
+    for name in os.listdir(path):
+        p = os.path.join(path, name)
+        if os.path.isdir(p):
+            shutil.rmtree(p, ignore_errors=True)
+        else:
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+
+
+def _download_into(url: str, info: Dict, selected: Dict, tmpdir: str) -> str:
+    """Download `selected` from already-extracted `info` into `tmpdir` (caller holds the site's slot)."""
+    ydl_opts = _base_ydl_opts(skip_download=False, url=url)
+    ydl_opts.update({
+        "format": selected["format_id"],
+        "outtmpl": os.path.join(tmpdir, "%(title)s.%(ext)s"),
+        "noprogress": True,
+        "quiet": True,
+        # Prefer mp4 when a merge happens
+        "merge_output_format": "mp4",
+    })
+    cookies = _cookies_for(url)
+    if cookies:
+        ydl_opts["cookiefile"] = cookies
 
-    raise RuntimeError("Download failed: no viable format")
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        # the same path as --load-info-json: process the stored result, no extraction
+        result = ydl.process_ie_result(yt_dlp.YoutubeDL.sanitize_info(info), download=True)
+    path = result.get("filepath") or result.get("_filename")
+    if path and os.path.isfile(path):
+        return path
+    for f in os.listdir(tmpdir):
+        p = os.path.join(tmpdir, f)
+        if os.path.isfile(p):
+            return p
+    raise RuntimeError("Download failed: file not found")
 
 
 
 
 # --------------------------- Presentation helpers (unchanged logic) ---------------------------
 
-def select_thumbnail(meta: Dict) -> Optional[str]:
+def select_thumbnail(meta: Dict, min_width: Optional[int] = None) -> Optional[str]:
+    """
+    The main (or highest) thumbnail; with `min_width`, the smallest one that is at
+    least that wide, when the site reports thumbnail sizes.
+    """
+    thumbs = meta.get("thumbnails") or []
+    if min_width:
+        wide = [t for t in thumbs if isinstance(t, dict) and t.get("url") and (t.get("width") or 0) >= min_width]
+        if wide:
+            return min(wide, key=lambda t: t["width"])["url"]
     if isinstance(meta.get("thumbnail"), str):
         return meta["thumbnail"]
-    thumbs = meta.get("thumbnails") or []
     best = None
     for t in thumbs:
         if isinstance(t, dict) and t.get("url"):
@@ -682,6 +1086,8 @@ def build_formats(info: Dict) -> List[Dict]:
                 "ext": best_audio.get("ext") or "m4a",
                 "filesize": bytes_human(best_audio.get("filesize") or best_audio.get("filesize_approx")),
             })
+        for item in out_audio:
+            _annotate_size(info, item)
         return out_audio
 
     heights = sorted(heights)  # ascending
@@ -747,8 +1153,118 @@ def build_formats(info: Dict) -> List[Dict]:
         "filesize": "",
     })
 
+    for item in out:
+        _annotate_size(info, item)
     return out
 
+
+# --------------------------- Size / bitrate estimates ---------------------------
+
+def _format_bytes(f: Dict, duration: Optional[float]) -> Tuple[Optional[int], bool]:
+    """(bytes, exact) for one format: its filesize, else filesize_approx, else tbr x duration."""
+    if f.get("filesize"):
+        return int(f["filesize"]), True
+    if f.get("filesize_approx"):
+        return int(f["filesize_approx"]), False
+    if f.get("tbr") and duration:
+        return int(f["tbr"] * 1000 / 8 * duration), False
+    return None, False
+
+
+def _format_kbps(f: Dict, duration: Optional[float]) -> Optional[float]:
+    if f.get("tbr"):
+        return float(f["tbr"])
+    if f.get("vbr") or f.get("abr"):
+        return float((f.get("vbr") or 0) + (f.get("abr") or 0))
+    size = f.get("filesize") or f.get("filesize_approx")
+    if size and duration:
+        return size * 8 / duration / 1000
+    return None
+
+
+def estimate_output(info: Dict, parts: List[Dict]) -> Tuple[Optional[int], bool, Optional[float]]:
+    """
+    Estimated (bytes, exact, kbps) of downloading `parts` (one progressive format,
+    or the video + audio of a merge). None where any part is unknown.
+    """
+    duration = info.get("duration")
+    total, exact, kbps = 0, True, 0.0
+    for f in parts:
+        size, size_exact = _format_bytes(f, duration)
+        rate = _format_kbps(f, duration)
+        total = None if size is None or total is None else total + size
+        kbps = None if rate is None or kbps is None else kbps + rate
+        exact = exact and size_exact
+    return total, exact and total is not None, kbps
+
+
+def _size_label(size: Optional[int], exact: bool) -> str:
+    return "" if not size else (bytes_human(size) if exact else f"~{bytes_human(size)}")
+
+
+def _annotate_size(info: Dict, item: Dict) -> None:
+    """Fill an offered expression's filesize fields from what it resolves to in `info`."""
+    selected = select_format(info, item["format_string"])
+    if selected is None:
+        return
+    size, exact, kbps = estimate_output(info, selected.get("requested_formats") or [selected])
+    item["filesize"] = _size_label(size, exact)
+    item["filesize_bytes"] = size
+    item["tbr"] = round(kbps, 1) if kbps else None
+
+
+def budget_format(info: Dict, max_bytes: Optional[int] = None, max_kbps: Optional[float] = None) -> Optional[Dict]:
+    """
+    Best quality whose estimated size is at most `max_bytes` and/or whose
+    bitrate is at most `max_kbps`, as a FormatItem dict with a concrete
+    expression ("137+140" or "18"). Considers progressive formats and every
+    video-only + audio-only pair; formats whose size/bitrate can't be estimated
+    don't qualify. None if nothing fits.
+    """
+    fmts = [f for f in info.get("formats") or [] if f.get("format_id")]
+    has_video = lambda f: (f.get("vcodec") or "none") != "none"
+    has_audio = lambda f: (f.get("acodec") or "none") != "none"
+    videos = [f for f in fmts if has_video(f) and not has_audio(f)]
+    audios = [f for f in fmts if has_audio(f) and not has_video(f)]
+    candidates = [[f] for f in fmts if has_video(f) and has_audio(f)]
+    candidates += [[v, a] for v in videos for a in audios]
+    if not candidates:
+        candidates = [[a] for a in audios]  # audio-only source
+
+    best, best_key = None, None
+    for parts in candidates:
+        size, exact, kbps = estimate_output(info, parts)
+        if max_bytes is not None and (size is None or size > max_bytes):
+            continue
+        if max_kbps is not None and (kbps is None or kbps > max_kbps):
+            continue
+        v = parts[0]
+        # resolution first; among equals prefer mp4/m4a (muxes without surprises), then bitrate
+        compatible = all(f.get("ext") in ("mp4", "m4a") for f in parts)
+        key = (get_height(v) or 0, v.get("fps") or 0, compatible, kbps or 0)
+        if best_key is None or key > best_key:
+            best, best_key = (parts, size, exact, kbps), key
+    if best is None:
+        return None
+
+    parts, size, exact, kbps = best
+    merged = len(parts) > 1
+    v = parts[0]
+    h = get_height(v)
+    ext = "mp4" if merged else v.get("ext")  # merges are muxed into mp4 (merge_output_format)
+    limits = [bytes_human(max_bytes)] if max_bytes is not None else []
+    limits += [f"{max_kbps:g} kbps"] if max_kbps is not None else []
+    what = f"{h}p {ext}" if h and has_video(v) else f"Audio {ext}"
+    return {
+        "format_id": None if merged else str(v["format_id"]),
+        "format_string": "+".join(str(f["format_id"]) for f in parts),
+        "label": f"{what} (best under {' / '.join(limits)})",
+        "ext": ext,
+        "filesize": _size_label(size, exact),
+        "filesize_bytes": size,
+        "tbr": round(kbps, 1) if kbps else None,
+    }
+
 # def build_formats(info: Dict) -> List[Dict]:
 #     """
 #     Return clean options for ANY site:
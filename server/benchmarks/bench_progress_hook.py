@@ -0,0 +1,103 @@
+"""
+Progress hook overhead vs. API read latency with many concurrent jobs.
+
+Drives job_manager's real progress hook from N threads (one per simulated job,
+calling it as fast as yt-dlp's fragment downloader would) while a reader thread
+serializes the job list the way GET /jobs does.
+
+    cd server
+    python -m benchmarks.bench_progress_hook              # coalesced hook
+    python -m benchmarks.bench_progress_hook --legacy     # publish on every callback
+"""
+import argparse
+import shutil
+import statistics
+import threading
+import time
+
+from app.config import settings
+from app.models.schemas import JobResponse
+from app.routers.media import _job_json
+from app.services import job_manager as jm
+
+
+def _pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def run(jobs: int, seconds: float, legacy: bool) -> None:
+    if legacy:
+        # previous behaviour: every callback takes _LOCK and publishes
+        settings.PROGRESS_PUBLISH_INTERVAL = 0.0
+        settings.PROGRESS_PUBLISH_STEP = 0.0
+
+    created = []
+    for i in range(jobs):
+        job = jm.Job(id=f"bench-{i}", url=f"https://example.com/{i}", format_string="best",
+                     status="downloading")
+        created.append(job)
+        with jm._LOCK:
+            jm._JOBS[job.id] = job
+
+    stop = threading.Event()
+    hook_calls = [0] * jobs
+    hook_time = [0.0] * jobs
+    read_latency = []
+
+    def writer(i: int) -> None:
+        hook = jm._progress_hook(created[i])
+        total = 500 * 1024 * 1024
+        done = 0
+        n, spent = 0, 0.0
+        while not stop.is_set():
+            done = (done + 64 * 1024) % total
+            d = {"status": "downloading", "downloaded_bytes": done, "total_bytes": total,
+                 "speed": 5e6, "eta": 30, "tmpfilename": f"/tmp/bench-{i}.part"}
+            t0 = time.perf_counter()
+            hook(d)
+            spent += time.perf_counter() - t0
+            n += 1
+            if n % 64 == 0:
+                time.sleep(0)  # let other threads in, like real network waits do
+        hook_calls[i], hook_time[i] = n, spent
+
+    def reader() -> None:
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            [JobResponse(**_job_json(j)) for j in jm.list_jobs()]
+            read_latency.append(time.perf_counter() - t0)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(jobs)]
+    threads.append(threading.Thread(target=reader))
+    start_version = jm.changed_since(0)[0]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    published = jm.changed_since(0)[0] - start_version
+
+    calls = sum(hook_calls)
+    print(f"mode:              {'legacy (publish every callback)' if legacy else 'coalesced'}")
+    print(f"jobs:              {jobs}")
+    print(f"hook calls/s:      {calls / seconds:,.0f}")
+    print(f"hook mean cost:    {sum(hook_time) / max(calls, 1) * 1e6:.1f} us")
+    print(f"published updates: {published:,} ({published / max(calls, 1):.2%} of callbacks)")
+    print(f"GET /jobs p50:     {statistics.median(read_latency) * 1e3:.2f} ms")
+    print(f"GET /jobs p99:     {_pct(read_latency, 0.99) * 1e3:.2f} ms")
+
+    for job in created:
+        jm._JOBS.pop(job.id, None)
+        shutil.rmtree(job.tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--jobs", type=int, default=100)
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--legacy", action="store_true")
+    args = ap.parse_args()
+    run(args.jobs, args.seconds, args.legacy)
@@ -0,0 +1,63 @@
+# server/tests/conftest.py
+"""
+Shared setup for the server tests (run from server/: python -m pytest -q).
+
+Settings are read when app.config is imported, so the environment is pinned
+here first: no on-disk info/job stores and in-process extraction, whatever a
+local .env says.
+"""
+import os
+import sys
+import tempfile
+
+os.environ.update(
+    INFO_STORE_PATH="",
+    JOB_STORE_PATH="",
+    EXTRACT_WORKERS="0",
+)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from app.services import job_manager as jm
+
+
+class RecordingScheduler:
+    """Stands in for job_manager's schedulers: records what would get a worker."""
+
+    def __init__(self):
+        self.queued = []
+
+    def submit(self, job_id, fn, priority=0, gate=None):
+        self.submit_many([(job_id, fn, priority, gate)])
+
+    def submit_many(self, items):
+        self.queued += [item[0] for item in items]
+
+    def remove(self, job_id):
+        if job_id not in self.queued:
+            return False
+        self.queued.remove(job_id)
+        return True
+
+    def position(self, job_id):
+        return self.queued.index(job_id) + 1 if job_id in self.queued else None
+
+
+@pytest.fixture(autouse=True)
+def tmp_tempdir(tmp_path, monkeypatch):
+    # mdjob_*/md_* dirs land in the test's own directory
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    """A fresh job registry whose schedulers only record submissions."""
+    monkeypatch.setattr(jm, "_JOBS", {})
+    monkeypatch.setattr(jm, "_ACTIVE", {})
+    monkeypatch.setattr(jm, "_OUTPUTS", {})
+    scheduler = RecordingScheduler()
+    monkeypatch.setattr(jm, "_SCHEDULER", scheduler)
+    monkeypatch.setattr(jm, "_MERGER", RecordingScheduler())
+    return scheduler
@@ -0,0 +1,58 @@
+"""budget_format: best quality under a size and/or bitrate budget."""
+from app.services.ytdlp_service import budget_format
+
+MB = 1024 * 1024
+
+INFO = {
+    "duration": 100,
+    "formats": [
+        # progressive
+        {"format_id": "18", "ext": "mp4", "vcodec": "avc1", "acodec": "mp4a", "height": 360,
+         "filesize": 8 * MB, "tbr": 650},
+        # video only
+        {"format_id": "137", "ext": "mp4", "vcodec": "avc1", "acodec": "none", "height": 1080,
+         "filesize": 60 * MB, "tbr": 4800},
+        {"format_id": "136", "ext": "mp4", "vcodec": "avc1", "acodec": "none", "height": 720,
+         "tbr": 2000},  # size only from tbr x duration: 25 MB
+        {"format_id": "248", "ext": "webm", "vcodec": "vp9", "acodec": "none", "height": 1080,
+         "filesize": 40 * MB, "tbr": 3200},
+        # audio only
+        {"format_id": "140", "ext": "m4a", "vcodec": "none", "acodec": "mp4a", "filesize": 2 * MB, "tbr": 128},
+        {"format_id": "251", "ext": "webm", "vcodec": "none", "acodec": "opus", "filesize": 1 * MB, "tbr": 80},
+    ],
+}
+
+
+def test_roomy_budget_picks_the_best_quality():
+    pick = budget_format(INFO, max_bytes=100 * MB)
+    assert pick["format_string"] == "137+140"  # 1080p, mp4 muxes without surprises
+    assert pick["ext"] == "mp4" and pick["format_id"] is None
+    assert pick["filesize_bytes"] == 62 * MB
+
+
+def test_size_budget_steps_down_in_resolution():
+    assert budget_format(INFO, max_bytes=45 * MB)["format_string"] == "248+140"
+    assert budget_format(INFO, max_bytes=30 * MB)["format_string"] == "136+140"
+    assert budget_format(INFO, max_bytes=10 * MB)["format_string"] == "18"
+
+
+def test_estimated_sizes_are_marked_approximate():
+    assert budget_format(INFO, max_bytes=30 * MB)["filesize"].startswith("~")  # 136 has no filesize
+    assert not budget_format(INFO, max_bytes=10 * MB)["filesize"].startswith("~")
+
+
+def test_bitrate_budget():
+    assert budget_format(INFO, max_kbps=3500)["format_string"] == "248+140"
+    assert budget_format(INFO, max_kbps=1000)["format_string"] == "18"
+    assert budget_format(INFO, max_kbps=3500, max_bytes=30 * MB)["format_string"] == "136+140"
+
+
+def test_nothing_fits():
+    assert budget_format(INFO, max_bytes=1 * MB) is None
+    assert budget_format({"formats": [{"format_id": "x", "vcodec": "avc1", "acodec": "mp4a"}]},
+                         max_bytes=100 * MB) is None
+
+
+def test_audio_only_source():
+    info = {"duration": 60, "formats": [INFO["formats"][4], INFO["formats"][5]]}
+    assert budget_format(info, max_bytes=10 * MB)["format_string"] == "140"
@@ -0,0 +1,52 @@
+"""Canceling queued and paused jobs (job_manager.cancel_job)."""
+import os
+import shutil
+
+from app.services import job_manager as jm
+
+
+def test_cancel_deletes_the_dir_outside_the_job_lock(jobs, monkeypatch):
+    job = jm.start_job("https://example.com/a.mp4", "best")
+    with open(os.path.join(job.tmpdir, "a.mp4.part"), "wb") as f:
+        f.write(b"partial")
+    held = []
+    rmtree = shutil.rmtree
+
+    def watching_rmtree(path, *args, **kwargs):
+        held.append(jm._LOCK.locked())
+        rmtree(path, *args, **kwargs)
+
+    monkeypatch.setattr(jm.shutil, "rmtree", watching_rmtree)
+    jm.cancel_job(job.id)
+    assert job.status == "canceled"
+    assert held == [False]
+    assert not os.path.exists(job.tmpdir)
+    assert jobs.queued == []
+
+
+def test_cancel_of_a_paused_job_that_is_not_running(jobs):
+    job = jm.start_job("https://example.com/a.mp4", "best")
+    jm.pause_job(job.id)
+    assert job.status == "paused" and jobs.queued == []
+    jm.cancel_job(job.id)
+    assert job.status == "canceled"
+    assert not os.path.exists(job.tmpdir)
+
+
+def test_cancel_while_a_pause_is_stopping_the_run(jobs, monkeypatch):
+    job = jm.start_job("https://example.com/a.mp4", "best")
+    with open(os.path.join(job.tmpdir, "a.mp4.part"), "wb") as f:
+        f.write(b"partial")
+
+    def pause_then_cancel(job):
+        # the hook already raised for the pause when the cancel comes in
+        jm.pause_job(job.id)
+        jm.cancel_job(job.id)
+        assert job.status == "paused" and job._running
+        raise jm._StopForPause()
+
+    monkeypatch.setattr(jm, "_job_info", pause_then_cancel)
+    jm._run_job(job)
+    assert job.status == "canceled"
+    assert not job._running
+    assert not os.path.exists(job.tmpdir)
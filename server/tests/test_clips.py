@@ -0,0 +1,58 @@
+"""Time-range clip jobs: validation, yt-dlp options, duration and dedup keys."""
+import pytest
+
+from app.services import job_manager as jm
+
+URL = "https://example.com/video.mp4"
+
+
+@pytest.fixture
+def ffmpeg(monkeypatch):
+    monkeypatch.setattr(jm.shutil, "which", lambda name: f"/usr/bin/{name}")
+
+
+def test_clip_ranges_are_validated(ffmpeg):
+    assert jm.clip_error(None, None) is None
+    assert jm.clip_error(10, 20) is None
+    assert jm.clip_error(None, 20) is None and jm.clip_error(10, None) is None
+    assert jm.clip_error(-1, 20)
+    assert jm.clip_error(20, 10) and jm.clip_error(10, 10) and jm.clip_error(None, 0)
+
+
+def test_clips_need_ffmpeg(monkeypatch):
+    monkeypatch.setattr(jm.shutil, "which", lambda name: None)
+    assert "ffmpeg" in jm.clip_error(10, 20)
+    assert jm.clip_error(None, None) is None  # whole downloads don't
+
+
+def test_only_the_range_is_requested(jobs, ffmpeg):
+    job = jm.start_job(URL, "best", clip_start=10, clip_end=20, exact_cuts=True)
+    opts = jm._ydl_opts_for(job)
+    assert opts["force_keyframes_at_cuts"] is True
+    ranges = list(opts["download_ranges"]({"duration": 100}, None))
+    assert [(r["start_time"], r["end_time"]) for r in ranges] == [(10, 20)]
+    assert "download_ranges" not in jm._ydl_opts_for(jm.start_job(URL, "worst"))
+
+
+def test_clip_duration_for_merge_progress(jobs, ffmpeg):
+    open_ended = jm.start_job(URL, "best", clip_start=30)
+    assert jm._media_duration(open_ended, {"duration": 100}) == 70
+    assert jm._media_duration(open_ended, {}) is None
+    past_the_end = jm.start_job(URL, "best", clip_start=90, clip_end=200)
+    assert jm._media_duration(past_the_end, {"duration": 100}) == 10
+
+
+def test_invalid_clip_is_rejected(jobs, ffmpeg):
+    with pytest.raises(ValueError):
+        jm.start_job(URL, "best", clip_start=20, clip_end=10)
+    assert jobs.queued == []
+
+
+def test_clips_share_a_download_only_with_the_same_range(jobs, ffmpeg):
+    whole = jm.start_job(URL, "best")
+    clip = jm.start_job(URL, "best", clip_start=10, clip_end=20)
+    same = jm.start_job(URL, "best", clip_start=10.0, clip_end=20.0)
+    exact = jm.start_job(URL, "best", clip_start=10, clip_end=20, exact_cuts=True)
+    assert clip.source_job_id is None and exact.source_job_id is None
+    assert same.source_job_id == clip.id
+    assert jobs.queued == [whole.id, clip.id, exact.id]
@@ -0,0 +1,112 @@
+"""Jobs for the same url + format share one download (job_manager._admit/_settle/_finish_from)."""
+import os
+
+from app.config import settings
+from app.services import janitor
+from app.services import job_manager as jm
+
+URL = "https://example.com/video.mp4"
+
+
+def _finish(job, payload=b"video bytes"):
+    path = os.path.join(job.tmpdir, "video.mp4")
+    with open(path, "wb") as f:
+        f.write(payload)
+    job.status, job.filename = "done", path
+    jm._settle(job)
+
+
+def test_same_url_and_format_follow_one_download(jobs):
+    origin = jm.start_job(URL, "best")
+    follower = jm.start_job(URL, "best")
+    assert follower.source_job_id == origin.id
+    assert follower.status == "queued"
+    assert origin._followers == [follower.id]
+    assert jobs.queued == [origin.id]
+
+
+def test_other_format_downloads_separately(jobs):
+    first = jm.start_job(URL, "best")
+    second = jm.start_job(URL, "worst")
+    assert second.source_job_id is None
+    assert jobs.queued == [first.id, second.id]
+
+
+def test_followers_finish_with_the_origins_file(jobs):
+    origin = jm.start_job(URL, "best")
+    follower = jm.start_job(URL, "best")
+    _finish(origin)
+    assert follower.status == "done"
+    assert os.path.dirname(follower.filename) == follower.tmpdir
+    with open(follower.filename, "rb") as f:
+        assert f.read() == b"video bytes"
+
+
+def test_finished_output_is_reused_without_a_download(jobs):
+    origin = jm.start_job(URL, "best")
+    _finish(origin)
+    again = jm.start_job(URL, "best")
+    assert again.status == "done"
+    assert again.source_job_id == origin.id
+    assert jobs.queued == [origin.id]
+
+
+def test_canceling_the_origin_hands_off_to_its_heir(jobs):
+    origin = jm.start_job(URL, "best")
+    heir = jm.start_job(URL, "best")
+    third = jm.start_job(URL, "best")
+    jm.cancel_job(origin.id)
+    assert origin.status == "canceled"
+    assert heir.source_job_id is None and heir.status == "queued"
+    assert heir._followers == [third.id]
+    assert third.source_job_id == heir.id
+    assert jm._ACTIVE[jm._dedup_key(heir)] == heir.id
+    assert jobs.queued == [heir.id]
+
+
+def test_canceling_a_follower_leaves_the_origin_alone(jobs):
+    origin = jm.start_job(URL, "best")
+    follower = jm.start_job(URL, "best")
+    jm.cancel_job(follower.id)
+    assert follower.status == "canceled"
+    assert origin.status == "queued" and origin._followers == []
+    assert jobs.queued == [origin.id]
+
+
+def test_origin_error_is_passed_to_followers(jobs):
+    origin = jm.start_job(URL, "best")
+    follower = jm.start_job(URL, "best")
+    origin.status, origin.error = "error", "HTTP Error 403"
+    jm._settle(origin)
+    assert follower.status == "error"
+    assert follower.error == "HTTP Error 403"
+
+
+def test_paused_origin_is_not_followed(jobs):
+    origin = jm.start_job(URL, "best")
+    jm.pause_job(origin.id)
+    assert origin.status == "paused"
+    newcomer = jm.start_job(URL, "best")
+    assert newcomer.source_job_id is None
+    assert jm._ACTIVE[jm._dedup_key(newcomer)] == newcomer.id
+    assert jobs.queued == [newcomer.id]
+
+
+def test_shared_output_counts_once_against_the_quota(jobs, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_RETENTION", {})
+    monkeypatch.setattr(settings, "DOWNLOAD_DISK_QUOTA", 1500)
+    origin = jm.start_job(URL, "best")
+    _finish(origin, b"x" * 1000)
+    again = jm.start_job(URL, "best")
+    assert os.stat(again.filename).st_ino == os.stat(origin.filename).st_ino
+
+    out = janitor.sweep()  # 1000 bytes on disk, not 2000: nothing to evict
+    assert set(jm._JOBS) == {origin.id, again.id}
+    assert out["footprint_bytes"] == 1000
+
+    settings.DOWNLOAD_DISK_QUOTA = 500
+    before = out["reclaimed_bytes"]
+    out = janitor.sweep()  # both go, the file's bytes are freed once
+    assert jm._JOBS == {}
+    assert out["footprint_bytes"] == 0
+    assert out["reclaimed_bytes"] - before == 1000
@@ -0,0 +1,81 @@
+"""DownloadScheduler: bounded workers, admission order, gates."""
+import threading
+import time
+
+from app.services.download_scheduler import DownloadScheduler
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_never_runs_more_than_max_workers():
+    sched = DownloadScheduler(2)
+    release = threading.Event()
+    lock = threading.Lock()
+    running, peak, done = [0], [0], []
+
+    def job(i):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        release.wait(5)
+        with lock:
+            running[0] -= 1
+            done.append(i)
+
+    sched.submit_many([(f"j{i}", lambda i=i: job(i), 0) for i in range(5)])
+    _wait_for(lambda: sched.stats()["running"] == 2)
+    assert sched.stats()["queued"] == 3
+    release.set()
+    _wait_for(lambda: len(done) == 5)
+    assert peak[0] == 2
+
+
+def test_priority_policy_admits_higher_priority_first():
+    sched = DownloadScheduler(1, policy="priority")
+    gate = threading.Event()
+    order = []
+    sched.submit("blocker", lambda: gate.wait(5))
+    _wait_for(lambda: sched.is_running("blocker"))
+    sched.submit_many([
+        ("low", lambda: order.append("low"), 0),
+        ("high", lambda: order.append("high"), 5),
+        ("low2", lambda: order.append("low2"), 0),
+    ])
+    assert [sched.position(j) for j in ("high", "low", "low2")] == [1, 2, 3]
+    gate.set()
+    _wait_for(lambda: len(order) == 3)
+    assert order == ["high", "low", "low2"]
+
+
+def test_removed_job_never_runs():
+    sched = DownloadScheduler(1)
+    gate = threading.Event()
+    ran = []
+    sched.submit("blocker", lambda: gate.wait(5))
+    _wait_for(lambda: sched.is_running("blocker"))
+    sched.submit("doomed", lambda: ran.append("doomed"))
+    sched.submit("kept", lambda: ran.append("kept"))
+    assert sched.remove("doomed") is True
+    assert sched.remove("doomed") is False
+    gate.set()
+    _wait_for(lambda: ran == ["kept"])
+
+
+def test_closed_gate_lets_later_jobs_go_ahead():
+    sched = DownloadScheduler(1)
+    site_free = threading.Event()
+    ran = []
+    sched.submit_many([
+        ("blocked", lambda: ran.append("blocked"), 0, site_free.is_set),
+        ("other", lambda: ran.append("other"), 0),
+    ])
+    _wait_for(lambda: ran == ["other"])
+    assert sched.position("blocked") == 1
+    site_free.set()
+    sched.kick()
+    _wait_for(lambda: ran == ["other", "blocked"])
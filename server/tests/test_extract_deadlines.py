@@ -0,0 +1,54 @@
+"""Extraction deadlines and cancellation, and /info's 504."""
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import media
+from app.services import host_limiter as host_limiter_module
+from app.services import ytdlp_service
+from app.services.extract_pool import ExtractCanceled, ExtractTimeout
+from app.services.host_limiter import HostLimiter
+
+URL = "https://www.youtube.com/watch?v=abcdefghijk"
+
+
+@pytest.fixture
+def busy_site(monkeypatch):
+    """youtube's only extraction slot is taken."""
+    limiter = HostLimiter({}, {"youtube": 1})
+    limiter.for_site("youtube").acquire(kind="extract")
+    monkeypatch.setattr(ytdlp_service, "host_limiter", limiter)
+    monkeypatch.setattr(host_limiter_module, "_POLL", 0.02)
+    return limiter
+
+
+def test_the_deadline_covers_the_wait_for_a_slot(busy_site, monkeypatch):
+    monkeypatch.setattr(ytdlp_service, "extract_timeout", lambda url: 0.2)
+    t0 = time.monotonic()
+    with pytest.raises(ExtractTimeout):
+        ytdlp_service._extract_info_uncached(URL)
+    assert time.monotonic() - t0 < 2
+
+
+def test_cancel_ends_the_wait_for_a_slot(busy_site, monkeypatch):
+    monkeypatch.setattr(ytdlp_service, "extract_timeout", lambda url: None)
+    cancel = threading.Event()
+    threading.Timer(0.1, cancel.set).start()
+    with pytest.raises(ExtractCanceled):
+        ytdlp_service._extract_info_uncached(URL, cancel)
+    assert busy_site.for_site("youtube").active["extract"] == 1  # only the holder's
+
+
+def test_info_answers_504_on_timeout(monkeypatch):
+    async def too_slow(url, **kwargs):
+        raise ExtractTimeout("extraction took longer than 30s")
+
+    monkeypatch.setattr(media, "extract_info_async", too_slow)
+    app = FastAPI()
+    app.include_router(media.router)
+    r = TestClient(app).post("/info", json={"url": URL})
+    assert r.status_code == 504
+    assert "took longer" in r.json()["detail"]
@@ -0,0 +1,47 @@
+"""The extraction process pool: errors, deadlines, cancellation and stop()."""
+import threading
+
+import pytest
+import yt_dlp
+
+from app.services.extract_pool import ExtractCanceled, ExtractPool, ExtractTimeout
+
+
+@pytest.fixture
+def pool():
+    pool = ExtractPool(1)
+    yield pool
+    pool.stop()
+
+
+def test_yt_dlp_errors_keep_their_type(pool):
+    # rejected before any network access
+    call = pool.submit("not a url", {"quiet": True})
+    with pytest.raises(yt_dlp.utils.DownloadError, match="not a valid URL"):
+        call.future.result(timeout=60)
+    assert pool.stats()["failed"] == 1
+
+
+def test_an_expired_call_is_not_run(pool):
+    call = pool.submit("not a url", {"quiet": True}, timeout=1e-6)
+    with pytest.raises(ExtractTimeout):
+        call.future.result(timeout=60)
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_a_cancelled_call_is_not_run(pool):
+    cancel = threading.Event()
+    cancel.set()
+    call = pool.submit("not a url", {"quiet": True}, cancel=cancel)
+    with pytest.raises(ExtractCanceled):
+        call.future.result(timeout=60)
+
+
+def test_calls_after_stop_are_cancelled_without_new_workers(pool):
+    pool.start()
+    pool.stop()
+    call = pool.submit("not a url", {"quiet": True})
+    with pytest.raises(ExtractCanceled):
+        call.future.result(timeout=60)
+    assert pool._workers == [None]
+    assert pool.stats()["restarts"] == 0
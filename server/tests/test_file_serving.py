@@ -0,0 +1,89 @@
+"""MediaFileResponse: Range, If-Range and conditional requests."""
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.services.file_serving import MediaFileResponse
+
+BODY = bytes(range(256)) * 4  # 1024 bytes
+
+
+@pytest.fixture
+def client(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(BODY)
+    app = FastAPI()
+
+    @app.get("/file")
+    def serve():
+        return MediaFileResponse(str(path))
+
+    return TestClient(app)
+
+
+def test_full_response_advertises_ranges(client):
+    r = client.get("/file")
+    assert r.status_code == 200
+    assert r.content == BODY
+    assert r.headers["accept-ranges"] == "bytes"
+    assert r.headers["etag"]
+
+
+def test_single_range_is_partial_content(client):
+    r = client.get("/file", headers={"Range": "bytes=100-199"})
+    assert r.status_code == 206
+    assert r.headers["content-range"] == "bytes 100-199/1024"
+    assert r.content == BODY[100:200]
+
+
+def test_open_ended_and_suffix_ranges(client):
+    assert client.get("/file", headers={"Range": "bytes=1000-"}).content == BODY[1000:]
+    assert client.get("/file", headers={"Range": "bytes=-24"}).content == BODY[-24:]
+
+
+def test_unsatisfiable_range_is_416(client):
+    r = client.get("/file", headers={"Range": "bytes=5000-6000"})
+    assert r.status_code == 416
+    assert r.headers["content-range"].endswith("*/1024")  # Starlette leaves out the "bytes" unit
+
+
+def test_multiple_ranges_are_multipart(client):
+    r = client.get("/file", headers={"Range": "bytes=0-9,20-29"})
+    assert r.status_code == 206
+    assert r.headers["content-type"].startswith("multipart/byteranges")
+    assert BODY[0:10] in r.content and BODY[20:30] in r.content
+
+
+def test_if_range_with_a_stale_etag_sends_the_whole_file(client):
+    r = client.get("/file", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert r.status_code == 200
+    assert r.content == BODY
+
+
+def test_matching_etag_is_not_modified(client):
+    etag = client.get("/file").headers["etag"]
+    r = client.get("/file", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.content == b""
+    assert r.headers["etag"] == etag
+    assert client.get("/file", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_pathsend_is_used_when_the_server_offers_it(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(BODY)
+    scope = {"type": "http", "method": "GET", "headers": [],
+             "extensions": {"http.response.pathsend": {}}}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(MediaFileResponse(str(path))(scope, receive, send))
+    assert [m["type"] for m in sent] == ["http.response.start", "http.response.pathsend"]
+    assert sent[1]["path"] == str(path)
@@ -0,0 +1,65 @@
+"""follow_file: streaming a download's file while it is still being written."""
+import asyncio
+
+import pytest
+
+from app.services import file_serving
+from app.services.file_serving import FollowAborted, follow_file
+
+
+@pytest.fixture(autouse=True)
+def quick_poll(monkeypatch):
+    monkeypatch.setattr(file_serving, "_FOLLOW_POLL", 0.01)
+
+
+def _collect(paths, state, on_wait=None):
+    async def run():
+        out = b""
+        async for chunk in follow_file(paths, state):
+            out += chunk
+            if on_wait:
+                on_wait()
+        return out
+    return asyncio.run(run())
+
+
+def test_follows_the_part_file_across_its_rename(tmp_path):
+    part, final = tmp_path / "v.mp4.part", tmp_path / "v.mp4"
+    part.write_bytes(b"first")
+    status = ["writing"]
+
+    def grow():
+        if status[0] == "writing":
+            with open(part, "ab") as f:
+                f.write(b"-second")
+            part.rename(final)
+            status[0] = "complete"
+
+    out = _collect(lambda: [str(part), str(final)], lambda: status[0], on_wait=grow)
+    assert out == b"first-second"
+
+
+def test_a_failed_writer_aborts_the_stream(tmp_path):
+    part = tmp_path / "v.mp4.part"
+    part.write_bytes(b"some")
+    with pytest.raises(FollowAborted):
+        _collect(lambda: [str(part)], lambda: "failed")
+
+
+def test_completed_without_a_file_aborts(tmp_path):
+    with pytest.raises(FollowAborted):
+        _collect(lambda: [str(tmp_path / "missing")], lambda: "complete")
+
+
+def test_a_truncated_file_aborts(tmp_path):
+    part = tmp_path / "v.mp4.part"
+    part.write_bytes(b"0123456789")
+    truncated = []
+
+    def restart():
+        if not truncated:
+            part.write_bytes(b"01")  # writer started over
+            truncated.append(True)
+
+    with pytest.raises(FollowAborted):
+        _collect(lambda: [str(part)], lambda: "writing", on_wait=restart)
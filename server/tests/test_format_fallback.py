@@ -0,0 +1,88 @@
+"""/download format fallbacks: selected locally once, retried when a download fails."""
+import os
+import time
+
+import pytest
+import yt_dlp
+
+from app.services import host_limiter as host_limiter_module
+from app.services import ytdlp_service
+from app.services.extract_pool import ExtractTimeout
+from app.services.host_limiter import HostLimiter
+
+URL = "https://www.youtube.com/watch?v=abcdefghijk"
+
+
+def _fmt(format_id, ext, vcodec="none", acodec="none", height=None):
+    return {"format_id": format_id, "ext": ext, "vcodec": vcodec, "acodec": acodec,
+            "height": height, "url": f"https://cdn.example.com/{format_id}", "protocol": "https"}
+
+
+INFO = {
+    "id": "abcdefghijk", "title": "clip", "extractor": "youtube", "webpage_url": URL,
+    "formats": [
+        _fmt("18", "mp4", "avc1", "mp4a", 360),
+        _fmt("137", "mp4", "avc1", height=1080),
+        _fmt("140", "m4a", acodec="mp4a"),
+    ],
+}
+
+
+@pytest.fixture
+def downloads(monkeypatch):
+    """Record _download_into calls; the formats in `fail` raise DownloadError."""
+    monkeypatch.setattr(ytdlp_service, "extract_info", lambda url, fresh_streams=False: INFO)
+    calls, fail = [], set()
+
+    def fake_download_into(url, info, selected, tmpdir):
+        calls.append(selected["format_id"])
+        path = os.path.join(tmpdir, f"clip.{selected['format_id']}.mp4")
+        with open(path, "wb") as f:
+            f.write(b"data")
+        if selected["format_id"] in fail:
+            raise yt_dlp.utils.DownloadError(f"HTTP Error 403 on {selected['format_id']}")
+        return path
+
+    monkeypatch.setattr(ytdlp_service, "_download_into", fake_download_into)
+    return calls, fail
+
+
+def test_candidates_skip_repeats_and_non_matches():
+    candidates, _ = ytdlp_service.candidate_formats(INFO, "22")
+    assert [(expr, sel["format_id"]) for expr, sel in candidates] == [
+        ("bv*+ba/best", "137+140"),
+        ("best", "18"),
+    ]
+    candidates, _ = ytdlp_service.candidate_formats(INFO, "18")
+    assert [sel["format_id"] for _, sel in candidates] == ["18", "137+140"]  # "best" is 18 again
+
+
+def test_a_failed_download_moves_on_to_the_next_fallback(downloads):
+    calls, fail = downloads
+    fail.add("137+140")
+    path, expr, _ = ytdlp_service._download_to_temp(URL, "bv*+ba")
+    assert calls == ["137+140", "18"]
+    assert expr == "best"
+    assert os.listdir(os.path.dirname(path)) == ["clip.18.mp4"]  # the failed attempt's file is gone
+
+
+def test_every_candidate_failing_is_an_error(downloads):
+    calls, fail = downloads
+    fail.update({"137+140", "18"})
+    with pytest.raises(RuntimeError, match="no viable format"):
+        ytdlp_service._download_to_temp(URL, "best")
+    assert calls == ["18", "137+140"]
+
+
+def test_waiting_for_a_download_slot_has_a_deadline(downloads, monkeypatch):
+    calls, _ = downloads
+    limiter = HostLimiter({"youtube": (1, 0)})
+    monkeypatch.setattr(ytdlp_service, "host_limiter", limiter)
+    monkeypatch.setattr(ytdlp_service, "extract_timeout", lambda url: 0.2)
+    monkeypatch.setattr(host_limiter_module, "_POLL", 0.02)
+    limiter.for_site("youtube").acquire()
+    t0 = time.monotonic()
+    with pytest.raises(ExtractTimeout):
+        ytdlp_service._download_to_temp(URL, "best")
+    assert time.monotonic() - t0 < 2
+    assert calls == []
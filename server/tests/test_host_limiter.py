@@ -0,0 +1,59 @@
+"""host_limiter: per-site slot caps and the token bucket."""
+import threading
+import time
+
+import pytest
+
+from app.services.host_limiter import HostLimiter, SiteLimiter
+
+
+def test_slot_cap_is_per_kind():
+    site = SiteLimiter(max_sessions=1, rate=0, max_extractions=1)
+    assert site.try_acquire("download")
+    assert not site.try_acquire("download")
+    assert site.try_acquire("extract")  # downloads never starve extractions
+    site.release("download")
+    assert site.try_acquire("download")
+    assert site.stats()["active"] == 1 and site.stats()["active_extractions"] == 1
+
+
+def test_tokens_refill_at_the_configured_rate():
+    site = SiteLimiter(max_sessions=0, rate=10)  # burst of 10, then one every 0.1s
+    assert all(site.try_acquire() for _ in range(10))
+    assert not site.try_acquire()
+    time.sleep(0.15)
+    assert site.try_acquire()
+    assert not site.try_acquire()
+
+
+def test_blocked_acquire_waits_for_a_release():
+    released = []
+    site = SiteLimiter(max_sessions=1, rate=0, on_release=lambda: released.append(True))
+    site.acquire()
+    threading.Timer(0.3, site.release).start()
+    waited = site.acquire()
+    assert waited >= 0.25
+    assert site.stats()["blocked_seconds"] >= 0.25
+    assert released == [True]
+
+
+def test_check_abandons_the_wait_and_returns_the_slot():
+    site = SiteLimiter(max_sessions=1, rate=0)
+    site.acquire()
+
+    def check():
+        raise TimeoutError("gave up")
+
+    with pytest.raises(TimeoutError):
+        site.acquire(check)
+    site.release()
+    assert site.try_acquire()
+
+
+def test_unlisted_sites_are_not_limited():
+    limiter = HostLimiter({"youtube": (1, 0)})
+    assert limiter.try_acquire("youtube")
+    assert not limiter.try_acquire("youtube")
+    assert all(limiter.try_acquire("vimeo") for _ in range(50))
+    with limiter.slot(None) as waited:
+        assert waited == 0.0
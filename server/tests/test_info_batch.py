@@ -0,0 +1,105 @@
+"""POST /info/batch, and shared async extractions that every caller abandoned."""
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.routers import media
+from app.services import ytdlp_service
+from app.services.extract_pool import ExtractCanceled
+from app.services.info_cache import InfoCache
+
+INFO = {
+    "title": "clip", "duration": 10,
+    "formats": [{"format_id": "18", "ext": "mp4", "vcodec": "avc1", "acodec": "mp4a", "height": 360,
+                 "url": "https://cdn.example.com/18", "protocol": "https"}],
+}
+
+
+def test_batch_streams_one_line_per_url_and_shares_extractions(monkeypatch):
+    calls = []
+
+    async def fake_extract(url):
+        calls.append(url)
+        if "bad" in url:
+            raise RuntimeError("Unsupported URL: " + url)
+        return INFO
+
+    monkeypatch.setattr(media, "extract_info_async", fake_extract)
+    app = FastAPI()
+    app.include_router(media.router)
+    urls = [
+        "https://www.youtube.com/watch?v=abcdefghijk",
+        "https://example.com/bad",
+        "https://www.youtube.com/watch?v=abcdefghijk&list=PL123",  # same video
+    ]
+    r = TestClient(app).post("/info/batch", json={"urls": urls})
+    assert r.headers["content-type"] == "application/x-ndjson"
+    items = sorted((json.loads(line) for line in r.text.splitlines()), key=lambda i: i["index"])
+    assert [i["status"] for i in items] == [200, 400, 200]
+    assert items[0]["info"]["title"] == "clip" and items[2]["url"] == urls[2]
+    assert "error" not in items[0] and "info" not in items[1]
+    assert len(calls) == 2
+
+
+def test_batch_size_is_capped(monkeypatch):
+    monkeypatch.setattr(settings, "INFO_BATCH_MAX", 1)
+    app = FastAPI()
+    app.include_router(media.router)
+    r = TestClient(app).post("/info/batch", json={"urls": ["https://a.example.com/1", "https://a.example.com/2"]})
+    assert r.status_code == 400
+
+
+def test_loader_threads_come_from_settings():
+    assert ytdlp_service._LOADERS._max_workers == settings.INFO_LOAD_THREADS
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = InfoCache(ttl=60, max_entries=10, max_bytes=0)
+    monkeypatch.setattr(ytdlp_service, "info_cache", cache)
+    return cache
+
+
+def test_a_late_caller_does_not_get_an_abandoned_extraction(cache, monkeypatch):
+    url = "https://example.com/video"
+    started, runs = threading.Event(), []
+
+    def fake_load(url, cancel):
+        runs.append(cancel)
+        if len(runs) == 1:
+            started.set()
+            cancel.wait(5)
+            time.sleep(0.2)  # killing the pool worker takes a moment
+            raise ExtractCanceled("first extraction canceled")
+        return INFO
+
+    monkeypatch.setattr(ytdlp_service, "_load_info", fake_load)
+
+    async def run():
+        first = asyncio.ensure_future(ytdlp_service.extract_info_async(url))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await ytdlp_service.extract_info_async(url)
+
+    assert asyncio.run(run()) == INFO
+    assert len(runs) == 2 and runs[0].is_set() and not runs[1].is_set()
+    assert cache.get(url) == INFO
+
+
+def test_a_replaced_claim_is_not_ended_by_the_old_load(cache):
+    _, old, _ = cache.claim("k")
+    cache.fail("k", ExtractCanceled("abandoned"))       # what _leave_flight does
+    _, new, leader = cache.claim("k")
+    assert leader and new is not old
+    cache.fail("k", RuntimeError("late failure of the old load"), old)
+    assert not new.done()
+    cache.resolve("k", INFO, fut=new)
+    assert new.result() == INFO and cache.stats()["inflight"] == 0
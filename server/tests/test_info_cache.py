@@ -0,0 +1,70 @@
+"""InfoCache: TTL/LRU metadata cache with request coalescing."""
+import threading
+import time
+
+from app.services.info_cache import InfoCache
+
+
+def test_cache_expires_entries_after_their_ttl():
+    cache = InfoCache(ttl=0.1, max_entries=10, max_bytes=0)
+    cache.put("a", {"id": "a"})
+    assert cache.get("a") == {"id": "a"}
+    time.sleep(0.15)
+    assert cache.get("a") is None
+
+
+def test_cache_evicts_least_recently_used():
+    cache = InfoCache(ttl=60, max_entries=2, max_bytes=0)
+    cache.put("a", {"id": "a"})
+    cache.put("b", {"id": "b"})
+    cache.get("a")
+    cache.put("c", {"id": "c"})
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_respects_its_byte_ceiling():
+    cache = InfoCache(ttl=60, max_entries=100, max_bytes=200)
+    cache.put("huge", {"blob": "x" * 500})
+    assert cache.get("huge") is None
+    for i in range(10):
+        cache.put(str(i), {"blob": "x" * 50})
+    assert cache.stats()["bytes"] <= 200
+
+
+def test_concurrent_lookups_share_one_load():
+    cache = InfoCache(ttl=60, max_entries=10, max_bytes=0)
+    calls, results = [], []
+    started = threading.Event()
+
+    def loader():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return {"id": "v"}
+
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("v", loader)))
+               for _ in range(5)]
+    threads[0].start()
+    started.wait(5)
+    for t in threads[1:]:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert len(calls) == 1
+    assert results == [{"id": "v"}] * 5
+    assert cache.stats()["coalesced"] == 4
+
+
+def test_failed_load_is_not_cached():
+    cache = InfoCache(ttl=60, max_entries=10, max_bytes=0)
+
+    def broken():
+        raise RuntimeError("extractor failed")
+
+    try:
+        cache.get_or_load("v", broken)
+    except RuntimeError:
+        pass
+    assert cache.get_or_load("v", lambda: {"id": "v"}) == {"id": "v"}
@@ -0,0 +1,59 @@
+"""InfoStore: on-disk metadata that survives restarts, and stream URL freshness."""
+import time
+
+from app.services.info_store import InfoStore, streams_fresh
+
+
+def test_store_round_trips_and_counts_hits(tmp_path):
+    store = InfoStore(str(tmp_path / "info.sqlite3"), default_ttl=3600, site_ttls={"youtube": 60})
+    info = {"id": "v", "title": "Video", "formats": [{"format_id": "18", "url": "https://cdn/x"}]}
+    store.put("k", "youtube", info)
+    assert store.get("k") == info
+    store.get("k")
+    assert [key for key, _, _ in store.hottest(5)] == ["k"]
+    assert 0 < store.hottest(5)[0][2] <= 60  # the site's ttl, not the default
+
+
+def test_store_drops_expired_entries(tmp_path):
+    store = InfoStore(str(tmp_path / "info.sqlite3"), default_ttl=-1, site_ttls={})
+    store.put("k", None, {"id": "v"})
+    assert store.get("k") is None
+    assert store.purge_expired() == 1
+
+
+def test_signed_stream_urls_go_stale_at_their_expiry():
+    soon = int(time.time()) + 30
+    later = int(time.time()) + 3600
+    assert not streams_fresh({"formats": [{"url": f"https://r1.googlevideo.com/v?expire={soon}"}]})
+    assert streams_fresh({"formats": [{"url": f"https://r1.googlevideo.com/v?expire={later}"}]})
+    assert streams_fresh({"formats": [{"url": f"https://video.fbcdn.net/v.mp4?oe={later:X}"}]})
+
+
+def test_put_refreshes_an_entry_in_place(tmp_path):
+    store = InfoStore(str(tmp_path / "info.sqlite3"), default_ttl=3600, site_ttls={})
+    store.put("k", None, {"id": "v", "formats": [{"url": "https://cdn/old"}]})
+    store.get("k")
+    store.put("k", None, {"id": "v", "formats": [{"url": "https://cdn/new"}]})
+    assert store.get("k")["formats"][0]["url"] == "https://cdn/new"
+    assert store.stats()["entries"] == 1
+
+
+def test_stale_streams_are_re_extracted_for_downloads(monkeypatch):
+    from app.services import ytdlp_service
+    url = "https://example.com/stale.mp4"
+    expiries = [int(time.time()) + 10, int(time.time()) + 3600]
+    calls = []
+
+    def extract(u, cancel=None):
+        calls.append(u)
+        return {"id": "v", "formats": [{"url": f"https://r1.googlevideo.com/v?expire={expiries[len(calls) - 1]}"}]}
+
+    monkeypatch.setattr(ytdlp_service, "_extract_info_uncached", extract)
+    ytdlp_service.info_cache.invalidate(url)
+    ytdlp_service.extract_info(url)
+    ytdlp_service.extract_info(url)  # /info is happy with stale streams
+    assert len(calls) == 1
+    info = ytdlp_service.extract_info(url, fresh_streams=True)
+    assert len(calls) == 2 and streams_fresh(info)
+    ytdlp_service.extract_info(url, fresh_streams=True)
+    assert len(calls) == 2
@@ -0,0 +1,76 @@
+"""Janitor: per-status retention, disk quota eviction and temp dir sweeps."""
+import os
+import tempfile
+import time
+
+import pytest
+
+from app.config import settings
+from app.services import janitor
+from app.services import job_manager as jm
+
+
+@pytest.fixture
+def limits(jobs, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_RETENTION", {"done": 3600, "error": 60})
+    monkeypatch.setattr(settings, "DOWNLOAD_DISK_QUOTA", 0)
+    monkeypatch.setattr(settings, "ONESHOT_RETENTION", 600)
+    return settings
+
+
+def _finished(job_id, status="done", size=100, age=0.0, accessed=None):
+    tmpdir = tempfile.mkdtemp(prefix="mdjob_")
+    path = os.path.join(tmpdir, f"{job_id}.mp4")
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    job = jm.Job(id=job_id, url=f"https://example.com/{job_id}.mp4", format_string="best",
+                 status=status, tmpdir=tmpdir, filename=path,
+                 finished_at=time.time() - age, last_accessed=accessed)
+    jm._JOBS[job_id] = job
+    return job
+
+
+def test_retention_is_per_status(limits):
+    old_done = _finished("old-done", age=7200)
+    _finished("new-done", age=10)
+    _finished("old-error", status="error", age=120)
+    _finished("old-canceled", status="canceled", age=10 ** 6)  # no retention configured
+    janitor.sweep()
+    assert set(jm._JOBS) == {"new-done", "old-canceled"}
+    assert not os.path.exists(old_done.tmpdir)
+
+
+def test_quota_evicts_least_recently_downloaded_first(limits):
+    limits.DOWNLOAD_DISK_QUOTA = 250
+    now = time.time()
+    _finished("fetched-long-ago", age=30, accessed=now - 3000)
+    _finished("never-fetched", age=20)
+    _finished("fetched-just-now", age=40, accessed=now)
+    running = jm.start_job("https://example.com/live.mp4", "best")
+    with open(os.path.join(running.tmpdir, "live.mp4.part"), "wb") as f:
+        f.write(b"x" * 100)
+
+    out = janitor.sweep()
+    assert set(jm._JOBS) == {"fetched-just-now", running.id}
+    assert out["footprint_bytes"] == 200
+
+
+def test_orphan_job_dirs_are_swept(limits):
+    owned = _finished("kept")
+    orphan = tempfile.mkdtemp(prefix="mdjob_")
+    with open(os.path.join(orphan, "left.mp4"), "wb") as f:
+        f.write(b"x" * 10)
+    assert janitor.sweep_orphans() == 10
+    assert os.path.isdir(owned.tmpdir) and not os.path.exists(orphan)
+
+
+def test_oneshot_dirs_go_once_idle_but_never_while_in_use(limits, monkeypatch):
+    idle = tempfile.mkdtemp(prefix="md_")
+    busy = tempfile.mkdtemp(prefix="md_")
+    fresh = tempfile.mkdtemp(prefix="md_")
+    for path in (idle, busy):
+        os.utime(path, (time.time() - 3600,) * 2)
+    monkeypatch.setattr(janitor, "oneshot_dirs_in_use", lambda: [busy])
+    janitor.sweep()
+    assert not os.path.exists(idle)
+    assert os.path.isdir(busy) and os.path.isdir(fresh)
@@ -0,0 +1,66 @@
+"""Job store persistence and job_manager.restore_jobs."""
+import os
+
+import pytest
+
+from app.services import job_manager as jm
+from app.services.job_store import JobStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(jm, "job_store", store)
+    return store
+
+
+def _record(job_id, status, tmpdir, **extra):
+    # what job_manager hands to save(): a job's fields
+    return jm.Job(id=job_id, url=f"https://example.com/{job_id}.mp4", format_string="best",
+                  status=status, tmpdir=tmpdir, **extra).__dict__
+
+
+def test_latest_status_wins_and_deletes_stick(store, tmp_path):
+    store.save(_record("a", "queued", str(tmp_path)))
+    store.save(_record("a", "downloading", str(tmp_path), progress=0.5))
+    store.save(_record("b", "queued", str(tmp_path)))
+    store.delete("b")
+    store.flush()
+    [a] = store.load_all()
+    assert (a["id"], a["status"], a["progress"]) == ("a", "downloading", 0.5)
+    assert "speed_bps" not in a  # live numbers aren't persisted
+
+
+def test_restore_requeues_unfinished_jobs_in_their_dirs(jobs, store, tmp_path):
+    partial = tmp_path / "mdjob_partial"
+    partial.mkdir()
+    (partial / "video.mp4.part").write_bytes(b"half")
+    finished = tmp_path / "mdjob_done"
+    finished.mkdir()
+    (finished / "video.mp4").write_bytes(b"whole")
+    store.save(_record("running", "downloading", str(partial), progress=0.5, downloaded_bytes=4))
+    store.save(_record("held", "paused", str(tmp_path / "gone"), progress=0.3))
+    store.save(_record("done", "done", str(finished), filename=str(finished / "video.mp4")))
+    store.flush()
+
+    assert jm.restore_jobs() == 1
+    running = jm.get_job("running")
+    assert running.status == "queued"
+    assert running.tmpdir == str(partial) and running.downloaded_bytes == 4
+    held = jm.get_job("held")
+    assert held.status == "paused"
+    assert os.path.isdir(held.tmpdir) and held.progress == 0.0  # its partial data was gone
+    assert jm.get_job("done").status == "done"
+    assert jobs.queued == ["running"]
+
+
+def test_restored_output_is_reused(jobs, store, tmp_path):
+    finished = tmp_path / "mdjob_done"
+    finished.mkdir()
+    (finished / "video.mp4").write_bytes(b"whole")
+    store.save(_record("done", "done", str(finished), filename=str(finished / "video.mp4")))
+    store.flush()
+    jm.restore_jobs()
+    again = jm.start_job("https://example.com/done.mp4", "best")
+    assert again.status == "done" and again.source_job_id == "done"
+    assert jobs.queued == []
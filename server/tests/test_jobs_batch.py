@@ -0,0 +1,75 @@
+"""POST /jobs/batch: validation up front, one submit for the batch, batch status and cancel."""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.routers import media
+from app.services import job_manager as jm
+
+
+class CountingScheduler:
+    """Records each submit_many call, so a batch can be seen arriving in one piece."""
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+        self.calls = []
+
+    def submit_many(self, items):
+        self.calls.append([item[0] for item in items])
+        self.recorder.submit_many(items)
+
+    def __getattr__(self, name):
+        return getattr(self.recorder, name)
+
+
+@pytest.fixture
+def client(jobs, monkeypatch):
+    scheduler = CountingScheduler(jobs)
+    monkeypatch.setattr(jm, "_SCHEDULER", scheduler)
+    app = FastAPI()
+    app.include_router(media.router)
+    return TestClient(app), scheduler
+
+
+def _item(n, **extra):
+    return {"url": f"https://example.com/{n}.mp4", "format": "best", **extra}
+
+
+def test_batch_is_enqueued_in_one_submit(client):
+    http, scheduler = client
+    r = http.post("/jobs/batch", json={"items": [_item("a"), _item("b"), _item("a")]})
+    assert r.status_code == 200
+    body = r.json()
+    ids = [j["id"] for j in body["jobs"]]
+    assert body["counts"] == {"queued": 3} and not body["finished"]
+    # the repeat of "a" follows the first one's download
+    assert scheduler.calls == [ids[:2]]
+    assert body["jobs"][2]["source_job_id"] == ids[0]
+
+
+def test_every_invalid_item_is_reported_and_nothing_starts(client):
+    http, scheduler = client
+    items = [_item("a"), _item("b", format="best[height<"), _item("c", start=10, end=5)]
+    r = http.post("/jobs/batch", json={"items": items})
+    assert r.status_code == 400
+    assert [e["index"] for e in r.json()["detail"]] == [1, 2]
+    assert scheduler.calls == [] and jm._JOBS == {}
+
+
+def test_batch_limits(client, monkeypatch):
+    http, _ = client
+    assert http.post("/jobs/batch", json={"items": []}).status_code == 400
+    monkeypatch.setattr(settings, "JOBS_BATCH_MAX", 2)
+    assert http.post("/jobs/batch", json={"items": [_item(n) for n in "abc"]}).status_code == 400
+
+
+def test_batch_status_and_cancel(client):
+    http, _ = client
+    batch_id = http.post("/jobs/batch", json={"items": [_item("a"), _item("b")]}).json()["batch_id"]
+    jm._JOBS[http.get(f"/jobs/batch/{batch_id}").json()["jobs"][0]["id"]].status = "done"
+
+    r = http.post(f"/jobs/batch/{batch_id}/cancel")
+    assert r.json()["counts"] == {"done": 1, "canceled": 1}
+    assert r.json()["finished"]
+    assert http.get("/jobs/batch/nope").status_code == 404
@@ -0,0 +1,68 @@
+"""GET /jobs deltas: since=<version>, ETag/304 and wait= long-polls."""
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import media
+from app.services import job_manager as jm
+
+
+@pytest.fixture
+def client(jobs):
+    app = FastAPI()
+    app.include_router(media.router)
+    return TestClient(app)
+
+
+def test_since_returns_only_changed_jobs(client):
+    a = jm.start_job("https://example.com/a.mp4", "best")
+    b = jm.start_job("https://example.com/b.mp4", "best")
+    r = client.get("/jobs")
+    assert {j["id"] for j in r.json()} == {a.id, b.id}
+    version = int(r.headers["x-jobs-version"])
+
+    r = client.get("/jobs", params={"since": version})
+    assert r.status_code == 200 and r.json() == []
+    etag = r.headers["etag"]
+    r = client.get("/jobs", params={"since": version}, headers={"If-None-Match": etag})
+    assert r.status_code == 304
+
+    jm.pause_job(b.id)
+    r = client.get("/jobs", params={"since": version}, headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["etag"] != etag
+    assert [(j["id"], j["status"]) for j in r.json()] == [(b.id, "paused")]
+
+
+def test_a_queue_move_shows_up_in_the_delta(client):
+    a, b, c = (jm.start_job(f"https://example.com/{n}.mp4", "best") for n in "abc")
+    jm._refresh_positions()
+    version = int(client.get("/jobs").headers["x-jobs-version"])
+
+    jm.cancel_job(a.id)
+    jm._refresh_positions()
+    r = client.get("/jobs", params={"since": version})
+    positions = {j["id"]: j["queue_position"] for j in r.json()}
+    assert positions == {a.id: None, b.id: 1, c.id: 2}
+
+
+def test_long_poll_returns_when_a_job_changes(client):
+    job = jm.start_job("https://example.com/a.mp4", "best")
+    version = int(client.get("/jobs").headers["x-jobs-version"])
+    threading.Timer(0.2, jm.pause_job, (job.id,)).start()
+
+    t0 = time.monotonic()
+    r = client.get("/jobs", params={"since": version, "wait": 10})
+    assert time.monotonic() - t0 < 5
+    assert [j["id"] for j in r.json()] == [job.id]
+    assert int(r.headers["x-jobs-version"]) > version
+
+
+def test_long_poll_times_out_empty(client):
+    jm.start_job("https://example.com/a.mp4", "best")
+    version = int(client.get("/jobs").headers["x-jobs-version"])
+    r = client.get("/jobs", params={"since": version, "wait": 0.2})
+    assert r.status_code == 200 and r.json() == []
+    assert r.headers["x-jobs-version"] == str(version)
@@ -0,0 +1,101 @@
+"""The merge stage: post-processing handed off after the download, run later, and cancel."""
+import os
+
+import pytest
+from yt_dlp.postprocessor.common import PostProcessor
+
+from app.services import job_manager as jm
+
+URL = "https://example.com/video.mp4"
+
+
+class Staged:
+    """A downloader that stopped before post-processing; run_pending writes the output."""
+
+    def __init__(self, job, fail=False):
+        self.job = job
+        self.fail = fail
+        self.pending = (os.path.join(job.tmpdir, "video.f1.mp4"), {"duration": 10}, {})
+        self.params = {}
+        self._pps = {"post_process": []}
+        self.closed = False
+
+    def run_pending(self):
+        self.pending = None
+        if self.fail:
+            raise RuntimeError("ffmpeg exited with code 1")
+        self.job.filename = os.path.join(self.job.tmpdir, "video.mp4")
+        with open(self.job.filename, "wb") as f:
+            f.write(b"merged")
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def merging(jobs):
+    job = jm.start_job(URL, "bv+ba")
+    staged = Staged(job)
+    jm._hand_off(job, staged)
+    return job, staged
+
+
+def test_hand_off_queues_the_job_on_the_merge_stage(jobs, merging):
+    job, staged = merging
+    assert job.status == "merging" and job.progress == 1.0
+    assert jm._MERGER.queued == [job.id] and job._ydl is staged
+
+
+def test_merge_worker_finishes_the_job(merging):
+    job, staged = merging
+    jm._postprocess_job(job, staged, queued_at=0)
+    assert job.status == "done" and job.total_bytes == len(b"merged")
+    assert job.merge_progress == 1.0 and job.merge_seconds is not None
+    assert staged.closed and job._ydl is None
+
+
+def test_a_failed_merge_is_an_error(jobs):
+    job = jm.start_job(URL, "bv+ba")
+    staged = Staged(job, fail=True)
+    jm._hand_off(job, staged)
+    jm._postprocess_job(job, staged, queued_at=0)
+    assert job.status == "error" and "ffmpeg" in job.error
+    assert staged.closed
+
+
+def test_cancel_while_waiting_for_a_merge_slot(merging):
+    job, staged = merging
+    jm.cancel_job(job.id)
+    assert job.status == "canceled" and jm._MERGER.queued == []
+    assert staged.closed and staged.pending is None and job._ydl is None
+    assert not os.path.exists(job.tmpdir)
+
+
+def test_cancel_requested_before_the_merge_runs(merging):
+    job, staged = merging
+    job._cancel_req = True  # cancel_job lost the race with the merge worker's take
+    jm._postprocess_job(job, staged, queued_at=0)
+    assert job.status == "canceled" and staged.pending is not None  # never merged
+    assert staged.closed and not os.path.exists(job.tmpdir)
+
+
+class Remux(PostProcessor):
+    def __init__(self):
+        super().__init__()
+        self.runs = 0
+
+    def run(self, info):
+        self.runs += 1
+        return [], info
+
+
+def test_staged_downloader_defers_post_processing(tmp_path):
+    pp = Remux()
+    ydl = jm._StagedYDL({"quiet": True})
+    ydl.add_post_processor(pp, when="post_process")
+    info = {"id": "x", "ext": "mp4"}
+    assert ydl.post_process(str(tmp_path / "x.mp4"), info) is info
+    assert ydl.pending is not None and pp.runs == 0
+    ydl.run_pending()
+    assert pp.runs == 1 and ydl.pending is None
+    ydl.close()
@@ -0,0 +1,89 @@
+"""Diskless /download: slot waits, the yt-dlp command line and the stdout pipe."""
+import asyncio
+import glob
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+
+from app.services import host_limiter as host_limiter_module
+from app.services import passthrough
+from app.services.extract_pool import ExtractTimeout
+from app.services.host_limiter import SiteLimiter
+
+URL = "https://example.com/video"
+
+
+@pytest.fixture(autouse=True)
+def quick_poll(monkeypatch):
+    monkeypatch.setattr(host_limiter_module, "_POLL", 0.02)
+
+
+def test_slot_wait_ends_at_the_sites_deadline(monkeypatch):
+    monkeypatch.setattr(passthrough, "extract_timeout", lambda url: 0.2)
+    site = SiteLimiter(max_sessions=1, rate=0)
+    site.acquire()
+    t0 = time.monotonic()
+    with pytest.raises(ExtractTimeout):
+        asyncio.run(passthrough._acquire(URL, site))
+    assert time.monotonic() - t0 < 2
+
+
+def test_cancelled_slot_wait_does_not_keep_a_slot(monkeypatch):
+    monkeypatch.setattr(passthrough, "extract_timeout", lambda url: None)
+    site = SiteLimiter(max_sessions=1, rate=0)
+    site.acquire()
+
+    async def run():
+        waiting = asyncio.create_task(passthrough._acquire(URL, site))
+        await asyncio.sleep(0.05)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        await asyncio.sleep(0.1)  # the worker thread sees the abandon at its next check
+
+    asyncio.run(run())
+    site.release()
+    assert site.try_acquire()
+    assert site.active["download"] == 1
+
+
+def test_merged_selection_muxes_fragmented_mp4():
+    selected = {"format_id": "137+140", "ext": "mp4", "requested_formats": [{}, {}]}
+    cmd = passthrough._command(URL, "/tmp/x.info.json", selected)
+    assert cmd[cmd.index("--format") + 1] == "137+140"
+    assert cmd[cmd.index("--output") + 1] == "-"
+    assert cmd[cmd.index("--merge-output-format") + 1] == "mp4"
+    assert passthrough._FMP4_ARGS in cmd
+
+    single = passthrough._command(URL, "/tmp/x.info.json", {"format_id": "18", "ext": "mp4"})
+    assert "--merge-output-format" not in single
+
+
+def _fake_ytdlp(monkeypatch, script):
+    monkeypatch.setattr(passthrough, "_command", lambda url, info_path, selected: [sys.executable, "-c", script])
+
+
+def _read_all(stream_factory):
+    async def run():
+        body = b""
+        async for chunk in await stream_factory():
+            body += chunk
+        return body
+    return asyncio.run(run())
+
+
+def test_stdout_is_streamed_and_temp_files_removed(monkeypatch):
+    _fake_ytdlp(monkeypatch, "import sys; sys.stdout.buffer.write(b'x' * 300000)")
+    body = _read_all(lambda: passthrough.open_stream(URL, {"id": "v"}, {"format_id": "18"}))
+    assert body == b"x" * 300000
+    assert glob.glob(os.path.join(tempfile.gettempdir(), "md_*.info.json")) == []
+
+
+def test_failure_before_the_first_byte_raises_with_stderr(monkeypatch):
+    _fake_ytdlp(monkeypatch, "import sys; sys.stderr.write('ERROR: HTTP Error 403'); sys.exit(1)")
+    with pytest.raises(passthrough.PassthroughError, match="HTTP Error 403"):
+        _read_all(lambda: passthrough.open_stream(URL, {"id": "v"}, {"format_id": "18"}))
+    assert glob.glob(os.path.join(tempfile.gettempdir(), "md_*.info.json")) == []
@@ -0,0 +1,85 @@
+"""Playlist expansion: back-pressure against the download queue, stopping and cancel."""
+import time
+
+import pytest
+
+from app.config import settings
+from app.services import job_manager as jm
+from app.services import playlist_jobs
+
+
+class Entries:
+    """A lazy playlist: records how far it was read and whether it was closed."""
+
+    def __init__(self, count):
+        self.read = 0
+        self.closed = False
+        self._gen = self._entries(count)
+
+    def _entries(self, count):
+        try:
+            for i in range(count):
+                self.read += 1
+                yield {"url": f"https://example.com/v{i}.mp4", "title": f"v{i}"}
+        finally:
+            self.closed = True
+
+    def __iter__(self):
+        return self._gen
+
+    def close(self):
+        self._gen.close()
+
+
+@pytest.fixture
+def playlist(jobs, monkeypatch):
+    monkeypatch.setattr(settings, "PLAYLIST_LOOKAHEAD", 2)
+    monkeypatch.setattr(playlist_jobs, "_POLL", 0.01)
+    monkeypatch.setattr(playlist_jobs, "_PLAYLISTS", {})
+    monkeypatch.setattr(playlist_jobs, "extract_info", lambda url, fresh_streams=False: {})
+    entries = Entries(100)
+    monkeypatch.setattr(playlist_jobs, "iter_playlist", lambda url, cancel=None: ({"title": "list"}, entries))
+    return entries
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_expansion_waits_for_queued_entries_to_start(playlist):
+    pl = playlist_jobs.start_playlist("https://example.com/list", "best")
+    _wait_for(lambda: len(pl.job_ids) == 2)
+    time.sleep(0.1)
+    assert len(pl.job_ids) == 2 and playlist.read <= 3  # held back, not read ahead
+
+    jm.get_job(pl.job_ids[0]).status = "downloading"  # a worker took the first one
+    _wait_for(lambda: len(pl.job_ids) == 3)
+    assert pl.title == "list" and pl.status == "expanding"
+
+    playlist_jobs.cancel_playlist(pl.id)
+    _wait_for(lambda: pl.status == "canceled")
+    assert playlist.closed
+    assert [jm.get_job(j).status for j in pl.job_ids[1:]] == ["canceled", "canceled"]
+
+
+def test_max_entries_stops_and_closes_the_expansion(playlist, monkeypatch):
+    monkeypatch.setattr(settings, "PLAYLIST_LOOKAHEAD", 10)
+    pl = playlist_jobs.start_playlist("https://example.com/list", "best", max_entries=3)
+    _wait_for(lambda: pl.status != "expanding")
+    assert pl.status == "expanded" and len(pl.job_ids) == 3
+    assert playlist.read == 3 and playlist.closed
+
+
+def test_prune_keeps_playlists_with_running_entries(playlist, monkeypatch):
+    monkeypatch.setattr(settings, "PLAYLIST_LOOKAHEAD", 10)
+    pl = playlist_jobs.start_playlist("https://example.com/list", "best", max_entries=2)
+    _wait_for(lambda: pl.status == "expanded")
+    pl.finished_at -= 100
+    assert playlist_jobs.prune(10) == 0
+    for jid in pl.job_ids:
+        jm.cancel_job(jid)
+    assert playlist_jobs.prune(10) == 1
+    assert playlist_jobs.list_playlists() == []
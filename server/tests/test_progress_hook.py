@@ -0,0 +1,49 @@
+"""The yt-dlp progress hook publishes coalesced progress (job_manager._progress_hook)."""
+import pytest
+
+from app.config import settings
+from app.services import job_manager as jm
+
+
+@pytest.fixture
+def hook_job(jobs, monkeypatch):
+    monkeypatch.setattr(settings, "PROGRESS_PUBLISH_INTERVAL", 60.0)
+    monkeypatch.setattr(settings, "PROGRESS_PUBLISH_STEP", 0.1)
+    job = jm.start_job("https://example.com/a.mp4", "best")
+    return job, jm._progress_hook(job)
+
+
+def _downloading(n, total=1000, name="a.mp4.part"):
+    return {"status": "downloading", "downloaded_bytes": n, "total_bytes": total, "tmpfilename": name}
+
+
+def test_small_steps_are_not_published(hook_job):
+    job, hook = hook_job
+    hook(_downloading(0))             # first file: published
+    version = job.version
+    for n in range(1, 100):
+        hook(_downloading(n))         # < 10% moved and within the interval
+    assert job.version == version and job.downloaded_bytes == 0
+    hook(_downloading(150))
+    assert job.version > version
+    assert job.downloaded_bytes == 150 and job.progress == pytest.approx(0.15)
+
+
+def test_new_file_and_finish_are_always_published(hook_job):
+    job, hook = hook_job
+    hook(_downloading(500, name="a.f137.mp4.part"))
+    hook(_downloading(510, name="a.f137.mp4.part"))
+    assert job.downloaded_bytes == 500
+    hook(_downloading(1, name="a.f140.m4a.part"))
+    assert job.filename == "a.f140.m4a.part" and job.downloaded_bytes == 1
+    hook(_downloading(5, name="a.f140.m4a.part"))
+    hook({"status": "finished", "filename": "a.f140.m4a", "total_bytes": 1000})
+    assert job.filename == "a.f140.m4a"
+    assert job.downloaded_bytes == 5 and job.progress == 1.0
+
+
+def test_cancel_request_stops_the_hook(hook_job):
+    job, hook = hook_job
+    job._cancel_req = True
+    with pytest.raises(jm._StopForCancel):
+        hook(_downloading(10))
@@ -0,0 +1,51 @@
+"""Queue positions are published as job changes, so /jobs deltas and SSE resend them."""
+import threading
+
+from app.services import job_manager as jm
+from app.services.download_scheduler import DownloadScheduler
+
+
+def test_scheduler_reports_submit_take_and_remove():
+    sched = DownloadScheduler(max_workers=1, name="test-change")
+    changes = []
+    sched.on_change(lambda: changes.append(sched.position("b")))
+    started, release = threading.Event(), threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait(5)
+
+    sched.submit("a", blocker)
+    assert started.wait(5)          # submit, then "a" taken by the worker
+    sched.submit("b", lambda: None)
+    sched.submit("c", lambda: None)
+    assert sched.remove("c")
+    assert not sched.remove("c")    # nothing queued: no change reported
+    assert changes == [None, None, 1, 1, 1]
+    release.set()
+
+
+def test_positions_move_up_with_new_versions(jobs):
+    a, b, c = (jm.start_job(f"https://example.com/{n}.mp4", "best") for n in "abc")
+    jm._refresh_positions()
+    assert [j.queue_position for j in (a, b, c)] == [1, 2, 3]
+
+    base = jm._VERSION
+    jm.cancel_job(a.id)
+    jm._refresh_positions()
+    assert a.queue_position is None
+    assert (b.queue_position, c.queue_position) == (1, 2)
+    _, changed, _ = jm.changed_since(base)
+    assert {j.id for j in changed} == {a.id, b.id, c.id}
+
+    base = jm._VERSION
+    jm._refresh_positions()  # nothing moved: no new versions
+    assert jm.changed_since(base)[1] == []
+
+
+def test_position_is_cleared_when_a_job_leaves_the_queue(jobs):
+    job = jm.start_job("https://example.com/a.mp4", "best")
+    jm._refresh_positions()
+    assert job.queue_position == 1
+    jm.pause_job(job.id)
+    assert job.status == "paused" and job.queue_position is None
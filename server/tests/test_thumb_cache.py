@@ -0,0 +1,68 @@
+"""Thumbnail cache: LRU eviction, pinning, and resized variants of an evicted source."""
+import asyncio
+import io
+import os
+
+import httpx
+import pytest
+from PIL import Image
+
+from app.services import thumb_cache
+from app.services.thumb_cache import ThumbCache
+
+URL = "https://i.example.com/thumb.png"
+
+
+def _put(cache, key, size):
+    tmp = cache.temp_path(key)
+    with open(tmp, "wb") as f:
+        f.write(b"x" * size)
+    return cache.commit(key, tmp, {"url": key, "fetched_at": 0})
+
+
+def test_commit_evicts_least_recently_used(tmp_path):
+    cache = ThumbCache(str(tmp_path), max_bytes=250, ttl=60)
+    _put(cache, "a", 100)
+    _put(cache, "b", 100)
+    cache.lookup("a")
+    _put(cache, "c", 100)
+    assert cache.lookup("b") is None
+    assert cache.lookup("a") and cache.lookup("c")
+
+
+def test_pinned_entries_are_not_evicted(tmp_path):
+    cache = ThumbCache(str(tmp_path), max_bytes=150, ttl=60)
+    a = _put(cache, "a", 100)
+    with cache.pinned("a"):
+        _put(cache, "b", 100)
+        assert os.path.exists(a)
+    _put(cache, "c", 100)
+    assert not os.path.exists(a)
+    assert cache.stats()["bytes"] == 100
+
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch):
+    buf = io.BytesIO()
+    Image.new("RGB", (640, 360), "red").save(buf, "PNG")
+    png = buf.getvalue()
+    cache = ThumbCache(str(tmp_path / "thumbs"), max_bytes=len(png) + 100, ttl=60)
+    monkeypatch.setattr(thumb_cache, "cache", cache)
+    transport = httpx.MockTransport(lambda request: httpx.Response(
+        200, content=png, headers={"content-type": "image/png", "etag": '"v1"'}))
+    monkeypatch.setattr(thumb_cache, "_CLIENT", httpx.AsyncClient(transport=transport))
+    return cache
+
+
+def test_source_outlives_evictions_while_it_is_encoded(upstream, monkeypatch):
+    encode = thumb_cache._encode
+
+    def crowded_encode(src, dst, width, fmt):
+        _put(upstream, "another-thumbnail", 5000)  # a concurrent request fills the cache
+        encode(src, dst, width, fmt)
+
+    monkeypatch.setattr(thumb_cache, "_encode", crowded_encode)
+    path, meta = asyncio.run(thumb_cache.fetch_variant(URL, 160, "webp"))
+    assert meta["content_type"] == "image/webp"
+    with Image.open(path) as im:
+        assert im.size == (160, 90)
@@ -80,7 +80,7 @@ export default function DownloadOptionsModal() {
           <div className="grid gap-3 overflow-y-auto min-h-0">
             {info.thumbnail && (
               <img
-                src={`${BASE_URL}/proxy-image?url=${encodeURIComponent(info.thumbnail)}`}
+                src={`${BASE_URL}/proxy-image?url=${encodeURIComponent(info.thumbnail)}&w=640`}
                 alt={info.title}
                 className="w-full rounded-xl aspect-video object-cover mb-2"
                 onError={(e) => {
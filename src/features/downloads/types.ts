@@ -7,7 +7,9 @@ export interface FormatItem {
     format_string: string;       // ALWAYS present, e.g. "137+140" or "18"
     label: string;
     ext?: string;
-    filesize?: string;           // human readable file size
+    filesize?: string;           // human readable file size ("~" = estimate)
+    filesize_bytes?: number | null;  // estimated output size
+    tbr?: number | null;         // estimated total bitrate, kbps
   }
   
   export interface InfoResponse {
@@ -42,6 +44,13 @@ export interface DownloadJobDTO {
     eta_seconds?: number | null       // ← allow null
     filename?: string | null          // ← allow null
     error?: string | null             // ← allow null
+    priority?: number
+    queue_position?: number | null    // 1-based while waiting for a download slot
+    blocked_seconds?: number          // time spent waiting on per-site rate limits
+    version?: number                  // server job-store version of the last change
+    merge_step?: string | null        // post-processor running while status is 'merging'
+    merge_progress?: number | null    // 0..1 through that step, when known
+    merge_seconds?: number | null     // how long post-processing took
   
     // optional UI-only fields if you add them
     label?: string
@@ -30,11 +30,16 @@ const JobSchema = z.object({
     eta_seconds: z.number().nullable().optional(),   // ← nullable
     filename: z.string().nullable().optional(),      // ← nullable
     error: z.string().nullable().optional(),         // ← nullable
+    priority: z.number().optional(),
+    queue_position: z.number().nullable().optional(),
+    merge_step: z.string().nullable().optional(),
+    merge_progress: z.number().nullable().optional(),
+    merge_seconds: z.number().nullable().optional(),
   })
 
 export const mediaApi = {
     async info(url: string): Promise<InfoResponse> {
-        const { data } = await api.post('/info', { url })
+        const { data } = await api.post('/info', { url, thumb_width: 640 })
 
         // Normal path (backend with format_string)
         const parsed = InfoSchema.safeParse(data)
@@ -82,6 +87,25 @@ export const mediaApi = {
         const { data } = await api.get('/jobs')
         return z.array(JobSchema).parse(data)
     },
+    /** Subscribe to pushed job changes (SSE). Returns a function that closes the stream. */
+    streamJobs(
+        onJobs: (jobs: DownloadJobDTO[]) => void,
+        onError?: (e: Event) => void,
+        onRemoved?: (ids: string[]) => void,
+    ) {
+        const es = new EventSource(`${api.defaults.baseURL}/jobs/stream`)
+        es.addEventListener('jobs', (ev) => {
+            const parsed = z.array(JobSchema).safeParse(JSON.parse((ev as MessageEvent).data))
+            if (parsed.success) onJobs(parsed.data)
+        })
+        // finished jobs dropped by server-side retention
+        es.addEventListener('removed', (ev) => {
+            const parsed = z.array(z.string()).safeParse(JSON.parse((ev as MessageEvent).data))
+            if (parsed.success) onRemoved?.(parsed.data)
+        })
+        if (onError) es.onerror = onError
+        return () => es.close()
+    },
     fileUrl(id: string) {
         // Use this href to download final file
         return `${api.defaults.baseURL}/jobs/${id}/file`
@@ -1,4 +1,4 @@
-import { useEffect, useMemo } from 'react'
+import { useEffect, useMemo, useState } from 'react'
 import { mediaApi } from '../lib/mediaApi'
 import { useDownloads } from '../features/downloads/downloads.slice'
 import type { DownloadJobDTO } from '../features/downloads/types'
@@ -8,6 +8,7 @@ export default function Downloads() {
   const jobs = useDownloads(s => s.jobs)
   const setJobs = useDownloads(s => s.setJobs)
   const upsert = useDownloads(s => s.upsertJob)
+  const removeJob = useDownloads(s => s.removeJob)
 
   // On mount, load existing jobs from server
   useEffect(() => {
@@ -16,22 +17,22 @@ export default function Downloads() {
     })()
   }, [setJobs])
 
-  // Poll active jobs and recently completed ones
+  // Server pushes job changes over SSE; the stream also delivers the full list on connect
+  const [streamDown, setStreamDown] = useState(false)
   useEffect(() => {
+    const close = mediaApi.streamJobs(
+      list => { setStreamDown(false); list.forEach(upsert) },
+      () => setStreamDown(true),
+      ids => ids.forEach(removeJob),
+    )
+    return close
+  }, [upsert, removeJob])
+
+  // Fallback: poll active jobs while the stream is reconnecting
+  useEffect(() => {
+    if (!streamDown) return
     const timer = setInterval(async () => {
       try {
-        // Poll active jobs + jobs that completed in the last 5 seconds (to get final size)
-        // const now = Date.now()
-        // const jobsToUpdate = jobs.filter(j => {
-        //   if (!['done','error','canceled'].includes(j.status)) return true
-        //   // For completed jobs, check if they finished recently (no completion timestamp available, so poll for first 5 updates after completion)
-        //   if (j.status === 'done') {
-        //     const updatedRecently = !j._lastPolled || (now - j._lastPolled) < 5000
-        //     return updatedRecently
-        //   }
-        //   return false
-        // })
-
         const jobsToUpdate = jobs.filter(j => {
           if (!['done', 'error', 'canceled'].includes(j.status)) return true;
           if (j.status === 'done') {
@@ -43,15 +44,11 @@ export default function Downloads() {
         });
 
         if (jobsToUpdate.length === 0) return
-        await Promise.all(jobsToUpdate.map(async j => {
-          const fresh = await mediaApi.getJob(j.id)
-          // fresh._lastPolled = now
-          upsert(fresh)
-        }))
+        await Promise.all(jobsToUpdate.map(async j => upsert(await mediaApi.getJob(j.id))))
       } catch (e) { /* ignore transient */ }
     }, 1000)
     return () => clearInterval(timer)
-  }, [jobs, upsert])
+  }, [streamDown, jobs, upsert])
 
   return (
     <div className="grid gap-4">
@@ -86,7 +83,7 @@ function JobRow({ job }: { job: DownloadJobDTO }) {
         <div className="min-w-0">
           <div className="font-medium truncate">{job.title || job.url}</div>
           <div className="text-xs text-white/60">
-            {job.status.toUpperCase()} • {bytesHuman(job.downloaded_bytes)}
+            {job.status.toUpperCase()}{job.queue_position ? ` #${job.queue_position}` : ''} • {bytesHuman(job.downloaded_bytes)}
             {job.total_bytes ? ` / ${bytesHuman(job.total_bytes)}` : ''} •
             {' '}{speedHuman(job.speed_bps)}{job.eta_seconds != null ? ` • ${etaHuman(job.eta_seconds)} left` : ''}
           </div>